@@ -2,6 +2,7 @@ from enum import Enum
 from typing import Any, List, Dict, Union, Optional
 
 import bugsnag
+from bugsnag.asyncio_delivery import AsyncioDelivery
 from bugsnag.breadcrumbs import BreadcrumbType
 from bugsnag.legacy import _auto_leave_breadcrumb
 from bugsnag.utils import remove_query_from_url, sanitize_url
@@ -117,6 +118,10 @@ class BugsnagMiddleware:
     async def __call__(self, scope, receive, send):
         bugsnag.configure()._breadcrumbs.create_copy_for_context()
         bugsnag.configure_request(asgi_scope=scope)
+
+        if scope['type'] == 'lifespan':
+            receive, send = _wrap_lifespan(receive, send)
+
         try:
             if bugsnag.configuration.auto_capture_sessions:
                 bugsnag.start_session()
@@ -135,6 +140,34 @@ class BugsnagMiddleware:
             raise
 
 
+def _wrap_lifespan(receive, send):
+    """
+    Start an AsyncioDelivery's workers when the app starts and send anything
+    still queued once the app has shut down
+    """
+    config = bugsnag.configure()
+    delivery = config.delivery
+
+    if not isinstance(delivery, AsyncioDelivery):
+        return receive, send
+
+    async def lifespan_receive():
+        message = await receive()
+
+        if message.get('type') == 'lifespan.startup':
+            await delivery.start(config)
+
+        return message
+
+    async def lifespan_send(message):
+        if message.get('type') == 'lifespan.shutdown.complete':
+            await delivery.drain()
+
+        await send(message)
+
+    return lifespan_receive, lifespan_send
+
+
 def _get_breadcrumb_metadata(scope) -> Dict[str, str]:
     metadata = {'to': scope['path']}
     referer = _get_referer_header(scope)
@@ -0,0 +1,531 @@
+import asyncio
+import ssl
+from typing import Any, Dict, List, Optional, Set, Tuple  # noqa
+from urllib.parse import urlsplit
+
+from bugsnag.circuit_breaker import FALLBACK_SPOOL
+from bugsnag.delivery import (
+    DeliveryPayload,
+    UrllibDelivery,
+    _envelope_aware,
+    _is_transient_failure,
+    _marshall_post_delivery_callback,
+    _parse_retry_after
+)
+
+__all__ = ('AsyncioDelivery',)
+
+# the maximum time to wait for a response to a request
+REQUEST_TIMEOUT = 30.0
+
+# the maximum time to spend sending queued payloads when the app shuts down
+DRAIN_TIMEOUT = 5.0
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+_ConnectionKey = Tuple[str, str, int]
+_Connection = Tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+    except AttributeError:
+        # get_running_loop was added in Python 3.7
+        return asyncio._get_running_loop()
+
+
+class _ConnectionPool:
+    """
+    A minimal HTTP/1.1 client built on asyncio streams which keeps idle
+    connections open so they can be reused by later requests
+    """
+
+    def __init__(self, max_idle: int):
+        self.max_idle = max_idle
+        self._idle = {}  # type: Dict[_ConnectionKey, List[_Connection]]
+        self._ssl_context = None  # type: Optional[ssl.SSLContext]
+
+    async def post(self, uri: str, body: bytes,
+                   headers: Dict[str, str]) -> Tuple[int, Dict[str, str]]:
+        """
+        POST a request body, returning the response status code and headers.
+        Header names are lowercase
+        """
+        parts = urlsplit(uri)
+        port = parts.port or _DEFAULT_PORTS.get(parts.scheme, 80)
+        key = (parts.scheme, parts.hostname or '', port)
+
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+
+        request = ['POST {} HTTP/1.1'.format(path)]
+        request.append('Host: {}'.format(parts.netloc))
+        request.append('Content-Length: {}'.format(len(body)))
+        request.extend('{}: {}'.format(*header) for header in headers.items())
+        message = ('\r\n'.join(request) + '\r\n\r\n').encode('latin-1') + body
+
+        connection = self._checkout(key)
+
+        if connection is not None:
+            try:
+                return await self._exchange(key, connection, message)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # the server may have closed the connection while it was
+                # idle, so try again with a new one
+                pass
+
+        connection = await self._connect(key)
+
+        return await self._exchange(key, connection, message)
+
+    def close(self) -> None:
+        for connections in self._idle.values():
+            for _, writer in connections:
+                writer.close()
+
+        self._idle = {}
+
+    def _checkout(self, key: _ConnectionKey) -> Optional[_Connection]:
+        connections = self._idle.get(key)
+
+        while connections:
+            reader, writer = connections.pop()
+
+            if not reader.at_eof():
+                return reader, writer
+
+            writer.close()
+
+        return None
+
+    def _checkin(self, key: _ConnectionKey, connection: _Connection) -> None:
+        connections = self._idle.setdefault(key, [])
+
+        if len(connections) < self.max_idle:
+            connections.append(connection)
+        else:
+            connection[1].close()
+
+    async def _connect(self, key: _ConnectionKey) -> _Connection:
+        scheme, host, port = key
+        context = None
+
+        if scheme == 'https':
+            if self._ssl_context is None:
+                self._ssl_context = ssl.create_default_context()
+
+            context = self._ssl_context
+
+        return await asyncio.open_connection(host, port, ssl=context)
+
+    async def _exchange(
+        self,
+        key: _ConnectionKey,
+        connection: _Connection,
+        message: bytes
+    ) -> Tuple[int, Dict[str, str]]:
+        reader, writer = connection
+
+        try:
+            writer.write(message)
+            await writer.drain()
+
+            # skip any interim responses, which have no body
+            while True:
+                version, status, headers = await self._read_head(reader)
+
+                if not 100 <= status < 200:
+                    break
+
+            keep_alive = (
+                version == 'HTTP/1.1' and
+                headers.get('connection', '').lower() != 'close'
+            )
+
+            if status in (204, 304):
+                # these never have a body (RFC 9112 section 6.3)
+                pass
+            elif headers.get('transfer-encoding', '').lower() == 'chunked':
+                await self._read_chunks(reader)
+            elif 'content-length' in headers:
+                await reader.readexactly(int(headers['content-length']))
+            elif not keep_alive:
+                # the body ends when the server closes the connection
+                await reader.read()
+            else:
+                # the end of the body can't be found without waiting for a
+                # timeout, so the rest of the response is discarded with the
+                # connection
+                keep_alive = False
+        except BaseException:
+            writer.close()
+            raise
+
+        if keep_alive:
+            self._checkin(key, connection)
+        else:
+            writer.close()
+
+        return status, headers
+
+    async def _read_head(
+        self,
+        reader: asyncio.StreamReader
+    ) -> Tuple[str, int, Dict[str, str]]:
+        """
+        Read the status line and headers of a response
+        """
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError('Connection closed by server')
+
+        version, status = status_line.decode('latin-1').split()[:2]
+        headers = {}  # type: Dict[str, str]
+
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        return version, int(status), headers
+
+    async def _read_chunks(self, reader: asyncio.StreamReader) -> None:
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+
+            if size == 0:
+                # skip any trailers
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+
+                return
+
+            await reader.readexactly(size + 2)
+
+
+class _QueuedPayload:
+    __slots__ = ('config', 'payload', 'success', 'callback', 'attempt')
+
+    def __init__(self, config, payload: DeliveryPayload,
+                 success: Optional[int], callback):
+        self.config = config
+        self.payload = payload
+        self.success = success
+        self.callback = callback
+        self.attempt = 0
+
+
+class _LoopWorkers:
+    """
+    The queue, worker tasks and connections used to deliver payloads on one
+    event loop
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, config):
+        self.loop = loop
+        self.queue = asyncio.Queue(config.delivery_queue_size)  # type: asyncio.Queue  # noqa: E501
+        self.pool = _ConnectionPool(config.delivery_worker_count)
+        self.tasks = []  # type: List[asyncio.Future]
+        self.retries = set()  # type: Set[asyncio.Future]
+        self.worker_count = config.delivery_worker_count
+
+
+class AsyncioDelivery(UrllibDelivery):
+    """
+    Sends payloads from tasks on the running event loop, using a pool of
+    keep-alive connections, instead of from delivery threads.
+
+    Payloads wait in a queue of up to 'delivery_queue_size' payloads, which
+    is consumed by 'delivery_worker_count' tasks; payloads are dropped when
+    the queue is full. When there is no running event loop, a proxy is
+    configured or a request is synchronous, this falls back to sending from a
+    delivery thread like UrllibDelivery.
+
+    With the ASGI BugsnagMiddleware, the worker tasks are started when the
+    app starts and the queue is drained when it shuts down.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._workers = None  # type: Optional[_LoopWorkers]
+
+    @_envelope_aware
+    def deliver(self, config, payload: Any, options=None):
+        if options is None:
+            options = {}
+
+        loop = _running_loop()
+
+        if (
+            loop is None or
+            config.proxy_host or
+            not config.asynchronous or
+            options.get('asynchronous', True) is False
+        ):
+            # there's no event loop to send on so use a delivery thread
+            super().deliver(config, payload, options)
+            return
+
+        workers = self._get_workers(config, loop)
+        callback = _marshall_post_delivery_callback(
+            options.pop('post_delivery_callback', None)
+        )
+
+        item = _QueuedPayload(
+            config,
+            self._resolve_payload(config, payload, options),
+            options.get('success'),
+            callback
+        )
+
+        try:
+            workers.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            config.logger.warning('Delivery queue is full, dropping a request')
+            callback()
+
+    async def start(self, config) -> None:
+        """
+        Start the worker tasks on the running event loop
+        """
+        loop = _running_loop()
+
+        if loop is not None:
+            self._get_workers(config, loop)
+
+    async def drain(self, timeout: float = DRAIN_TIMEOUT) -> None:
+        """
+        Wait up to 'timeout' seconds for queued payloads to be sent and then
+        stop the worker tasks. Payloads which are still waiting to be sent or
+        retried are saved to the spool, if one is configured
+        """
+        workers = self._workers
+
+        if workers is None or workers.loop is not _running_loop():
+            return
+
+        self._workers = None
+
+        try:
+            await asyncio.wait_for(workers.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+        for task in list(workers.retries) + workers.tasks:
+            task.cancel()
+
+        await asyncio.gather(
+            *(list(workers.retries) + workers.tasks),
+            return_exceptions=True
+        )
+
+        while not workers.queue.empty():
+            await self._abandon(workers.queue.get_nowait())
+
+        workers.pool.close()
+
+    def _get_workers(self, config,
+                     loop: asyncio.AbstractEventLoop) -> _LoopWorkers:
+        workers = self._workers
+
+        if (
+            workers is not None and
+            workers.loop is loop and
+            workers.worker_count == config.delivery_worker_count
+        ):
+            return workers
+
+        if workers is not None and workers.loop is loop:
+            # let the previous workers finish what's already queued
+            for task in workers.tasks:
+                try:
+                    workers.queue.put_nowait(None)
+                except asyncio.QueueFull:
+                    task.cancel()
+
+        workers = _LoopWorkers(loop, config)
+        workers.tasks = [
+            loop.create_task(self._work(workers))
+            for _ in range(workers.worker_count)
+        ]
+
+        self._workers = workers
+
+        return workers
+
+    async def _work(self, workers: _LoopWorkers) -> None:
+        while True:
+            item = await workers.queue.get()
+
+            try:
+                if item is None:
+                    return
+
+                await self._send(workers, item)
+            except asyncio.CancelledError:
+                await self._abandon(item)
+                raise
+            except Exception as e:
+                item.config.logger.exception('Notifying Bugsnag failed %s', e)
+                item.callback()
+            finally:
+                workers.queue.task_done()
+
+    async def _send(self, workers: _LoopWorkers, item: _QueuedPayload):
+        config = item.config
+        payload = item.payload
+        uri = payload.endpoint or config.endpoint
+        breaker = self.get_circuit_breaker(config, uri)
+
+        if not breaker.allow_request():
+            self._increment('shed')
+
+            if config.circuit_breaker_fallback == FALLBACK_SPOOL:
+                await self._spool_in_executor(config, payload)
+
+            item.callback()
+            return
+
+        # building the request can encode a deferred event, which builds its
+        # stacktrace and reads code snippets, and compresses the body, so it
+        # is done off the event loop
+        try:
+            body, headers = await workers.loop.run_in_executor(
+                None,
+                self._build_request,
+                config,
+                payload
+            )
+        except BaseException:
+            breaker.cancel_request()
+            raise
+        error = None  # type: Optional[Exception]
+        retry_after = None  # type: Optional[float]
+
+        try:
+            status, response_headers = await asyncio.wait_for(
+                workers.pool.post(uri, body, headers),
+                REQUEST_TIMEOUT
+            )
+        except Exception as e:
+            self._record_failure(config, breaker, uri)
+            error = e
+        else:
+            transient = _is_transient_failure(status)
+
+            if transient:
+                self._record_failure(config, breaker, uri)
+            else:
+                breaker.record_success()
+
+            if item.success is not None:
+                success = status == item.success
+            else:
+                success = status >= 200 and status < 300
+
+            if success:
+                self._increment('delivered')
+                spool = await self._get_spool_in_executor(config)
+
+                # connectivity has recovered so send anything spooled earlier
+                if spool is not None and spool.has_entries:
+                    self._replay_spool(config, spool)
+
+                item.callback()
+                return
+
+            if not transient:
+                self._increment('failed')
+
+            config.logger.warning(
+                'Delivery to %s failed, status %d' % (uri, status)
+            )
+
+            if not transient:
+                item.callback()
+                return
+
+            retry_after = _parse_retry_after(
+                response_headers.get('retry-after')
+            )
+
+        delay = self._retry_delay(config, item.attempt, retry_after)
+
+        if delay is not None:
+            item.attempt += 1
+            self._increment('retried')
+
+            # wait in a separate task so the worker can carry on sending
+            retry = workers.loop.create_task(
+                self._retry_later(workers, item, delay)
+            )
+            workers.retries.add(retry)
+            retry.add_done_callback(workers.retries.discard)
+            return
+
+        if item.attempt > 0:
+            self._increment('retries_exhausted')
+
+        if error is not None:
+            config.logger.error(
+                'Notifying Bugsnag failed %s',
+                error,
+                exc_info=error
+            )
+
+        await self._spool_in_executor(config, payload)
+        item.callback()
+
+    async def _retry_later(self, workers: _LoopWorkers,
+                           item: _QueuedPayload, delay: float) -> None:
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            await self._abandon(item)
+            raise
+
+        try:
+            workers.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            await self._spool_in_executor(item.config, item.payload)
+            item.callback()
+
+    async def _spool_in_executor(self, config,
+                                 payload: DeliveryPayload) -> None:
+        if config.spool_directory is None:
+            return
+
+        # writing to disk would block the event loop
+        await asyncio.get_event_loop().run_in_executor(
+            None,
+            self._spool_payload,
+            config,
+            payload
+        )
+
+    async def _get_spool_in_executor(self, config):
+        if config.spool_directory is None:
+            return None
+
+        # the spool's directory is created and listed when it's first opened
+        return await asyncio.get_event_loop().run_in_executor(
+            None,
+            self.get_spool,
+            config
+        )
+
+    async def _abandon(self, item: Optional[_QueuedPayload]) -> None:
+        if item is None:
+            return
+
+        try:
+            await self._spool_in_executor(item.config, item.payload)
+        finally:
+            item.callback()
@@ -0,0 +1,151 @@
+import atexit
+from threading import Lock, Timer
+from typing import Any, Callable, Dict, List, Optional, Tuple  # noqa
+
+from bugsnag.delivery import DeliveryPayload, payload_for
+from bugsnag.event import Event
+
+__all__ = []  # type: List[str]
+
+
+_BatchKey = Tuple[Any, Optional[str]]
+
+
+class _Batch:
+    __slots__ = ('config', 'api_key', 'events', 'callbacks', 'size', 'timer')
+
+    def __init__(self, config, api_key: Optional[str]):
+        self.config = config
+        self.api_key = api_key
+        self.events = []  # type: List[bytes]
+        self.callbacks = []  # type: List[Callable[[], None]]
+        self.size = 0
+        self.timer = None  # type: Optional[Timer]
+
+
+class EventBatcher:
+    """
+    Coalesces encoded events which share a configuration and API key so they
+    can be delivered as a single payload. A batch is sent when it reaches
+    'batch_max_events' events or 'batch_max_bytes' bytes, or once
+    'batch_linger_ms' has passed since its first event was added.
+    """
+
+    def __init__(self):
+        self._mutex = Lock()
+        self._batches = {}  # type: Dict[_BatchKey, _Batch]
+        self._registered_atexit = False
+
+    def add(self, config, api_key: Optional[str], encoded_event: bytes,
+            post_delivery_callback: Callable[[], None]) -> None:
+        """
+        Add an encoded event to the batch for its API key
+        """
+        ready = []  # type: List[_Batch]
+        key = (config, api_key)
+        event_size = len(encoded_event)
+
+        with self._mutex:
+            batch = self._batches.get(key)
+
+            # send the existing batch first if this event would overflow it
+            if (
+                batch is not None and
+                batch.size + event_size > config.batch_max_bytes
+            ):
+                ready.append(self._take_batch(key))
+                batch = None
+
+            if batch is None:
+                batch = self._new_batch(key)
+
+            batch.events.append(encoded_event)
+            batch.callbacks.append(post_delivery_callback)
+            batch.size += event_size
+
+            if (
+                len(batch.events) >= config.batch_max_events or
+                batch.size >= config.batch_max_bytes
+            ):
+                ready.append(self._take_batch(key))
+
+        for ready_batch in ready:
+            self._send(ready_batch)
+
+    def flush(self, asynchronous: Optional[bool] = None) -> None:
+        """
+        Send every pending batch immediately
+        """
+        with self._mutex:
+            ready = [self._take_batch(key) for key in list(self._batches)]
+
+        for batch in ready:
+            self._send(batch, asynchronous)
+
+    def _new_batch(self, key: _BatchKey) -> _Batch:
+        config, api_key = key
+        batch = _Batch(config, api_key)
+        batch.timer = Timer(
+            config.batch_linger_ms / 1000,
+            self._flush_batch,
+            args=(key, batch)
+        )
+        batch.timer.daemon = True
+        batch.timer.start()
+
+        self._batches[key] = batch
+
+        if not self._registered_atexit:
+            self._registered_atexit = True
+            # the delivery threads may have stopped by the time this runs, so
+            # any remaining batches are sent synchronously
+            atexit.register(self.flush, asynchronous=False)
+
+        return batch
+
+    def _take_batch(self, key: _BatchKey) -> _Batch:
+        batch = self._batches.pop(key)
+
+        if batch.timer is not None:
+            batch.timer.cancel()
+
+        return batch
+
+    def _flush_batch(self, key: _BatchKey, batch: _Batch) -> None:
+        with self._mutex:
+            # the batch may already have been sent because it filled up
+            if self._batches.get(key) is not batch:
+                return
+
+            self._take_batch(key)
+
+        self._send(batch)
+
+    def _send(self, batch: _Batch,
+              asynchronous: Optional[bool] = None) -> None:
+        callbacks = batch.callbacks
+
+        def post_delivery_callback():
+            for callback in callbacks:
+                callback()
+
+        options = {
+            'post_delivery_callback': post_delivery_callback
+        }  # type: Dict[str, Any]
+
+        if asynchronous is not None:
+            options['asynchronous'] = asynchronous
+
+        payload = DeliveryPayload(
+            Event._assemble_payload(batch.api_key, batch.events),
+            batch.api_key
+        )
+        deliver = batch.config.delivery.deliver
+
+        try:
+            deliver(batch.config, payload_for(deliver, payload), options)
+        except Exception as e:
+            batch.config.logger.exception('Notifying Bugsnag failed %s', e)
+
+            # ensure these requests are not still marked as in-flight
+            post_delivery_callback()
@@ -0,0 +1,122 @@
+import threading
+import time
+from typing import List  # noqa
+
+__all__ = []  # type: List[str]
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+FALLBACK_DROP = 'drop'
+FALLBACK_SPOOL = 'spool'
+FALLBACKS = (FALLBACK_DROP, FALLBACK_SPOOL)
+
+
+class CircuitBreaker:
+    """
+    Tracks consecutive failures sending to an endpoint so requests can fail
+    fast while it is down.
+
+    The breaker starts closed and lets every request through. After
+    'failure_threshold' consecutive failures it opens and rejects requests
+    until 'cooldown' seconds have passed. It is then half open: a single
+    trial request is let through, which closes the breaker if it succeeds or
+    opens it again if it fails. A threshold of 0 disables the breaker.
+
+    >>> breaker = CircuitBreaker(failure_threshold=2, cooldown=60)
+    >>> breaker.record_failure()
+    False
+    >>> breaker.state
+    'closed'
+    >>> breaker.record_failure()
+    True
+    >>> breaker.state
+    'open'
+    >>> breaker.allow_request()
+    False
+    """
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+
+        self._mutex = threading.Lock()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._state = STATE_CLOSED
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        """
+        'closed', 'open' or 'half_open'
+        """
+        with self._mutex:
+            self._update_state()
+
+            return self._state
+
+    def allow_request(self) -> bool:
+        """
+        If a request should be sent now. When the breaker is half open only
+        the first caller is allowed through until its result is recorded
+        """
+        with self._mutex:
+            self._update_state()
+
+            if self._state == STATE_CLOSED:
+                return True
+
+            if self._state == STATE_HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+
+                return True
+
+            return False
+
+    def cancel_request(self) -> None:
+        """
+        Record that a request which was allowed wasn't sent after all, so
+        another caller can make the half open trial
+        """
+        with self._mutex:
+            self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        with self._mutex:
+            self._failures = 0
+            self._state = STATE_CLOSED
+            self._trial_in_flight = False
+
+    def record_failure(self) -> bool:
+        """
+        Record a failed request, returning True if this opened the breaker
+        """
+        with self._mutex:
+            self._failures += 1
+            self._trial_in_flight = False
+            self._update_state()
+
+            if self._state == STATE_OPEN or self.failure_threshold <= 0:
+                return False
+
+            if (
+                self._state == STATE_HALF_OPEN or
+                self._failures >= self.failure_threshold
+            ):
+                self._state = STATE_OPEN
+                self._opened_at = time.monotonic()
+
+                return True
+
+            return False
+
+    def _update_state(self) -> None:
+        if self.failure_threshold <= 0:
+            self._state = STATE_CLOSED
+        elif (
+            self._state == STATE_OPEN and
+            time.monotonic() - self._opened_at >= self.cooldown
+        ):
+            self._state = STATE_HALF_OPEN
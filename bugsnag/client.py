@@ -7,17 +7,21 @@ import functools
 from datetime import datetime, timezone
 from typing import Union, Tuple, Callable, Optional, List, Type, Dict, Any
 
+from bugsnag.batching import EventBatcher
 from bugsnag.breadcrumbs import (
     Breadcrumb,
     BreadcrumbType,
     OnBreadcrumbCallback
 )
 from bugsnag.configuration import Configuration, RequestConfiguration
+from bugsnag.delivery import DeliveryPayload, payload_for
 from bugsnag.event import Event
 from bugsnag.feature_flags import FeatureFlag
 from bugsnag.handlers import BugsnagHandler
+from bugsnag.rate_limiter import RateLimiter
+from bugsnag.sampling import Sampler
 from bugsnag.sessiontracker import SessionTracker
-from bugsnag.utils import to_rfc3339
+from bugsnag.utils import fully_qualified_class_name, to_rfc3339
 from bugsnag.context import ContextLocalState
 from bugsnag.request_tracker import RequestTracker
 
@@ -39,6 +43,9 @@ class Client:
             self.configuration.configure(**kwargs)
         self._context = ContextLocalState(self)
         self._request_tracker = RequestTracker()
+        self._batcher = EventBatcher()
+        self._rate_limiter = RateLimiter()
+        self._sampler = Sampler()
 
         if install_sys_hook:
             self.install_sys_hook()
@@ -84,6 +91,27 @@ class Client:
         >>> client.notify(Exception('Example'))  # doctest: +SKIP
         """
 
+        # filtered exceptions mustn't be sampled or use up the rate limit
+        if self._is_filtered(exception):
+            return
+
+        sample_rate = self._sample(options)
+
+        if sample_rate is None:
+            return
+
+        suppressed = self._rate_limiter.acquire(
+            self.configuration,
+            exception,
+            options.get(
+                'traceback',
+                getattr(exception, '__traceback__', sys.exc_info()[2])
+            )
+        )
+
+        if suppressed is None:
+            return
+
         event = Event(
             exception,
             self.configuration,
@@ -92,6 +120,8 @@ class Client:
             feature_flag_delegate=self._context.feature_flag_delegate
         )
 
+        self._add_sampling_tab(event, sample_rate)
+        self._add_rate_limit_tab(event, suppressed)
         self._leave_breadcrumb_for_event(event)
         self.deliver(event, asynchronous=asynchronous)
 
@@ -105,6 +135,25 @@ class Client:
 
         exception = exc_value
         options['traceback'] = traceback
+
+        # filtered exceptions mustn't be sampled or use up the rate limit
+        if self._is_filtered(exception):
+            return
+
+        sample_rate = self._sample(options)
+
+        if sample_rate is None:
+            return
+
+        suppressed = self._rate_limiter.acquire(
+            self.configuration,
+            exception,
+            traceback
+        )
+
+        if suppressed is None:
+            return
+
         event = Event(
             exception,
             self.configuration,
@@ -113,6 +162,8 @@ class Client:
             feature_flag_delegate=self._context.feature_flag_delegate
         )
 
+        self._add_sampling_tab(event, sample_rate)
+        self._add_rate_limit_tab(event, suppressed)
         self._leave_breadcrumb_for_event(event)
         self.deliver(event, asynchronous=asynchronous)
 
@@ -191,28 +242,15 @@ class Client:
                 else:
                     event.severity_reason = initial_reason
 
-                payload = event._payload()
-
-                post_delivery_callback = self._request_tracker.new_request()
-                options = {'post_delivery_callback': post_delivery_callback}
-
-                if asynchronous is not None:
-                    options['asynchronous'] = asynchronous
-
-                try:
-                    self.configuration.delivery.deliver(
+                if self._should_batch(asynchronous):
+                    self._batcher.add(
                         self.configuration,
-                        payload,
-                        options
-                    )
-                except Exception as e:
-                    self.configuration.logger.exception(
-                        'Notifying Bugsnag failed %s',
-                        e
+                        event.api_key,
+                        event._event_payload(),
+                        self._request_tracker.new_request()
                     )
-
-                    # ensure this request is not still marked as in-flight
-                    post_delivery_callback()
+                else:
+                    self._send_event(event, asynchronous)
 
                 # Trigger session delivery
                 self.session_tracker.send_sessions()
@@ -221,6 +259,54 @@ class Client:
 
         self.configuration.internal_middleware.run(event, run_middleware)
 
+    def _send_event(self, event: Event,
+                    asynchronous: Optional[bool]) -> None:
+        if self.configuration.lazy_events:
+            # the event is encoded when the delivery first reads the body
+            payload = DeliveryPayload.deferred(
+                event._encoded_payload,
+                event.api_key
+            )
+        else:
+            payload = DeliveryPayload(
+                event._encoded_payload(),
+                event.api_key
+            )
+
+        deliver = self.configuration.delivery.deliver
+
+        post_delivery_callback = self._request_tracker.new_request()
+        options = {
+            'post_delivery_callback': post_delivery_callback
+        }  # type: Dict[str, Any]
+
+        if asynchronous is not None:
+            options['asynchronous'] = asynchronous
+
+        try:
+            deliver(
+                self.configuration,
+                payload_for(deliver, payload),
+                options
+            )
+        except Exception as e:
+            self.configuration.logger.exception(
+                'Notifying Bugsnag failed %s',
+                e
+            )
+
+            # ensure this request is not still marked as in-flight
+            post_delivery_callback()
+
+    def _should_batch(self, asynchronous: Optional[bool]) -> bool:
+        # events that have been asked to be sent synchronously can't wait to
+        # be batched
+        return (
+            self.configuration.batch_events and
+            self.configuration.asynchronous and
+            asynchronous is not False
+        )
+
     def should_deliver(self, event: Event) -> bool:
         # Return early if we shouldn't notify for current release stage
         if not self.configuration.should_notify():
@@ -323,6 +409,66 @@ class Client:
         if type in self.configuration.enabled_breadcrumb_types:
             self.leave_breadcrumb(message, metadata, type)
 
+    def _is_filtered(self, exception: BaseException) -> bool:
+        """
+        Check if an exception won't be reported because of the release stage
+        or 'ignore_classes', before an event is created for it. Events are
+        checked again by 'should_deliver'
+        """
+        if not self.configuration.should_notify():
+            return True
+
+        ignore_classes = self.configuration.ignore_classes
+
+        if not ignore_classes:
+            return False
+
+        # match the errors of the event, which include the exception's causes
+        seen = set()
+
+        while (
+            isinstance(exception, BaseException) and
+            id(exception) not in seen
+        ):
+            if fully_qualified_class_name(exception) in ignore_classes:
+                return True
+
+            seen.add(id(exception))
+
+            if exception.__cause__:
+                exception = exception.__cause__
+            elif exception.__context__ and not exception.__suppress_context__:
+                exception = exception.__context__
+            else:
+                break
+
+        return False
+
+    def _sample(self, options: Dict[str, Any]) -> Optional[float]:
+        # unhandled events are always reported
+        if options.get('unhandled', False):
+            return 1.0
+
+        severity = options.get('severity', 'warning')
+        if severity not in Event.SUPPORTED_SEVERITIES:
+            severity = 'warning'
+
+        severity_reason = options.get('severity_reason') or {}
+
+        return self._sampler.sample(
+            self.configuration,
+            severity,
+            severity_reason.get('type', 'handledException')
+        )
+
+    def _add_sampling_tab(self, event: Event, sample_rate: float) -> None:
+        if sample_rate < 1:
+            event.add_tab('sampling', {'rate': sample_rate})
+
+    def _add_rate_limit_tab(self, event: Event, suppressed: int) -> None:
+        if suppressed > 0:
+            event.add_tab('rate limit', {'suppressedEvents': suppressed})
+
     def _leave_breadcrumb_for_event(self, event: Event) -> None:
         error_class = event.errors[0].error_class
 
@@ -338,6 +484,9 @@ class Client:
         )
 
     def flush(self, timeout_ms: int) -> None:
+        # send any events that are waiting to be batched
+        self._batcher.flush()
+
         # trigger session delivery as there may be outstanding sessions that
         # haven't been sent yet
         self.session_tracker.send_sessions()
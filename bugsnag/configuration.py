@@ -3,7 +3,7 @@ import platform
 import socket
 import sys
 import sysconfig
-from typing import List, Any, Tuple, Union, Optional
+from typing import Dict, List, Any, Tuple, Union, Optional
 import warnings
 import logging
 from threading import Lock
@@ -22,19 +22,40 @@ from bugsnag.middleware import (
 )
 from bugsnag.utils import (
     fully_qualified_class_name,
+    KeywordMatcher,
     partly_qualified_class_name,
     validate_str_setter,
     validate_bool_setter,
     validate_iterable_setter,
+    validate_dict_setter,
     validate_required_str_setter,
     validate_int_setter,
-    validate_path_setter
+    validate_number_setter,
+    validate_path_setter,
+    MAX_PAYLOAD_LENGTH,
+    SanitizingJSONEncoder
 )
 from bugsnag.delivery import (create_default_delivery,
                               DEFAULT_ENDPOINT,
                               DEFAULT_SESSIONS_ENDPOINT,
                               SECONDARY_ENDPOINT,
                               SECONDARY_SESSIONS_ENDPOINT)
+from bugsnag.circuit_breaker import FALLBACKS, FALLBACK_SPOOL
+from bugsnag.encoders import TypeEncoder, default_type_encoders
+from bugsnag.executor import OVERFLOW_POLICIES, OVERFLOW_DROP_NEWEST
+from bugsnag.frames import (
+    FrameClassifier,
+    exclude_module_paths,
+    get_frame_classifier
+)
+from bugsnag.snippets import DEFAULT_MAX_BYTES, SnippetCache
+from bugsnag.serializers import (
+    get_serializer,
+    is_available,
+    JSON_BACKENDS,
+    JSON_BACKEND_STDLIB,
+    Serializer
+)
 from bugsnag.uwsgi import warn_if_running_uwsgi_without_threads
 from bugsnag.error import Error
 
@@ -70,6 +91,9 @@ class Configuration:
 
     def __init__(self, logger=_sentinel):
         self._mutex = Lock()
+        self._payload_fragments = {}  # type: Dict[str, Tuple[Any, bytes]]
+        self._type_encoders = default_type_encoders()
+        self._snippet_cache = SnippetCache()
 
         self.api_key = os.environ.get('BUGSNAG_API_KEY', None)
         self.release_stage = os.environ.get("BUGSNAG_RELEASE_STAGE",
@@ -77,6 +101,9 @@ class Configuration:
         self.notify_release_stages = None
         self.auto_notify = True
         self.send_code = True
+        self.send_code_out_of_project = True
+        self.code_cache_max_bytes = DEFAULT_MAX_BYTES
+        self.code_cache_validate = True
         self.send_environment = False
         self.asynchronous = True
         self.delivery = create_default_delivery()
@@ -120,6 +147,48 @@ class Configuration:
         self._breadcrumbs = Breadcrumbs(self.max_breadcrumbs)
         self._on_breadcrumbs = []
 
+        self.delivery_worker_count = 2
+        self.delivery_queue_size = 100
+        self.delivery_overflow_policy = OVERFLOW_DROP_NEWEST
+        self.delivery_block_timeout = 1.0
+
+        self.batch_events = False
+        self.lazy_events = False
+        self.batch_linger_ms = 200
+        self.batch_max_events = 50
+        self.batch_max_bytes = MAX_PAYLOAD_LENGTH * 4
+
+        self.compress_payloads = False
+        self.compression_level = 6
+        self.compression_threshold = 1024
+
+        self._spool_directory = None  # type: Optional[str]
+        self.spool_max_bytes = 10 * 1024 * 1024
+        self.spool_max_files = 1000
+
+        self.delivery_max_retries = 3
+        self.delivery_retry_base_delay = 1.0
+        self.delivery_retry_max_delay = 30.0
+
+        self.circuit_breaker_threshold = 5
+        self.circuit_breaker_cooldown = 30.0
+        self.circuit_breaker_fallback = FALLBACK_SPOOL
+
+        self.rate_limit_per_key = 0
+        self.rate_limit_burst = 10
+        self.rate_limit_global = 0
+
+        self.sample_rates = {}
+        self.sample_max_events_per_second = 0
+
+        self.json_backend = JSON_BACKEND_STDLIB
+
+        self.metadata_max_depth = 20
+        self.metadata_max_keys = 1000
+        self.metadata_max_items = 1000
+        self.metadata_max_nodes = 10000
+        self.stacktrace_max_frames = 200
+
     def configure(self, api_key=None, app_type=None, app_version=None,
                   asynchronous=None, auto_notify=None,
                   auto_capture_sessions=None, delivery=None, endpoint=None,
@@ -129,7 +198,26 @@ class Configuration:
                   send_code=None, send_environment=None, session_endpoint=None,
                   traceback_exclude_modules=None, logger=_sentinel,
                   breadcrumb_log_level=None, enabled_breadcrumb_types=None,
-                  max_breadcrumbs=None):
+                  max_breadcrumbs=None, delivery_worker_count=None,
+                  delivery_queue_size=None, delivery_overflow_policy=None,
+                  delivery_block_timeout=None, batch_events=None,
+                  batch_linger_ms=None, batch_max_events=None,
+                  batch_max_bytes=None, compress_payloads=None,
+                  compression_level=None, compression_threshold=None,
+                  spool_directory=None, spool_max_bytes=None,
+                  spool_max_files=None, delivery_max_retries=None,
+                  delivery_retry_base_delay=None,
+                  delivery_retry_max_delay=None,
+                  circuit_breaker_threshold=None,
+                  circuit_breaker_cooldown=None,
+                  circuit_breaker_fallback=None, rate_limit_per_key=None,
+                  rate_limit_burst=None, rate_limit_global=None,
+                  sample_rates=None, sample_max_events_per_second=None,
+                  json_backend=None, metadata_max_depth=None,
+                  metadata_max_keys=None, metadata_max_items=None,
+                  metadata_max_nodes=None, send_code_out_of_project=None,
+                  code_cache_max_bytes=None, code_cache_validate=None,
+                  lazy_events=None, stacktrace_max_frames=None):
         """
         Validate and set configuration options. Will warn if an option is of an
         incorrect type.
@@ -164,6 +252,12 @@ class Configuration:
             self.release_stage = release_stage
         if send_code is not None:
             self.send_code = send_code
+        if send_code_out_of_project is not None:
+            self.send_code_out_of_project = send_code_out_of_project
+        if code_cache_max_bytes is not None:
+            self.code_cache_max_bytes = code_cache_max_bytes
+        if code_cache_validate is not None:
+            self.code_cache_validate = code_cache_validate
         if send_environment is not None:
             self.send_environment = send_environment
         if traceback_exclude_modules is not None:
@@ -176,6 +270,75 @@ class Configuration:
             self.enabled_breadcrumb_types = enabled_breadcrumb_types
         if max_breadcrumbs is not None:
             self.max_breadcrumbs = max_breadcrumbs
+        if delivery_worker_count is not None:
+            self.delivery_worker_count = delivery_worker_count
+        if delivery_queue_size is not None:
+            self.delivery_queue_size = delivery_queue_size
+        if delivery_overflow_policy is not None:
+            self.delivery_overflow_policy = delivery_overflow_policy
+        if delivery_block_timeout is not None:
+            self.delivery_block_timeout = delivery_block_timeout
+        if batch_events is not None:
+            self.batch_events = batch_events
+        if lazy_events is not None:
+            self.lazy_events = lazy_events
+        if batch_linger_ms is not None:
+            self.batch_linger_ms = batch_linger_ms
+        if batch_max_events is not None:
+            self.batch_max_events = batch_max_events
+        if batch_max_bytes is not None:
+            self.batch_max_bytes = batch_max_bytes
+        if compress_payloads is not None:
+            self.compress_payloads = compress_payloads
+        if compression_level is not None:
+            self.compression_level = compression_level
+        if compression_threshold is not None:
+            self.compression_threshold = compression_threshold
+        if spool_max_bytes is not None:
+            self.spool_max_bytes = spool_max_bytes
+        if spool_max_files is not None:
+            self.spool_max_files = spool_max_files
+        if delivery_max_retries is not None:
+            self.delivery_max_retries = delivery_max_retries
+        if delivery_retry_base_delay is not None:
+            self.delivery_retry_base_delay = delivery_retry_base_delay
+        if delivery_retry_max_delay is not None:
+            self.delivery_retry_max_delay = delivery_retry_max_delay
+        if circuit_breaker_threshold is not None:
+            self.circuit_breaker_threshold = circuit_breaker_threshold
+        if circuit_breaker_cooldown is not None:
+            self.circuit_breaker_cooldown = circuit_breaker_cooldown
+        if circuit_breaker_fallback is not None:
+            self.circuit_breaker_fallback = circuit_breaker_fallback
+        if rate_limit_per_key is not None:
+            self.rate_limit_per_key = rate_limit_per_key
+        if rate_limit_burst is not None:
+            self.rate_limit_burst = rate_limit_burst
+        if rate_limit_global is not None:
+            self.rate_limit_global = rate_limit_global
+        if sample_rates is not None:
+            self.sample_rates = sample_rates
+        if sample_max_events_per_second is not None:
+            self.sample_max_events_per_second = sample_max_events_per_second
+        if json_backend is not None:
+            self.json_backend = json_backend
+        if metadata_max_depth is not None:
+            self.metadata_max_depth = metadata_max_depth
+        if metadata_max_keys is not None:
+            self.metadata_max_keys = metadata_max_keys
+        if metadata_max_items is not None:
+            self.metadata_max_items = metadata_max_items
+        if metadata_max_nodes is not None:
+            self.metadata_max_nodes = metadata_max_nodes
+        if stacktrace_max_frames is not None:
+            self.stacktrace_max_frames = stacktrace_max_frames
+        if spool_directory is not None:
+            self.spool_directory = spool_directory
+
+            # replay anything left in the spool by a previous process
+            get_spool = getattr(self.delivery, 'get_spool', None)
+            if callable(get_spool):
+                get_spool(self)
 
         # Default endpoints depend on the API key
         if api_key is not None:
@@ -216,6 +379,7 @@ class Configuration:
     @validate_str_setter
     def app_type(self, value: str):
         self._app_type = value
+        self._payload_fragments = {}
 
     @property
     def app_version(self):
@@ -228,6 +392,7 @@ class Configuration:
     @validate_str_setter
     def app_version(self, value: str):
         self._app_version = value
+        self._payload_fragments = {}
 
     @property
     def asynchronous(self):
@@ -335,6 +500,7 @@ class Configuration:
     @validate_str_setter
     def hostname(self, value: str):
         self._hostname = value
+        self._payload_fragments = {}
 
     @property
     def ignore_classes(self):
@@ -363,6 +529,7 @@ class Configuration:
     @validate_str_setter
     def lib_root(self, value: str):
         self._lib_root = value
+        self._payload_fragments = {}
 
     @property
     def notify_release_stages(self):
@@ -395,6 +562,28 @@ class Configuration:
     @validate_iterable_setter
     def params_filters(self, value: List[str]):
         self._params_filters = value
+        self._keyword_matcher = None  # type: Optional[Tuple[List[str], KeywordMatcher]]  # noqa: E501
+        self._payload_fragments = {}
+
+    def _get_keyword_matcher(self) -> KeywordMatcher:
+        """
+        The matcher for the current params_filters, which is shared by every
+        encoder so that decisions for keys are cached between payloads
+        """
+        keywords = list(self.params_filters or [])
+
+        # the list of filters can be changed in place, so compare it rather
+        # than relying on the setter being called
+        if (
+            self._keyword_matcher is None or
+            self._keyword_matcher[0] != keywords
+        ):
+            self._keyword_matcher = (keywords, KeywordMatcher(keywords))
+
+            # cached fragments may contain values which are now filtered
+            self._payload_fragments = {}
+
+        return self._keyword_matcher[1]
 
     @property
     def project_root(self):
@@ -410,6 +599,7 @@ class Configuration:
     @validate_path_setter
     def project_root(self, value: Union[str, PathLike]):
         self._project_root = str(value)
+        self._payload_fragments = {}
 
     @property
     def proxy_host(self):
@@ -436,6 +626,7 @@ class Configuration:
     @validate_str_setter
     def release_stage(self, value: str):
         self._release_stage = value
+        self._payload_fragments = {}
 
     @property
     def send_code(self):
@@ -450,6 +641,57 @@ class Configuration:
     def send_code(self, value: bool):
         self._send_code = value
 
+    @property
+    def send_code_out_of_project(self) -> bool:
+        """
+        If code should be sent for traceback locations outside of the
+        project, like in libraries, when send_code is enabled
+        """
+        return self._send_code_out_of_project
+
+    @send_code_out_of_project.setter  # type: ignore
+    @validate_bool_setter
+    def send_code_out_of_project(self, value: bool) -> None:
+        self._send_code_out_of_project = value
+
+    @property
+    def code_cache_max_bytes(self) -> int:
+        """
+        The approximate total size in bytes of the code sent with events
+        which is kept in memory, so it isn't read again for traceback
+        locations seen before. The least recently used code is discarded
+        first. Set to 0 to read code for every event
+        """
+        return self._snippet_cache.max_bytes
+
+    @code_cache_max_bytes.setter  # type: ignore
+    @validate_int_setter
+    def code_cache_max_bytes(self, value: int) -> None:
+        if value >= 0:
+            self._snippet_cache.resize(value)
+        else:
+            message = (
+                'code_cache_max_bytes should be a non-negative int, got "{}"'
+            ).format(value)
+
+            warnings.warn(message, RuntimeWarning)
+
+    @property
+    def code_cache_validate(self) -> bool:
+        """
+        If the modification time and size of source files should be checked
+        before using code kept from earlier events, so changes to the files
+        are picked up
+        """
+        return self._snippet_cache.validate
+
+    @code_cache_validate.setter  # type: ignore
+    @validate_bool_setter
+    def code_cache_validate(self, value: bool) -> None:
+        with self._mutex:
+            self._snippet_cache.validate = value
+            self._snippet_cache.clear()
+
     @property
     def send_environment(self):
         """
@@ -489,6 +731,29 @@ class Configuration:
     @validate_iterable_setter
     def traceback_exclude_modules(self, value: List[str]):
         self._traceback_exclude_modules = value
+        self._exclude_paths = None  # type: Optional[Tuple[List[Any], Tuple[str, ...]]]  # noqa: E501
+
+    def _get_frame_classifier(self) -> FrameClassifier:
+        """
+        The classifier for the current lib_root, project_root and
+        traceback_exclude_modules, which caches how frames from each file
+        appear in stacktraces
+        """
+        modules = list(self.traceback_exclude_modules or [])
+
+        # the list of modules can be changed in place, so compare it rather
+        # than relying on the setter being called
+        if self._exclude_paths is None or self._exclude_paths[0] != modules:
+            self._exclude_paths = (
+                modules,
+                exclude_module_paths(modules, self.logger)
+            )
+
+        return get_frame_classifier(
+            self.lib_root,
+            self.project_root,
+            self._exclude_paths[1]
+        )
 
     @property
     def logger(self) -> logging.Logger:
@@ -534,6 +799,718 @@ class Configuration:
     def breadcrumbs(self) -> List[Breadcrumb]:
         return self._breadcrumbs.to_list()
 
+    @property
+    def delivery_worker_count(self) -> int:
+        """
+        The number of background threads used to send asynchronous requests
+        """
+        return self._delivery_worker_count
+
+    @delivery_worker_count.setter  # type: ignore
+    @validate_int_setter
+    def delivery_worker_count(self, value: int) -> None:
+        if value > 0:
+            self._delivery_worker_count = value
+        else:
+            message = (
+                'delivery_worker_count should be a positive int, got "{}"'
+            ).format(value)
+
+            warnings.warn(message, RuntimeWarning)
+
+    @property
+    def delivery_queue_size(self) -> int:
+        """
+        The maximum number of asynchronous requests which can be waiting for a
+        delivery thread. What happens to requests beyond this limit is
+        controlled by delivery_overflow_policy
+        """
+        return self._delivery_queue_size
+
+    @delivery_queue_size.setter  # type: ignore
+    @validate_int_setter
+    def delivery_queue_size(self, value: int) -> None:
+        if value > 0:
+            self._delivery_queue_size = value
+        else:
+            message = (
+                'delivery_queue_size should be a positive int, got "{}"'
+            ).format(value)
+
+            warnings.warn(message, RuntimeWarning)
+
+    @property
+    def delivery_overflow_policy(self) -> str:
+        """
+        What to do with a new request when the delivery queue is full:
+
+        * "drop_newest" discards the new request (the default)
+        * "drop_oldest" discards the longest-waiting request
+        * "block" waits up to delivery_block_timeout seconds for space in the
+          queue before discarding the new request
+        """
+        return self._delivery_overflow_policy
+
+    @delivery_overflow_policy.setter  # type: ignore
+    @validate_str_setter
+    def delivery_overflow_policy(self, value: str) -> None:
+        if value in OVERFLOW_POLICIES:
+            self._delivery_overflow_policy = value
+        else:
+            message = (
+                'delivery_overflow_policy should be one of {}, got "{}"'
+            ).format(', '.join(OVERFLOW_POLICIES), value)
+
+            warnings.warn(message, RuntimeWarning)
+
+    @property
+    def delivery_block_timeout(self) -> float:
+        """
+        The number of seconds to wait for space in a full delivery queue when
+        delivery_overflow_policy is "block"
+        """
+        return self._delivery_block_timeout
+
+    @delivery_block_timeout.setter  # type: ignore
+    @validate_number_setter
+    def delivery_block_timeout(self, value: float) -> None:
+        if value >= 0:
+            self._delivery_block_timeout = value
+        else:
+            message = (
+                'delivery_block_timeout should be a non-negative number, '
+                'got "{}"'
+            ).format(value)
+
+            warnings.warn(message, RuntimeWarning)
+
+    @property
+    def batch_events(self) -> bool:
+        """
+        If asynchronously delivered events should be collected into batches
+        which are sent as a single request. Events sharing an API key are
+        batched until batch_linger_ms has passed or the batch reaches
+        batch_max_events events or batch_max_bytes bytes
+        """
+        return self._batch_events
+
+    @batch_events.setter  # type: ignore
+    @validate_bool_setter
+    def batch_events(self, value: bool) -> None:
+        self._batch_events = value
+
+    @property
+    def lazy_events(self) -> bool:
+        """
+        If building stacktraces, reading the code around them and encoding
+        events should be left to the delivery thread for asynchronously
+        delivered events, rather than done by the thread which notifies.
+        Middleware and callbacks still run when notifying, and stacktraces
+        are built then if they read them.
+
+        Metadata is encoded after notify returns, so values in it shouldn't
+        be changed afterwards. Batched events are encoded when they are
+        added to a batch, and events sent by a custom delivery which only
+        accepts strings are encoded before being passed to it
+        """
+        return self._lazy_events
+
+    @lazy_events.setter  # type: ignore
+    @validate_bool_setter
+    def lazy_events(self, value: bool) -> None:
+        self._lazy_events = value
+
+    @property
+    def batch_linger_ms(self) -> int:
+        """
+        The maximum time in milliseconds an event waits for a batch to fill
+        up before the batch is sent
+        """
+        return self._batch_linger_ms
+
+    @batch_linger_ms.setter  # type: ignore
+    @validate_int_setter
+    def batch_linger_ms(self, value: int) -> None:
+        if value >= 0:
+            self._batch_linger_ms = value
+        else:
+            message = (
+                'batch_linger_ms should be a non-negative int, got "{}"'
+            ).format(value)
+
+            warnings.warn(message, RuntimeWarning)
+
+    @property
+    def batch_max_events(self) -> int:
+        """
+        The maximum number of events sent in a single batch
+        """
+        return self._batch_max_events
+
+    @batch_max_events.setter  # type: ignore
+    @validate_int_setter
+    def batch_max_events(self, value: int) -> None:
+        if value > 0:
+            self._batch_max_events = value
+        else:
+            message = (
+                'batch_max_events should be a positive int, got "{}"'
+            ).format(value)
+
+            warnings.warn(message, RuntimeWarning)
+
+    @property
+    def batch_max_bytes(self) -> int:
+        """
+        The maximum combined size of the encoded events in a single batch
+        """
+        return self._batch_max_bytes
+
+    @batch_max_bytes.setter  # type: ignore
+    @validate_int_setter
+    def batch_max_bytes(self, value: int) -> None:
+        if value > 0:
+            self._batch_max_bytes = value
+        else:
+            message = (
+                'batch_max_bytes should be a positive int, got "{}"'
+            ).format(value)
+
+            warnings.warn(message, RuntimeWarning)
+
+    @property
+    def compress_payloads(self) -> bool:
+        """
+        If event and session payloads should be sent gzip-compressed. Payloads
+        smaller than compression_threshold bytes are always sent uncompressed
+        """
+        return self._compress_payloads
+
+    @compress_payloads.setter  # type: ignore
+    @validate_bool_setter
+    def compress_payloads(self, value: bool) -> None:
+        self._compress_payloads = value
+
+    @property
+    def compression_level(self) -> int:
+        """
+        The gzip compression level to use, from 1 (fastest) to 9 (smallest)
+        """
+        return self._compression_level
+
+    @compression_level.setter  # type: ignore
+    @validate_int_setter
+    def compression_level(self, value: int) -> None:
+        if 1 <= value <= 9:
+            self._compression_level = value
+        else:
+            message = (
+                'compression_level should be an int between 1 and 9, got "{}"'
+            ).format(value)
+
+            warnings.warn(message, RuntimeWarning)
+
+    @property
+    def compression_threshold(self) -> int:
+        """
+        The minimum size in bytes of a payload for it to be compressed
+        """
+        return self._compression_threshold
+
+    @compression_threshold.setter  # type: ignore
+    @validate_int_setter
+    def compression_threshold(self, value: int) -> None:
+        if value >= 0:
+            self._compression_threshold = value
+        else:
+            message = (
+                'compression_threshold should be a non-negative int, got "{}"'
+            ).format(value)
+
+            warnings.warn(message, RuntimeWarning)
+
+    @property
+    def spool_directory(self) -> Optional[str]:
+        """
+        A directory to save payloads which could not be delivered to, so they
+        can be sent once the endpoint is reachable again, including by a later
+        process. Spooling is disabled when this is None
+        """
+        return self._spool_directory
+
+    @spool_directory.setter  # type: ignore
+    @validate_path_setter
+    def spool_directory(self, value: Union[str, PathLike]) -> None:
+        self._spool_directory = str(value)
+
+    @property
+    def spool_max_bytes(self) -> int:
+        """
+        The maximum total size of the spool directory in bytes. The oldest
+        payloads are discarded to make room for new ones
+        """
+        return self._spool_max_bytes
+
+    @spool_max_bytes.setter  # type: ignore
+    @validate_int_setter
+    def spool_max_bytes(self, value: int) -> None:
+        if value > 0:
+            self._spool_max_bytes = value
+        else:
+            message = (
+                'spool_max_bytes should be a positive int, got "{}"'
+            ).format(value)
+
+            warnings.warn(message, RuntimeWarning)
+
+    @property
+    def spool_max_files(self) -> int:
+        """
+        The maximum number of payloads kept in the spool directory. The oldest
+        payloads are discarded to make room for new ones
+        """
+        return self._spool_max_files
+
+    @spool_max_files.setter  # type: ignore
+    @validate_int_setter
+    def spool_max_files(self, value: int) -> None:
+        if value > 0:
+            self._spool_max_files = value
+        else:
+            message = (
+                'spool_max_files should be a positive int, got "{}"'
+            ).format(value)
+
+            warnings.warn(message, RuntimeWarning)
+
+    @property
+    def delivery_max_retries(self) -> int:
+        """
+        The number of times an asynchronous request is retried after a network
+        error or a 5xx, 408 or 429 response. Retries wait for an exponentially
+        increasing delay, or for the delay given by a Retry-After header
+        """
+        return self._delivery_max_retries
+
+    @delivery_max_retries.setter  # type: ignore
+    @validate_int_setter
+    def delivery_max_retries(self, value: int) -> None:
+        if value >= 0:
+            self._delivery_max_retries = value
+        else:
+            message = (
+                'delivery_max_retries should be a non-negative int, got "{}"'
+            ).format(value)
+
+            warnings.warn(message, RuntimeWarning)
+
+    @property
+    def delivery_retry_base_delay(self) -> float:
+        """
+        The number of seconds to wait before the first retry. The delay doubles
+        for each retry after that, up to delivery_retry_max_delay
+        """
+        return self._delivery_retry_base_delay
+
+    @delivery_retry_base_delay.setter  # type: ignore
+    @validate_number_setter
+    def delivery_retry_base_delay(self, value: float) -> None:
+        if value > 0:
+            self._delivery_retry_base_delay = value
+        else:
+            message = (
+                'delivery_retry_base_delay should be a positive number, '
+                'got "{}"'
+            ).format(value)
+
+            warnings.warn(message, RuntimeWarning)
+
+    @property
+    def delivery_retry_max_delay(self) -> float:
+        """
+        The longest number of seconds to wait before retrying a request. A
+        request is not retried if the server asks for a longer delay
+        """
+        return self._delivery_retry_max_delay
+
+    @delivery_retry_max_delay.setter  # type: ignore
+    @validate_number_setter
+    def delivery_retry_max_delay(self, value: float) -> None:
+        if value > 0:
+            self._delivery_retry_max_delay = value
+        else:
+            message = (
+                'delivery_retry_max_delay should be a positive number, '
+                'got "{}"'
+            ).format(value)
+
+            warnings.warn(message, RuntimeWarning)
+
+    @property
+    def circuit_breaker_threshold(self) -> int:
+        """
+        The number of consecutive failed requests to an endpoint after which
+        requests to it fail fast for circuit_breaker_cooldown seconds. Set to
+        0 to disable the circuit breaker
+        """
+        return self._circuit_breaker_threshold
+
+    @circuit_breaker_threshold.setter  # type: ignore
+    @validate_int_setter
+    def circuit_breaker_threshold(self, value: int) -> None:
+        if value >= 0:
+            self._circuit_breaker_threshold = value
+        else:
+            message = (
+                'circuit_breaker_threshold should be a non-negative int, '
+                'got "{}"'
+            ).format(value)
+
+            warnings.warn(message, RuntimeWarning)
+
+    @property
+    def circuit_breaker_cooldown(self) -> float:
+        """
+        The number of seconds an open circuit breaker waits before letting a
+        trial request through
+        """
+        return self._circuit_breaker_cooldown
+
+    @circuit_breaker_cooldown.setter  # type: ignore
+    @validate_number_setter
+    def circuit_breaker_cooldown(self, value: float) -> None:
+        if value > 0:
+            self._circuit_breaker_cooldown = value
+        else:
+            message = (
+                'circuit_breaker_cooldown should be a positive number, '
+                'got "{}"'
+            ).format(value)
+
+            warnings.warn(message, RuntimeWarning)
+
+    @property
+    def circuit_breaker_fallback(self) -> str:
+        """
+        What happens to payloads rejected by an open circuit breaker:
+
+        * "spool" saves them to the spool directory to be sent later, or drops
+          them if spool_directory isn't set
+        * "drop" discards them
+        """
+        return self._circuit_breaker_fallback
+
+    @circuit_breaker_fallback.setter  # type: ignore
+    @validate_str_setter
+    def circuit_breaker_fallback(self, value: str) -> None:
+        if value in FALLBACKS:
+            self._circuit_breaker_fallback = value
+        else:
+            message = (
+                'circuit_breaker_fallback should be one of {}, got "{}"'
+            ).format(', '.join(FALLBACKS), value)
+
+            warnings.warn(message, RuntimeWarning)
+
+    @property
+    def rate_limit_per_key(self) -> float:
+        """
+        The number of events per second that can be reported for each error,
+        identified by its class and the innermost in-project frame. Errors
+        over the limit are discarded before an event is created and counted
+        in the "rate limit" tab of the next event sent for that error. Set to
+        0 to turn the limit off
+        """
+        return self._rate_limit_per_key
+
+    @rate_limit_per_key.setter  # type: ignore
+    @validate_number_setter
+    def rate_limit_per_key(self, value: float) -> None:
+        if value >= 0:
+            self._rate_limit_per_key = value
+        else:
+            message = (
+                'rate_limit_per_key should be a non-negative number, got "{}"'
+            ).format(value)
+
+            warnings.warn(message, RuntimeWarning)
+
+    @property
+    def rate_limit_burst(self) -> int:
+        """
+        The number of events for a single error which can be reported at once
+        before rate_limit_per_key applies
+        """
+        return self._rate_limit_burst
+
+    @rate_limit_burst.setter  # type: ignore
+    @validate_int_setter
+    def rate_limit_burst(self, value: int) -> None:
+        if value > 0:
+            self._rate_limit_burst = value
+        else:
+            message = (
+                'rate_limit_burst should be a positive int, got "{}"'
+            ).format(value)
+
+            warnings.warn(message, RuntimeWarning)
+
+    @property
+    def rate_limit_global(self) -> float:
+        """
+        The number of events per second that can be reported across all
+        errors. Set to 0 to turn the limit off
+        """
+        return self._rate_limit_global
+
+    @rate_limit_global.setter  # type: ignore
+    @validate_number_setter
+    def rate_limit_global(self, value: float) -> None:
+        if value >= 0:
+            self._rate_limit_global = value
+        else:
+            message = (
+                'rate_limit_global should be a non-negative number, got "{}"'
+            ).format(value)
+
+            warnings.warn(message, RuntimeWarning)
+
+    @property
+    def sample_rates(self) -> Dict[str, float]:
+        """
+        The proportion of handled events to report, from 0 to 1, keyed by
+        severity reason type (such as 'handledException') or severity (such
+        as 'info'). The severity reason type is checked first and events
+        without a rate are always reported. Unhandled events are never
+        sampled. Sampled events record their rate in the "sampling" tab
+        """
+        return self._sample_rates
+
+    @sample_rates.setter  # type: ignore
+    @validate_dict_setter
+    def sample_rates(self, value: Dict[str, float]) -> None:
+        for key, rate in value.items():
+            if (
+                not isinstance(rate, (int, float)) or
+                isinstance(rate, bool) or
+                not 0 <= rate <= 1
+            ):
+                message = (
+                    'sample_rates should contain numbers between 0 and 1, '
+                    'got "{}" for "{}"'
+                ).format(rate, key)
+
+                warnings.warn(message, RuntimeWarning)
+
+                return
+
+        self._sample_rates = dict(value)
+
+    @property
+    def sample_max_events_per_second(self) -> float:
+        """
+        The maximum number of handled events per second to report on
+        average. When more are being reported, the sample rates are scaled
+        down automatically to match. Set to 0 to turn adaptive sampling off
+        """
+        return self._sample_max_events_per_second
+
+    @sample_max_events_per_second.setter  # type: ignore
+    @validate_number_setter
+    def sample_max_events_per_second(self, value: float) -> None:
+        if value >= 0:
+            self._sample_max_events_per_second = value
+        else:
+            message = (
+                'sample_max_events_per_second should be a non-negative '
+                'number, got "{}"'
+            ).format(value)
+
+            warnings.warn(message, RuntimeWarning)
+
+    @property
+    def json_backend(self) -> str:
+        """
+        The library used to serialize payloads:
+
+        * "json" uses the standard library's json module (the default)
+        * "orjson" or "ujson" use that library if it's installed
+        * "auto" uses orjson or ujson if either is installed, falling back to
+          the standard library
+
+        Payloads are filtered and sanitized the same way whichever is used.
+        """
+        return self._json_backend
+
+    @json_backend.setter  # type: ignore
+    @validate_str_setter
+    def json_backend(self, value: str) -> None:
+        if value not in JSON_BACKENDS:
+            message = (
+                'json_backend should be one of {}, got "{}"'
+            ).format(', '.join(JSON_BACKENDS), value)
+
+            warnings.warn(message, RuntimeWarning)
+
+            return
+
+        if not is_available(value):
+            message = (
+                'json_backend is "{}" but it is not installed, the standard '
+                'library will be used instead'
+            ).format(value)
+
+            warnings.warn(message, RuntimeWarning)
+
+        self._json_backend = value
+        self._payload_fragments = {}
+
+    def _get_payload_fragment(self, name: str, key: Tuple[Any, ...],
+                              fields: Dict[str, Any],
+                              encoder: SanitizingJSONEncoder) -> bytes:
+        """
+        Get the encoded members of a JSON object made from 'fields', without
+        the surrounding braces, so they can be spliced into a payload.
+
+        These are parts of payloads which rarely change, like the device and
+        app details. Setting any of the options they are made from, or
+        params_filters or json_backend, invalidates every fragment. 'key'
+        holds the rest of the values used, like those which events can
+        override, and the fragment is encoded again when it differs from the
+        last time.
+        """
+        cached = self._payload_fragments.get(name)
+
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        fragment = encoder.encode_bytes(fields)[1:-1]
+
+        # dicts like runtime_versions can be changed in place, so a copy is
+        # kept to compare with
+        key = tuple(
+            dict(value) if isinstance(value, dict) else value
+            for value in key
+        )
+        self._payload_fragments[name] = (key, fragment)
+
+        return fragment
+
+    def _get_serializer(self) -> Optional[Serializer]:
+        """
+        The serializer for the current json_backend, or None if payloads
+        should be encoded by the standard library
+        """
+        return get_serializer(self.json_backend)
+
+    @property
+    def metadata_max_depth(self) -> int:
+        """
+        The number of levels of nesting in metadata, user data and breadcrumb
+        metadata to report. Deeper dicts, lists, tuples and sets are replaced
+        with a placeholder saying how big they were. Set to 0 to report every
+        level
+        """
+        return self._metadata_max_depth
+
+    @metadata_max_depth.setter  # type: ignore
+    @validate_int_setter
+    def metadata_max_depth(self, value: int) -> None:
+        if value >= 0:
+            self._metadata_max_depth = value
+        else:
+            message = (
+                'metadata_max_depth should be a non-negative int, got "{}"'
+            ).format(value)
+
+            warnings.warn(message, RuntimeWarning)
+
+    @property
+    def metadata_max_keys(self) -> int:
+        """
+        The number of keys to report from each dict in metadata, user data and
+        breadcrumb metadata, with the number of keys left out recorded under
+        "...". Set to 0 to report every key
+        """
+        return self._metadata_max_keys
+
+    @metadata_max_keys.setter  # type: ignore
+    @validate_int_setter
+    def metadata_max_keys(self, value: int) -> None:
+        if value >= 0:
+            self._metadata_max_keys = value
+        else:
+            message = (
+                'metadata_max_keys should be a non-negative int, got "{}"'
+            ).format(value)
+
+            warnings.warn(message, RuntimeWarning)
+
+    @property
+    def metadata_max_items(self) -> int:
+        """
+        The number of items to report from each list, tuple or set in
+        metadata, user data and breadcrumb metadata, followed by a placeholder
+        saying how many were left out. Set to 0 to report every item
+        """
+        return self._metadata_max_items
+
+    @metadata_max_items.setter  # type: ignore
+    @validate_int_setter
+    def metadata_max_items(self, value: int) -> None:
+        if value >= 0:
+            self._metadata_max_items = value
+        else:
+            message = (
+                'metadata_max_items should be a non-negative int, got "{}"'
+            ).format(value)
+
+            warnings.warn(message, RuntimeWarning)
+
+    @property
+    def metadata_max_nodes(self) -> int:
+        """
+        The total number of values to report from an event's metadata, user
+        data and breadcrumb metadata, in that order of priority. Anything past
+        the limit is replaced with placeholders. Set to 0 to report every
+        value
+        """
+        return self._metadata_max_nodes
+
+    @metadata_max_nodes.setter  # type: ignore
+    @validate_int_setter
+    def metadata_max_nodes(self, value: int) -> None:
+        if value >= 0:
+            self._metadata_max_nodes = value
+        else:
+            message = (
+                'metadata_max_nodes should be a non-negative int, got "{}"'
+            ).format(value)
+
+            warnings.warn(message, RuntimeWarning)
+
+    @property
+    def stacktrace_max_frames(self) -> int:
+        """
+        The number of frames to report in each stacktrace, after repeated
+        frames from recursion are collapsed. Frames are removed from the
+        middle of longer stacktraces and replaced with a frame saying how
+        many were left out. Set to 0 to report every frame
+        """
+        return self._stacktrace_max_frames
+
+    @stacktrace_max_frames.setter  # type: ignore
+    @validate_int_setter
+    def stacktrace_max_frames(self, value: int) -> None:
+        if value >= 0:
+            self._stacktrace_max_frames = value
+        else:
+            message = (
+                'stacktrace_max_frames should be a non-negative int, got "{}"'
+            ).format(value)
+
+            warnings.warn(message, RuntimeWarning)
+
     def add_on_breadcrumb(self, on_breadcrumb: OnBreadcrumbCallback) -> None:
         with self._mutex:
             self._on_breadcrumbs.append(on_breadcrumb)
@@ -549,6 +1526,18 @@ class Configuration:
                 # ignore exception if "on_breadcrumb" is not in the list
                 pass
 
+    def add_type_encoder(self, value_type: type,
+                         encoder: TypeEncoder) -> None:
+        """
+        Convert metadata values of 'value_type', or its subclasses, with
+        'encoder' rather than coercing them to strings. Encoders should
+        return a string, number, boolean, None or a small dict or list, and
+        replace the built-in encoders for the same type.
+        """
+        with self._mutex:
+            self._type_encoders.register(value_type, encoder)
+            self._payload_fragments = {}
+
     def should_notify(self) -> bool:
         return self.notify_release_stages is None or \
             (isinstance(self.notify_release_stages, (tuple, list)) and
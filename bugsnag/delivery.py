@@ -1,18 +1,41 @@
-from threading import Thread
-from typing import Dict, Callable, Any
+from collections import Counter
+from email.utils import parsedate_to_datetime
+from http.client import HTTPConnection, HTTPSConnection
+from threading import Lock, Thread
+from typing import (  # noqa
+    Dict, Callable, Any, List, Optional, Tuple, TypeVar
+)
+import gzip
+import inspect
+import random
+import os
+import ssl
 import sys
 import json
+import time
 import warnings
+import weakref
 
 from time import strftime, gmtime
 
+from urllib.error import HTTPError
+from urllib.parse import SplitResult, urlsplit
 from urllib.request import (
+    OpenerDirector,
     Request,
     ProxyHandler,
-    build_opener
+    build_opener,
+    getproxies,
+    proxy_bypass
 )
 
+from bugsnag.circuit_breaker import (
+    CircuitBreaker,
+    FALLBACK_SPOOL
+)
 from bugsnag.event import Event
+from bugsnag.executor import DeliveryExecutor
+from bugsnag.spool import PayloadSpool
 
 try:
     if sys.version_info < (2, 7):
@@ -23,6 +46,7 @@ try:
         raise ImportError('requests-based delivery will fail on 3.2')
 
     import requests
+    import requests.adapters
 except ImportError:
     requests = None  # type: ignore
 
@@ -31,13 +55,158 @@ DEFAULT_SESSIONS_ENDPOINT = 'https://sessions.bugsnag.com'
 SECONDARY_ENDPOINT = 'https://notify.bugsnag.smartbear.com'
 SECONDARY_SESSIONS_ENDPOINT = 'https://sessions.bugsnag.smartbear.com'
 
-__all__ = ('default_headers', 'Delivery')
+__all__ = ('default_headers', 'compress_body', 'Delivery', 'DeliveryPayload')
+
+_breaker_lock = Lock()
+_executor_lock = Lock()
+_F = TypeVar('_F', bound=Callable)
+_replay_lock = Lock()
+_spool_lock = Lock()
+_stats_lock = Lock()
+_transport_lock = Lock()
+
+# the counters reported by Delivery.stats
+_STATS = (
+    'delivered',
+    'failed',
+    'retried',
+    'retries_exhausted',
+    'spooled',
+    'replayed',
+    'shed',
+)
+
+# deliveries which have replayed their spool, so the flag preventing
+# concurrent replays can be reset in child processes
+_replaying_deliveries = weakref.WeakSet()  # type: weakref.WeakSet
+
+# connection pools which may hold connections opened by a parent process
+_connection_pools = weakref.WeakSet()  # type: weakref.WeakSet
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# status codes which mean a request may succeed if it is sent again later
+_TRANSIENT_STATUS_CODES = (408, 429)
 
 
 def _noop():
     pass
 
 
+def _reset_after_fork() -> None:
+    # the thread replaying the spool doesn't exist in a forked child, which
+    # must be able to start its own
+    global _replay_lock
+    _replay_lock = Lock()
+
+    for delivery in list(_replaying_deliveries):
+        delivery._replaying = False
+
+    # sockets inherited from the parent are still in use by it
+    for pool in list(_connection_pools):
+        pool._lock = Lock()
+        pool._idle = {}
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class _HTTPConnectionPool:
+    """
+    Keeps idle HTTP connections open so they can be reused by later requests
+    from any delivery thread
+    """
+
+    def __init__(self, max_idle: int):
+        self.max_idle = max_idle
+        self._lock = Lock()
+        self._idle = {}  # type: Dict[Tuple[str, str, int], List[HTTPConnection]]  # noqa: E501
+        self._ssl_context = None  # type: Optional[ssl.SSLContext]
+
+        _connection_pools.add(self)
+
+    def post(self, parts: SplitResult, body: bytes,
+             headers: Dict[str, str]) -> Tuple[int, Any]:
+        """
+        POST a request body, returning the response status code and headers
+        """
+        port = parts.port or _DEFAULT_PORTS.get(parts.scheme, 80)
+        key = (parts.scheme, parts.hostname or '', port)
+
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+
+        connection = self._checkout(key)
+
+        if connection is not None:
+            try:
+                return self._exchange(key, connection, path, body, headers)
+            except ConnectionError:
+                # the server may have closed the connection while it was
+                # idle, so try again with a new one
+                pass
+
+        connection = self._connect(key)
+
+        return self._exchange(key, connection, path, body, headers)
+
+    def _checkout(
+        self,
+        key: Tuple[str, str, int]
+    ) -> Optional[HTTPConnection]:
+        with self._lock:
+            connections = self._idle.get(key)
+
+            if connections:
+                return connections.pop()
+
+        return None
+
+    def _checkin(self, key: Tuple[str, str, int],
+                 connection: HTTPConnection) -> None:
+        with self._lock:
+            connections = self._idle.setdefault(key, [])
+
+            if len(connections) < self.max_idle:
+                connections.append(connection)
+                return
+
+        connection.close()
+
+    def _connect(self, key: Tuple[str, str, int]) -> HTTPConnection:
+        scheme, host, port = key
+
+        if scheme != 'https':
+            return HTTPConnection(host, port)
+
+        if self._ssl_context is None:
+            self._ssl_context = ssl.create_default_context()
+
+        return HTTPSConnection(host, port, context=self._ssl_context)
+
+    def _exchange(self, key: Tuple[str, str, int], connection: HTTPConnection,
+                  path: str, body: bytes,
+                  headers: Dict[str, str]) -> Tuple[int, Any]:
+        try:
+            connection.request('POST', path, body, headers)
+            response = connection.getresponse()
+
+            # the body has to be read before the connection can be reused
+            response.read()
+        except BaseException:
+            connection.close()
+            raise
+
+        if response.will_close:
+            connection.close()
+        else:
+            self._checkin(key, connection)
+
+        return response.status, response.headers
+
+
 def _marshall_post_delivery_callback(post_delivery_callback):
     if not callable(post_delivery_callback):
         return _noop
@@ -51,6 +220,163 @@ def _marshall_post_delivery_callback(post_delivery_callback):
     return safe_post_delivery_callback
 
 
+def _envelope_aware(method: _F) -> _F:
+    """
+    Mark a delivery method as accepting DeliveryPayload instances as well as
+    strings. Methods without this marker, such as those in custom Delivery
+    subclasses, are always given a string payload
+    """
+    setattr(method, '_accepts_payload_envelope', True)
+
+    return method
+
+
+def _is_envelope_aware(method: Callable) -> bool:
+    # compare to True explicitly as Mock objects return a truthy Mock for any
+    # attribute
+    return getattr(method, '_accepts_payload_envelope', False) is True
+
+
+def payload_for(method: Callable, payload: 'DeliveryPayload') -> Any:
+    """
+    Get the payload to pass to a delivery method: the DeliveryPayload itself
+    if the method supports it, otherwise the decoded string
+    """
+    if _is_envelope_aware(method):
+        return payload
+
+    return str(payload)
+
+
+def _accepts_keyword(method: Callable, name: str) -> bool:
+    """
+    Check if a method can be called with the keyword argument 'name', so that
+    overrides written before the argument was added keep working
+    """
+    try:
+        parameters = inspect.signature(method).parameters.values()
+    except (TypeError, ValueError):
+        return False
+
+    return any(
+        parameter.name == name or parameter.kind == parameter.VAR_KEYWORD
+        for parameter in parameters
+    )
+
+
+class DeliveryPayload:
+    """
+    An encoded request body along with the metadata needed to send it, which
+    means deliveries never need to decode the body again
+
+    >>> payload = DeliveryPayload(b'{"events":[]}', 'abc123')
+    >>> payload.api_key
+    'abc123'
+    >>> str(payload)
+    '{"events":[]}'
+    """
+    EVENT = 'event'
+    SESSION = 'session'
+
+    __slots__ = ('_body', '_encode', 'api_key', 'kind', 'endpoint')
+
+    def __init__(self, body: bytes, api_key: Optional[str],
+                 kind: str = EVENT, endpoint: Optional[str] = None):
+        self._body = body
+        self._encode = None  # type: Optional[Callable[[], bytes]]
+        self.api_key = api_key
+        self.kind = kind
+        self.endpoint = endpoint
+
+    @classmethod
+    def deferred(cls, encode: Callable[[], bytes], api_key: Optional[str],
+                 kind: str = EVENT) -> 'DeliveryPayload':
+        """
+        Build a DeliveryPayload whose body is encoded the first time it's
+        needed, which for asynchronous deliveries is on a delivery thread
+
+        >>> payload = DeliveryPayload.deferred(lambda: b'{}', 'abc123')
+        >>> payload.body
+        b'{}'
+        """
+        payload = cls(b'', api_key, kind)
+        payload._encode = encode
+
+        return payload
+
+    @property
+    def body(self) -> bytes:
+        encode = self._encode
+
+        if encode is not None:
+            self._body = encode()
+            self._encode = None
+
+        return self._body
+
+    @body.setter
+    def body(self, value: bytes) -> None:
+        self._body = value
+        self._encode = None
+
+    @classmethod
+    def from_string(cls, config, payload: str,
+                    kind: str = EVENT) -> 'DeliveryPayload':
+        """
+        Build a DeliveryPayload from a string, which has to be parsed to find
+        its API key
+        """
+        api_key = json.loads(payload).pop('apiKey', config.api_key)
+
+        return cls(payload.encode('utf-8', 'replace'), api_key, kind)
+
+    def __str__(self) -> str:
+        return self.body.decode('utf-8', 'replace')
+
+
+def _is_transient_failure(status: int) -> bool:
+    return status >= 500 or status in _TRANSIENT_STATUS_CODES
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Convert a Retry-After header, which is either a number of seconds or an
+    HTTP date, to a number of seconds
+
+    >>> _parse_retry_after('120')
+    120.0
+    >>> _parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT')
+    0.0
+    >>> _parse_retry_after('soon') is None
+    True
+    """
+    if not value:
+        return None
+
+    value = value.strip()
+
+    if value.isdigit():
+        return float(value)
+
+    try:
+        retry_at = parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+    return max(retry_at - time.time(), 0.0)
+
+
+class _RetryableFailure(Exception):
+    """
+    A request failed in a way that means it may succeed if sent again later
+    """
+    def __init__(self, error: Optional[Exception] = None,
+                 retry_after: Optional[float] = None):
+        super().__init__(error)
+        self.error = error
+        self.retry_after = retry_after
+
+
 def create_default_delivery():
     if requests is not None:
         return RequestsDelivery()
@@ -58,7 +384,7 @@ def create_default_delivery():
     return UrllibDelivery()
 
 
-def default_headers(api_key: str):
+def default_headers(api_key: Optional[str]):
     return {
         'Bugsnag-Api-Key': api_key,
         'Bugsnag-Payload-Version': Event.PAYLOAD_VERSION,
@@ -67,12 +393,36 @@ def default_headers(api_key: str):
     }
 
 
+def compress_body(config, body: bytes, headers: Dict[str, str]) -> bytes:
+    """
+    Gzip a request body if compression is enabled and the body is large
+    enough to benefit from it, setting the Content-Encoding header when it is
+    compressed
+    """
+    if (
+        not config.compress_payloads or
+        len(body) < config.compression_threshold
+    ):
+        return body
+
+    headers['Content-Encoding'] = 'gzip'
+
+    return gzip.compress(body, compresslevel=config.compression_level)
+
+
 class Delivery:
     """
     Mechanism for sending a request to Bugsnag
     """
     def __init__(self):
         self.sent_session_warning = False
+        self._executor = None  # type: Optional[DeliveryExecutor]
+        self._executor_settings = None  # type: Optional[tuple]
+        self._spool = None  # type: Optional[PayloadSpool]
+        self._spool_settings = None  # type: Optional[tuple]
+        self._replaying = False
+        self._stats = Counter()  # type: Counter
+        self._breakers = {}  # type: Dict[str, CircuitBreaker]
 
     def deliver(self, config, payload: Any, options=None):
         """
@@ -80,6 +430,7 @@ class Delivery:
         """
         pass
 
+    @_envelope_aware
     def deliver_sessions(self, config, payload: Any, options=None):
         """
         Sends sessions to Bugsnag
@@ -98,47 +449,525 @@ class Delivery:
 
             options['endpoint'] = config.session_endpoint
 
+            if isinstance(payload, DeliveryPayload):
+                payload = payload_for(self.deliver, payload)
+
             self.deliver(config, payload, options)
 
-    def queue_request(self, request: Callable, config, options: Dict):
+    def get_executor(self, config) -> DeliveryExecutor:
+        """
+        The worker pool used for asynchronous requests. A new pool is created
+        if the delivery settings in the configuration have changed since the
+        current one was started
+        """
+        settings = (
+            config.delivery_worker_count,
+            config.delivery_queue_size,
+            config.delivery_overflow_policy,
+            config.delivery_block_timeout,
+        )
+
+        with _executor_lock:
+            executor = getattr(self, '_executor', None)
+
+            if executor is not None and self._executor_settings == settings:
+                return executor
+
+            if executor is not None:
+                # let the old workers finish anything already queued
+                executor.shutdown()
+
+            executor = DeliveryExecutor(*settings, logger=config.logger)
+            self._executor = executor
+            self._executor_settings = settings
+
+            return executor
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """
+        Counts of delivery outcomes: requests delivered, attempts which failed,
+        retries scheduled, requests which ran out of retries, payloads spooled,
+        spooled payloads replayed and requests shed by a circuit breaker
+        """
+        with _stats_lock:
+            stats = getattr(self, '_stats', Counter())
+
+            return {name: stats[name] for name in _STATS}
+
+    @property
+    def circuit_breaker_states(self) -> Dict[str, str]:
+        """
+        The state of the circuit breaker for each endpoint that has been sent
+        to: "closed", "open" or "half_open"
+        """
+        with _breaker_lock:
+            breakers = dict(getattr(self, '_breakers', {}))
+
+        return {uri: breaker.state for uri, breaker in breakers.items()}
+
+    def get_circuit_breaker(self, config, uri: str) -> CircuitBreaker:
+        """
+        The circuit breaker for requests to an endpoint
+        """
+        with _breaker_lock:
+            if getattr(self, '_breakers', None) is None:
+                self._breakers = {}
+
+            breaker = self._breakers.get(uri)
+
+            if breaker is None:
+                breaker = CircuitBreaker()
+                self._breakers[uri] = breaker
+
+            breaker.failure_threshold = config.circuit_breaker_threshold
+            breaker.cooldown = config.circuit_breaker_cooldown
+
+            return breaker
+
+    def _record_failure(self, config, breaker: CircuitBreaker,
+                        uri: str) -> None:
+        self._increment('failed')
+
+        if breaker.record_failure():
+            config.logger.warning(
+                'Delivery to %s has failed %d times in a row, pausing '
+                'requests for %s seconds',
+                uri,
+                breaker.failure_threshold,
+                breaker.cooldown
+            )
+
+    def _increment(self, name: str) -> None:
+        with _stats_lock:
+            if getattr(self, '_stats', None) is None:
+                self._stats = Counter()
+
+            self._stats[name] += 1
+
+    def _retry_delay(self, config, attempt: int,
+                     retry_after: Optional[float] = None) -> Optional[float]:
+        """
+        The number of seconds to wait before retrying a failed request, or None
+        if it should not be retried
+        """
+        if attempt >= config.delivery_max_retries:
+            return None
+
+        max_delay = config.delivery_retry_max_delay
+
+        if retry_after is not None:
+            # don't retry sooner than the server asked us to; if that's
+            # longer than we're willing to wait then give up
+            if retry_after > max_delay:
+                return None
+
+            return retry_after
+
+        # capped exponential backoff with jitter, so clients that failed at
+        # the same time don't all retry at the same time
+        base_delay = config.delivery_retry_base_delay
+        backoff = min(max_delay, base_delay * 2 ** attempt)
+
+        return backoff / 2 + random.uniform(0, backoff / 2)
+
+    def get_spool(self, config) -> Optional[PayloadSpool]:
+        """
+        The spool that undelivered payloads are saved to, if a spool directory
+        has been configured. Anything left in the spool by a previous process
+        is replayed in the background when the spool is first opened
+        """
+        directory = config.spool_directory
+
+        if directory is None:
+            return None
+
+        settings = (directory, config.spool_max_bytes, config.spool_max_files)
+
+        with _spool_lock:
+            spool = getattr(self, '_spool', None)
+
+            if spool is not None and self._spool_settings == settings:
+                return spool
+
+            try:
+                spool = PayloadSpool(*settings, logger=config.logger)
+            except OSError as e:
+                config.logger.warning(
+                    'Failed to open spool directory %s: %s', directory, e
+                )
+                return None
+
+            self._spool = spool
+            self._spool_settings = settings
+
+        self._replay_spool(config, spool)
+
+        return spool
+
+    def _resolve_payload(self, config, payload: Any,
+                         options: Dict) -> DeliveryPayload:
+        """
+        Convert a payload to a DeliveryPayload with the full URI it should be
+        sent to as its endpoint
+        """
+        if not isinstance(payload, DeliveryPayload):
+            payload = DeliveryPayload.from_string(config, payload)
+
+        uri = options.pop('endpoint', payload.endpoint or config.endpoint)
+        if '://' not in uri:
+            uri = 'https://{}'.format(uri)
+
+        resolved = DeliveryPayload(
+            payload._body,
+            payload.api_key,
+            payload.kind,
+            uri
+        )
+
+        # a deferred body stays deferred, so it's encoded when the request is
+        # made rather than when it's queued
+        resolved._encode = payload._encode
+
+        return resolved
+
+    def _build_request(self, config, payload: DeliveryPayload):
+        """
+        Build the body and headers of a request for a resolved payload
+        """
+        headers = default_headers(payload.api_key)
+        body = compress_body(config, payload.body, headers)
+
+        return body, headers
+
+    def _post(self, config, uri: str, body: bytes,
+              headers: Dict[str, str]) -> Tuple[int, Any]:
+        """
+        Send a request body, returning the response status code and headers.
+        Subclasses using the default request flow must implement this
+        """
+        raise NotImplementedError()
+
+    def _deliver_payload(self, config, payload: Any, options=None):
+        """
+        Queue a payload to be sent with '_post'. If it can't be delivered
+        because of a network error or a status code that may be temporary,
+        it is retried and then saved to the spool to be sent again later
+        """
+        if options is None:
+            options = {}
+
+        resolved = None  # type: Optional[DeliveryPayload]
+
+        def resolve() -> DeliveryPayload:
+            # the endpoint is popped from the options, so resolve once and
+            # reuse the result when retrying
+            nonlocal resolved
+
+            if resolved is None:
+                resolved = self._resolve_payload(config, payload, options)
+
+            return resolved
+
+        def request():
+            uri = resolve().endpoint
+            breaker = self.get_circuit_breaker(config, uri)
+
+            # fail fast while the endpoint is down rather than waiting for
+            # every request to time out
+            if not breaker.allow_request():
+                self._increment('shed')
+
+                if config.circuit_breaker_fallback == FALLBACK_SPOOL:
+                    self._spool_payload(config, resolve())
+
+                return
+
+            try:
+                body, headers = self._build_request(config, resolve())
+            except BaseException:
+                # encoding a deferred body can fail, which mustn't keep a
+                # half open breaker waiting for a trial that was never sent
+                breaker.cancel_request()
+                raise
+
+            try:
+                status, response_headers = self._post(
+                    config,
+                    uri,
+                    body,
+                    headers
+                )
+            except Exception as e:
+                self._record_failure(config, breaker, uri)
+                raise _RetryableFailure(e) from e
+
+            if _is_transient_failure(status):
+                self._record_failure(config, breaker, uri)
+            else:
+                # any other response means the endpoint is reachable
+                breaker.record_success()
+
+            if 'success' in options:
+                # if an expected status code has been given then it must match
+                # exactly with the actual status code
+                success = status == options['success']
+            else:
+                # warn if we don't get a 2xx status code by default
+                success = status >= 200 and status < 300
+
+            if success:
+                self._increment('delivered')
+                spool = self.get_spool(config)
+
+                # connectivity has recovered so send anything spooled earlier
+                if spool is not None and spool.has_entries:
+                    self._replay_spool(config, spool)
+
+                return
+
+            if not _is_transient_failure(status):
+                self._increment('failed')
+
+            config.logger.warning(
+                'Delivery to %s failed, status %d' % (uri, status)
+            )
+
+            if _is_transient_failure(status):
+                raise _RetryableFailure(retry_after=_parse_retry_after(
+                    response_headers.get('Retry-After')
+                ))
+
+        def on_abandon():
+            self._spool_payload(config, resolve())
+
+        if _accepts_keyword(self.queue_request, 'on_abandon'):
+            self.queue_request(request, config, options, on_abandon=on_abandon)
+        else:
+            self.queue_request(request, config, options)
+
+    def _spool_payload(self, config, payload: DeliveryPayload) -> None:
+        spool = self.get_spool(config)
+
+        if spool is None:
+            return
+
+        path = spool.write(payload.body, {
+            'apiKey': payload.api_key,
+            'kind': payload.kind,
+            'endpoint': payload.endpoint,
+        })
+
+        if path is not None:
+            self._increment('spooled')
+
+    def _replay_spool(self, config, spool: PayloadSpool) -> None:
+        """
+        Start sending spooled payloads on a background thread, unless that is
+        already happening
+        """
+        with _replay_lock:
+            if getattr(self, '_replaying', False):
+                return
+
+            self._replaying = True
+            _replaying_deliveries.add(self)
+
+        thread = Thread(
+            target=self._drain_spool,
+            args=(config, spool),
+            name='bugsnag-spool-replay'
+        )
+        thread.daemon = True
+        thread.start()
+
+    def _drain_spool(self, config, spool: PayloadSpool) -> None:
+        try:
+            for path in spool.paths():
+                # other processes may share the spool, so each payload is
+                # claimed first to make sure only one of them sends it
+                claimed_path = spool.claim(path)
+
+                if claimed_path is None:
+                    continue
+
+                try:
+                    replayed = self._replay_payload(
+                        config,
+                        spool,
+                        claimed_path
+                    )
+                except Exception:
+                    spool.release(claimed_path)
+                    raise
+
+                # stop at the first failure, the remaining payloads are sent
+                # after the next successful delivery
+                if not replayed:
+                    spool.release(claimed_path)
+                    return
+        except Exception as e:
+            config.logger.exception('Replaying spooled payloads failed: %s', e)
+        finally:
+            with _replay_lock:
+                self._replaying = False
+
+    def _replay_payload(self, config, spool: PayloadSpool, path: str) -> bool:
+        """
+        Send a claimed payload from the spool, removing it unless sending
+        failed for a reason which may be temporary. Returns False if it should
+        be sent again later
+        """
+        entry = spool.read(path)
+
+        if entry is None:
+            return True
+
+        body, metadata = entry
+        uri = metadata.get('endpoint') or config.endpoint
+        breaker = self.get_circuit_breaker(config, uri)
+        body, headers = self._build_request(config, DeliveryPayload(
+            body,
+            metadata.get('apiKey'),
+            metadata.get('kind', DeliveryPayload.EVENT)
+        ))
+
+        # replayed payloads go through the breaker like live ones, so a half
+        # open endpoint only gets a single trial request
+        if not breaker.allow_request():
+            return False
+
+        try:
+            status, _ = self._post(config, uri, body, headers)
+        except Exception as e:
+            self._record_failure(config, breaker, uri)
+            config.logger.debug('Replaying spooled payloads failed: %s', e)
+
+            return False
+
+        if _is_transient_failure(status):
+            self._record_failure(config, breaker, uri)
+
+            return False
+
+        breaker.record_success()
+
+        if 200 <= status < 300:
+            self._increment('replayed')
+        else:
+            config.logger.warning(
+                'Delivery to %s failed, status %d' % (uri, status)
+            )
+
+        spool.remove(path)
+
+        return True
+
+    def queue_request(self, request: Callable, config, options: Dict,
+                      on_abandon: Optional[Callable[[], None]] = None):
+        """
+        Run a request, on a delivery thread if the request is asynchronous.
+        Asynchronous requests which raise a _RetryableFailure are retried
+        after a delay; 'on_abandon' is called for requests that are given up
+        on, either because they ran out of retries or because they were still
+        waiting to be sent when the interpreter exited
+        """
         post_delivery_callback = _marshall_post_delivery_callback(
             options.pop('post_delivery_callback', None)
         )
 
+        def give_up():
+            try:
+                if on_abandon is not None:
+                    on_abandon()
+            finally:
+                post_delivery_callback()
+
         if config.asynchronous and options.pop('asynchronous', True):
+            executor = self.get_executor(config)
+            attempt = 0
+
             # if an exception escapes the thread, our threading.excepthook
             # will catch it and attempt to deliver it
             # this will cause an infinite loop if delivery can never succeed,
             # e.g. because the URL is unreachable
             def safe_request():
+                nonlocal attempt
+
                 try:
                     request()
+                except _RetryableFailure as failure:
+                    delay = self._retry_delay(
+                        config,
+                        attempt,
+                        failure.retry_after
+                    )
+
+                    if delay is not None:
+                        attempt += 1
+                        self._increment('retried')
+
+                        # wait on the executor's scheduler rather than in this
+                        # worker so other requests can still be sent
+                        executor.submit_later(
+                            delay,
+                            safe_request,
+                            on_drop=give_up,
+                            on_abandon=give_up
+                        )
+                        return
+
+                    if attempt > 0:
+                        self._increment('retries_exhausted')
+
+                    if failure.error is not None:
+                        config.logger.exception(
+                            'Notifying Bugsnag failed %s',
+                            failure.error
+                        )
+
+                    give_up()
+                    return
                 except Exception as e:
                     config.logger.exception('Notifying Bugsnag failed %s', e)
-                finally:
-                    post_delivery_callback()
 
-            Thread(target=safe_request).start()
+                post_delivery_callback()
+
+            # dropped requests aren't spooled as that would mean writing to
+            # disk on the thread making the request
+            executor.submit(
+                safe_request,
+                on_drop=post_delivery_callback,
+                on_abandon=give_up
+            )
         else:
+            # synchronous requests aren't retried as waiting would block the
+            # thread making the request
             try:
                 request()
+            except _RetryableFailure as failure:
+                if on_abandon is not None:
+                    on_abandon()
+
+                if failure.error is not None:
+                    raise failure.error
             finally:
                 post_delivery_callback()
 
 
 class UrllibDelivery(Delivery):
-    def deliver(self, config, payload: Any, options=None):
-        if options is None:
-            options = {}
+    def get_opener(self, config) -> OpenerDirector:
+        """
+        The opener used to make requests through a proxy, which is shared
+        between requests and rebuilt when the endpoints or proxy change
+        """
+        key = (config.endpoint, config.session_endpoint, config.proxy_host)
 
-        def request():
-            uri = options.pop('endpoint', config.endpoint)
-            if '://' not in uri:
-                uri = ('https://{}' % uri)
-            api_key = json.loads(payload).pop('apiKey', config.api_key)
-            req = Request(uri,
-                          payload.encode('utf-8', 'replace'),
-                          default_headers(api_key))
+        with _transport_lock:
+            opener = getattr(self, '_opener', None)
+
+            if opener is not None and getattr(self, '_opener_key') == key:
+                return opener
 
             if config.proxy_host:
                 proxies = ProxyHandler({
@@ -150,59 +979,113 @@ class UrllibDelivery(Delivery):
             else:
                 opener = build_opener()
 
-            resp = opener.open(req)
-            status = resp.getcode()
+            self._opener = opener
+            self._opener_key = key
 
-            if 'success' in options:
-                # if an expected status code has been given then it must match
-                # exactly with the actual status code
-                success = status == options['success']
+            return opener
+
+    @_envelope_aware
+    def deliver(self, config, payload: Any, options=None):
+        self._deliver_payload(config, payload, options)
+
+    def _post(self, config, uri: str, body: bytes,
+              headers: Dict[str, str]) -> Tuple[int, Any]:
+        parts = urlsplit(uri)
+
+        if not self._is_proxied(config, parts):
+            return self._get_connection_pool(config).post(
+                parts,
+                body,
+                headers
+            )
+
+        try:
+            request = Request(uri, body, headers)
+
+            with self.get_opener(config).open(request) as response:
+                return response.getcode(), response.headers
+        except HTTPError as e:
+            # urllib raises for error status codes
+            return e.code, e.headers
+
+    def _get_connection_pool(self, config) -> _HTTPConnectionPool:
+        # connections are kept alive for requests which aren't proxied, which
+        # an OpenerDirector can't do as it closes every connection it opens
+        with _transport_lock:
+            pool = getattr(self, '_connection_pool', None)
+
+            if pool is None:
+                pool = _HTTPConnectionPool(config.delivery_worker_count)
+                self._connection_pool = pool
             else:
-                # warn if we don't get a 2xx status code by default
-                success = status >= 200 and status < 300
+                pool.max_idle = config.delivery_worker_count
 
-            if not success:
-                config.logger.warning(
-                    'Delivery to %s failed, status %d' % (uri, status)
-                )
+            return pool
 
-        self.queue_request(request, config, options)
+    def _is_proxied(self, config, parts: SplitResult) -> bool:
+        if config.proxy_host:
+            return True
+
+        # the opener also picks up proxies from the environment
+        return (
+            parts.scheme in getproxies() and
+            not proxy_bypass(parts.hostname or '')
+        )
 
 
 class RequestsDelivery(Delivery):
-    def deliver(self, config, payload: Any, options=None):
-        if options is None:
-            options = {}
+    def get_session(self, config) -> 'requests.Session':
+        """
+        The session used to make requests. Connections are kept alive and
+        shared between delivery threads; the session is rebuilt when the
+        endpoints or proxy change
+        """
+        key = (
+            config.endpoint,
+            config.session_endpoint,
+            config.proxy_host,
+            config.delivery_worker_count,
+        )
 
-        def request():
-            uri = options.pop('endpoint', config.endpoint)
-            if '://' not in uri:
-                uri = ('https://{}' % uri)
+        with _transport_lock:
+            session = getattr(self, '_session', None)
 
-            api_key = json.loads(payload).pop('apiKey', config.api_key)
-            req_options = {'data': payload,
-                           'headers': default_headers(api_key)}
+            if session is not None and getattr(self, '_session_key') == key:
+                return session
+
+            # the previous session isn't closed as another thread may still be
+            # using it; its connections are closed when it's garbage collected
+            session = requests.Session()
+
+            # keep enough connections open for every delivery thread
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=2,
+                pool_maxsize=config.delivery_worker_count
+            )
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
 
             if config.proxy_host:
-                req_options['proxies'] = {
+                session.proxies = {
                     'https': config.proxy_host,
                     'http': config.proxy_host
                 }
 
-            response = requests.post(uri, **req_options)
-            status = response.status_code
+            self._session = session
+            self._session_key = key
 
-            if 'success' in options:
-                # if an expected status code has been given then it must match
-                # exactly with the actual status code
-                success = status == options['success']
-            else:
-                # warn if we don't get a 2xx status code by default
-                success = status >= 200 and status < 300
+            return session
 
-            if not success:
-                config.logger.warning(
-                    'Delivery to %s failed, status %d' % (uri, status)
-                )
+    @_envelope_aware
+    def deliver(self, config, payload: Any, options=None):
+        self._deliver_payload(config, payload, options)
+
+    def _post(self, config, uri: str, body: bytes,
+              headers: Dict[str, str]) -> Tuple[int, Any]:
+        response = self.get_session(config).post(
+            uri,
+            data=body,
+            headers=headers
+        )
 
-        self.queue_request(request, config, options)
+        return response.status_code, response.headers
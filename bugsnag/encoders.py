@@ -0,0 +1,412 @@
+import math
+import sys
+from functools import lru_cache
+from datetime import date, time
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional, Tuple  # noqa
+from uuid import UUID
+
+try:
+    import dataclasses
+except ImportError:
+    # dataclasses were added in Python 3.7
+    dataclasses = None  # type: ignore
+
+try:
+    from os import PathLike, fspath
+except ImportError:
+    # PathLike was added in Python 3.6 so fallback to PurePath on Python 3.5 as
+    # all builtin Path objects inherit from PurePath
+    from pathlib import PurePath as PathLike  # type: ignore
+    fspath = str  # type: ignore
+
+__all__ = []  # type: List[str]
+
+# the longest string the fallback encoder produces
+MAX_FALLBACK_LENGTH = 1024
+
+# the number of types a TypeEncoders remembers the encoder for
+TYPE_CACHE_SIZE = 1024
+
+# the number of values from each end of an array included in its summary
+SUMMARY_VALUES = 5
+
+# statistics of larger arrays are calculated from this many evenly spaced
+# values so summaries take the same time whatever their size
+SUMMARY_SAMPLE_SIZE = 10000
+
+# the number of columns of a DataFrame which are summarized
+SUMMARY_COLUMNS = 20
+
+TypeEncoder = Callable[[Any], Any]
+
+# values of these exact types are always encoded as they are, so handlers
+# registered for a base class (like object) never apply to them
+_JSON_TYPES = (str, int, float, bool, type(None), dict, list)
+
+
+class TypeEncoders:
+    """
+    A registry of functions which convert values JSON can't represent into
+    ones it can, by type. Handlers return strings, numbers or small dicts and
+    lists, which are then sanitized like any other value.
+
+    The handler for a type is the one registered for the closest class in its
+    MRO, then the first matching built-in kind (like dataclasses), and the
+    result for recently seen types is cached so the MRO is usually only
+    walked once per type. Types without a handler are encoded by
+    'fallback_encoder'.
+
+    >>> from datetime import datetime
+    >>> encoders = default_type_encoders()
+    >>> encoders.encode(datetime(2020, 1, 2, 3, 4, 5))
+    '2020-01-02T03:04:05'
+    >>> encoders.register(complex, lambda value: [value.real, value.imag])
+    >>> encoders.encode(1 + 2j)
+    [1.0, 2.0]
+    """
+
+    def __init__(self):
+        self._handlers = {}  # type: Dict[type, TypeEncoder]
+        self._kinds = []  # type: List[Tuple[Callable[[type], bool], TypeEncoder]]  # noqa: E501
+        # the cache is bounded as types may be created while an app runs
+        self._cached_resolve = lru_cache(maxsize=TYPE_CACHE_SIZE)(
+            self._resolve
+        )
+
+    def register(self, value_type: type, encoder: TypeEncoder) -> None:
+        """
+        Encode values of 'value_type', and its subclasses, with 'encoder'
+        """
+        self._handlers[value_type] = encoder
+        self._cached_resolve.cache_clear()
+
+    def register_kind(self, predicate: Callable[[type], bool],
+                      encoder: TypeEncoder) -> None:
+        """
+        Encode values whose type matches 'predicate' with 'encoder', for
+        kinds of types which don't share a base class
+        """
+        self._kinds.append((predicate, encoder))
+        self._cached_resolve.cache_clear()
+
+    def lookup(self, value_type: type) -> Optional[TypeEncoder]:
+        """
+        Get the encoder for a type, or None if it doesn't have one
+        """
+        return self._cached_resolve(value_type)
+
+    def encode(self, value: Any) -> Any:
+        encoder = self.lookup(type(value))
+
+        if encoder is None:
+            return fallback_encoder(value)
+
+        return encoder(value)
+
+    def copy(self) -> 'TypeEncoders':
+        encoders = TypeEncoders()
+        encoders._handlers = dict(self._handlers)
+        encoders._kinds = list(self._kinds)
+
+        return encoders
+
+    def _resolve(self, value_type: type) -> Optional[TypeEncoder]:
+        if value_type in _JSON_TYPES:
+            return None
+
+        for base in value_type.__mro__:
+            if base in self._handlers:
+                return self._handlers[base]
+
+        for predicate, encoder in self._kinds:
+            if predicate(value_type):
+                return encoder
+
+        return None
+
+
+def fallback_encoder(value: Any) -> str:
+    """
+    Convert a value to a string, shortened to MAX_FALLBACK_LENGTH characters
+    by eliding its middle, like reprlib does
+    """
+    text = str(value)
+
+    if len(text) <= MAX_FALLBACK_LENGTH:
+        return text
+
+    head = (MAX_FALLBACK_LENGTH - 3) // 2
+    tail = MAX_FALLBACK_LENGTH - 3 - head
+
+    return text[:head] + '...' + text[-tail:]
+
+
+def default_type_encoders() -> TypeEncoders:
+    """
+    Create a registry with handlers for common standard library types
+    """
+    encoders = TypeEncoders()
+    encoders.register(date, _encode_isoformat)
+    encoders.register(time, _encode_isoformat)
+    encoders.register(Decimal, str)
+    encoders.register(UUID, str)
+    encoders.register(Enum, _encode_enum)
+    encoders.register_kind(_is_named_tuple, _encode_named_tuple)
+    encoders.register_kind(_is_path, _encode_path)
+
+    if dataclasses is not None:
+        encoders.register_kind(dataclasses.is_dataclass, _encode_dataclass)
+
+    encoders.register_kind(_is_numpy_scalar, _encode_numpy_scalar)
+    encoders.register_kind(_is_numpy_array, summarize_array)
+    encoders.register_kind(_is_pandas_series, summarize_series)
+    encoders.register_kind(_is_pandas_data_frame, summarize_data_frame)
+
+    return encoders
+
+
+def summarize_array(value: Any) -> Dict[str, Any]:
+    """
+    Summarize a NumPy array by its shape, type and size, the values at each
+    end and statistics of its numeric values. The cost doesn't depend on the
+    size of the array
+    """
+    numpy = sys.modules['numpy']
+    size = int(value.size)
+    flat = value.flat
+
+    summary = {
+        'type': _qualified_name(type(value)),
+        'shape': list(value.shape),
+        'dtype': str(value.dtype),
+        'nbytes': int(value.nbytes),
+    }
+
+    if size <= SUMMARY_VALUES * 2:
+        summary['values'] = _array_values(numpy, flat[:size])
+    else:
+        summary['head'] = _array_values(numpy, flat[:SUMMARY_VALUES])
+        summary['tail'] = _array_values(
+            numpy,
+            flat[size - SUMMARY_VALUES:]
+        )
+
+    step = _sample_step(size)
+    summary.update(_statistics(numpy, flat[::step], step))
+
+    return summary
+
+
+def summarize_series(value: Any) -> Dict[str, Any]:
+    """
+    Summarize a pandas Series like 'summarize_array', with its name
+    """
+    summary = {'type': _qualified_name(type(value))}
+    summary.update(_describe_series(value))
+
+    return summary
+
+
+def summarize_data_frame(value: Any) -> Dict[str, Any]:
+    """
+    Summarize a pandas DataFrame by its shape and size, and each of its first
+    SUMMARY_COLUMNS columns like 'summarize_series'
+    """
+    rows, column_count = value.shape
+    shown = min(column_count, SUMMARY_COLUMNS)
+
+    summary = {
+        'type': _qualified_name(type(value)),
+        'shape': [rows, column_count],
+        'nbytes': int(value.memory_usage(index=True, deep=False).sum()),
+        'columns': [
+            _describe_series(value.iloc[:, position])
+            for position in range(shown)
+        ],
+    }  # type: Dict[str, Any]
+
+    if column_count > shown:
+        summary['omittedColumns'] = column_count - shown
+
+    return summary
+
+
+def _describe_series(value: Any) -> Dict[str, Any]:
+    numpy = sys.modules['numpy']
+    size = len(value)
+    rows = value.iloc
+
+    summary = {
+        'name': value.name,
+        'shape': [size],
+        'dtype': str(value.dtype),
+        'nbytes': int(value.memory_usage(index=True, deep=False)),
+    }
+
+    if size <= SUMMARY_VALUES * 2:
+        summary['values'] = _finite(value.tolist())
+    else:
+        summary['head'] = _finite(rows[:SUMMARY_VALUES].tolist())
+        summary['tail'] = _finite(
+            rows[size - SUMMARY_VALUES:].tolist()
+        )
+
+    step = _sample_step(size)
+    summary.update(_statistics(numpy, rows[::step].to_numpy(), step))
+
+    return summary
+
+
+def _array_values(numpy: Any, values: Any) -> List[Any]:
+    # datetimes with more precision than microseconds are converted to
+    # integers by tolist, so they are formatted by numpy instead
+    if values.dtype.kind == 'M':
+        return numpy.datetime_as_string(values).tolist()
+
+    if values.dtype.kind == 'm':
+        return [str(item) for item in values]
+
+    return _finite(values.tolist())
+
+
+def _finite(values: List[Any]) -> List[Any]:
+    # NaN and infinity aren't valid JSON, and arrays often contain them
+    return [
+        repr(item)
+        if isinstance(item, float) and not math.isfinite(item)
+        else item
+        for item in values
+    ]
+
+
+def _sample_step(size: int) -> int:
+    return max(1, -(-size // SUMMARY_SAMPLE_SIZE))
+
+
+def _statistics(numpy: Any, sample: Any, step: int) -> Dict[str, Any]:
+    """
+    Calculate the minimum, maximum and mean of the finite values in a one
+    dimensional array of booleans or numbers, and how many are NaN. When
+    'step' is more than 1 the array is a sample of the values, so the
+    statistics are marked as sampled rather than exact
+    """
+    if sample.dtype.kind not in 'biuf' or sample.size == 0:
+        return {}
+
+    statistics = {}  # type: Dict[str, Any]
+
+    if step > 1:
+        statistics['sampled'] = True
+        statistics['sampleSize'] = int(sample.size)
+
+    if sample.dtype.kind == 'f':
+        statistics['nanCount'] = int(numpy.count_nonzero(numpy.isnan(sample)))
+        sample = sample[numpy.isfinite(sample)]
+
+        if sample.size == 0:
+            return statistics
+
+    statistics['min'] = sample.min().item()
+    statistics['max'] = sample.max().item()
+
+    mean = float(sample.mean())
+
+    if math.isfinite(mean):
+        statistics['mean'] = mean
+
+    return statistics
+
+
+def _qualified_name(value_type: type) -> str:
+    return '{}.{}'.format(
+        value_type.__module__.split('.')[0],
+        value_type.__name__
+    )
+
+
+def _module_type(module_name: str, name: str) -> Optional[type]:
+    # these types are only looked up if their module has already been
+    # imported, as values of them can't exist otherwise
+    module = sys.modules.get(module_name)
+    value_type = getattr(module, name, None)
+
+    return value_type if isinstance(value_type, type) else None
+
+
+def _is_numpy_scalar(value_type: type) -> bool:
+    number = _module_type('numpy', 'number')
+    boolean = _module_type('numpy', 'bool_')
+
+    return (
+        number is not None and
+        boolean is not None and
+        issubclass(value_type, (number, boolean))
+    )
+
+
+def _encode_numpy_scalar(value: Any) -> Any:
+    return value.item()
+
+
+def _is_numpy_array(value_type: type) -> bool:
+    array = _module_type('numpy', 'ndarray')
+
+    return array is not None and issubclass(value_type, array)
+
+
+def _is_pandas_series(value_type: type) -> bool:
+    series = _module_type('pandas', 'Series')
+
+    return series is not None and issubclass(value_type, series)
+
+
+def _is_pandas_data_frame(value_type: type) -> bool:
+    data_frame = _module_type('pandas', 'DataFrame')
+
+    return data_frame is not None and issubclass(value_type, data_frame)
+
+
+def _encode_isoformat(value: Any) -> str:
+    return value.isoformat()
+
+
+def _encode_enum(value: Enum) -> Any:
+    # members of enums mixed with a JSON type, like IntEnum, are written as
+    # their value as they would be without a handler
+    if isinstance(value, (str, int, float)):
+        return value.value
+
+    return '{}.{}'.format(type(value).__name__, value.name)
+
+
+def _is_named_tuple(value_type: type) -> bool:
+    return issubclass(value_type, tuple) and hasattr(value_type, '_fields')
+
+
+def _encode_named_tuple(value: Any) -> Dict[str, Any]:
+    return dict(zip(value._fields, value))
+
+
+def _is_path(value_type: type) -> bool:
+    return issubclass(value_type, PathLike)
+
+
+def _encode_path(value: Any) -> str:
+    path = fspath(value)
+
+    if isinstance(path, bytes):
+        return str(path, encoding='utf-8', errors='replace')
+
+    return path
+
+
+def _encode_dataclass(value: Any) -> Dict[str, Any]:
+    # fields are converted one level at a time, rather than with asdict, so
+    # nested values are sanitized (and recursion is detected) as they're
+    # encoded
+    return {
+        field.name: getattr(value, field.name)
+        for field in dataclasses.fields(value)
+    }
@@ -1,13 +1,16 @@
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Optional  # noqa
 
 __all__ = ('Error',)
 
+Stacktrace = List[Dict[str, Any]]
+
 
 class Error:
     __slots__ = (
         'error_class',
         'error_message',
-        'stacktrace',
+        '_stacktrace',
+        '_build_stacktrace',
         'type',
     )
 
@@ -15,13 +18,44 @@ class Error:
         self,
         error_class: str,
         error_message: str,
-        stacktrace: List[Dict[str, Any]]
+        stacktrace: Stacktrace
     ):
         self.error_class = error_class
         self.error_message = error_message
-        self.stacktrace = stacktrace
+        self._stacktrace = stacktrace
+        self._build_stacktrace = None  # type: Optional[Callable[[], Stacktrace]]  # noqa: E501
         self.type = 'python'
 
+    @classmethod
+    def _deferred(
+        cls,
+        error_class: str,
+        error_message: str,
+        build_stacktrace: Callable[[], Stacktrace]
+    ) -> 'Error':
+        """
+        Create an error whose stacktrace is built the first time it's used
+        """
+        error = cls(error_class, error_message, [])
+        error._build_stacktrace = build_stacktrace
+
+        return error
+
+    @property
+    def stacktrace(self) -> Stacktrace:
+        build_stacktrace = self._build_stacktrace
+
+        if build_stacktrace is not None:
+            self._stacktrace = build_stacktrace()
+            self._build_stacktrace = None
+
+        return self._stacktrace
+
+    @stacktrace.setter
+    def stacktrace(self, value: Stacktrace) -> None:
+        self._stacktrace = value
+        self._build_stacktrace = None
+
     def to_dict(self) -> Dict[str, Any]:
         return {
             'errorClass': self.error_class,
@@ -1,24 +1,31 @@
 from typing import Any, Dict, Optional, List, Union  # noqa
-import linecache
-import logging
-import os
+import json
 import sys
-import traceback
 import inspect
 import warnings
 from copy import deepcopy
-
-import bugsnag
+from functools import lru_cache
 
 from bugsnag.breadcrumbs import Breadcrumb
 from bugsnag.notifier import _NOTIFIER_INFORMATION
 from bugsnag.utils import (
     fully_qualified_class_name as class_name,
     FilterDict,
-    SanitizingJSONEncoder
+    SanitizingJSONEncoder,
+    MAX_PAYLOAD_LENGTH
 )
 from bugsnag.error import Error
+from bugsnag.frames import (
+    FrameLocation,
+    OmittedFrames,
+    collapse_repeated_frames,
+    limit_frames,
+    walk_stack,
+    walk_traceback
+)
 from bugsnag.feature_flags import FeatureFlag, FeatureFlagDelegate
+from bugsnag.limits import Limiter
+from bugsnag.trimming import encode_within_budget
 
 __all__ = ('Event',)
 
@@ -100,11 +107,11 @@ class Event:
         if "user_id" in options:
             self.user["id"] = options.pop("user_id")
 
-        # for backwards compatibility we generate the first error's stacktrace
-        # here and use it as 'self.stacktrace' and 'self.errors[0].stacktrace'
-        # this allows mutations 'self.stacktrace' to be reflected in the errors
+        # for backwards compatibility the first error's stacktrace is also
+        # 'self.stacktrace', so mutations to it are reflected in the errors
         # list, which is used to generate the JSON payload
-        stacktrace = self._generate_stacktrace(
+        first_error = self._error_for(
+            exception,
             self.options.pop(
                 "traceback",
                 getattr(exception, '__traceback__', sys.exc_info()[2])
@@ -112,8 +119,8 @@ class Event:
             self.options.pop("source_func", None)
         )
 
-        self._stacktrace = stacktrace
-        self._errors = self._generate_error_list(exception, stacktrace)
+        self._first_error = first_error
+        self._errors = self._generate_error_list(exception, first_error)
 
         self.grouping_hash = options.pop("grouping_hash", None)
         self.api_key = options.pop("api_key", get_config("api_key"))
@@ -184,6 +191,14 @@ class Event:
         self._stacktrace = value
         self._errors[0].stacktrace = value
 
+    @property
+    def _stacktrace(self) -> List[Dict[str, Any]]:
+        return self._first_error.stacktrace
+
+    @_stacktrace.setter
+    def _stacktrace(self, value: List[Dict[str, Any]]) -> None:
+        self._first_error.stacktrace = value
+
     @property
     def exception(self) -> BaseException:
         warnings.warn(
@@ -269,15 +284,9 @@ class Event:
     def _generate_error_list(
         self,
         exception: BaseException,
-        first_error_stacktrace: List[Dict[str, Any]]
+        first_error: Error
     ) -> List[Error]:
-        error_list = [
-            Error(
-                class_name(exception),
-                str(exception),
-                first_error_stacktrace
-            )
-        ]
+        error_list = [first_error]
 
         if not isinstance(exception, BaseException):
             return error_list
@@ -291,11 +300,7 @@ class Event:
                 break
 
             error_list.append(
-                Error(
-                    class_name(exception),
-                    str(exception),
-                    self._generate_stacktrace(exception.__traceback__)
-                )
+                self._error_for(exception, exception.__traceback__)
             )
 
         # unwrap BaseExceptionGroups so that their contained exceptions are
@@ -306,15 +311,37 @@ class Event:
         if isinstance(self._original_error, BaseExceptionGroup):
             for sub_exception in self._original_error.exceptions: # type: ignore # noqa
                 error_list.append(
-                    Error(
-                        class_name(sub_exception),
-                        str(sub_exception),
-                        self._generate_stacktrace(sub_exception.__traceback__)
+                    self._error_for(
+                        sub_exception,
+                        sub_exception.__traceback__
                     )
                 )
 
         return error_list
 
+    def _error_for(self, exception: BaseException, tb,
+                   source_func=None) -> Error:
+        """
+        Create the Error for an exception. With lazy_events enabled only the
+        locations of its frames are captured, and the stacktrace is built
+        from them when it's first used, which is usually while the event is
+        encoded on a delivery thread
+        """
+        if not self.config.lazy_events:
+            return Error(
+                class_name(exception),
+                str(exception),
+                self._generate_stacktrace(tb, source_func)
+            )
+
+        trace = self._frame_locations(tb, source_func)
+
+        return Error._deferred(
+            class_name(exception),
+            str(exception),
+            lambda: self._stacktrace_from(trace)
+        )
+
     def _generate_stacktrace(
         self,
         tb,
@@ -323,34 +350,16 @@ class Event:
         """
         Build the stacktrace
         """
+        return self._stacktrace_from(self._frame_locations(tb, source_func))
+
+    def _frame_locations(self, tb, source_func=None) -> List[FrameLocation]:
+        # frames are walked directly, rather than with the traceback module,
+        # so the only source read is the code sent with each frame
         if tb:
-            trace = traceback.extract_tb(tb)
+            trace = list(walk_traceback(tb))
         else:
-            trace = traceback.extract_stack()
-
-        bugsnag_module_path = os.path.dirname(bugsnag.__file__)
-        logging_module_path = os.path.dirname(logging.__file__)
-        exclude_module_paths = [bugsnag_module_path, logging_module_path]
-        user_exclude_modules = self.config.traceback_exclude_modules
-        for exclude_module in user_exclude_modules:
-            try:
-                module_file = exclude_module.__file__
-                if module_file[-4:] == '.pyc':
-                    module_file = module_file[:-1]
-                exclude_module_paths.append(module_file)
-            except Exception:
-                self.config.logger.exception(
-                    'Could not exclude module: %s' % repr(exclude_module))
-
-        lib_root = self.config.lib_root
-        if lib_root and lib_root[-1] != os.sep:
-            lib_root += os.sep
-
-        project_root = self.config.project_root
-        if project_root and project_root[-1] != os.sep:
-            project_root += os.sep
+            trace = walk_stack(sys._getframe())
 
-        stacktrace = []
         if source_func is not None:
             try:
                 source = inspect.getsourcefile(source_func)
@@ -359,39 +368,52 @@ class Event:
                 if lines is not None and len(lines) > 1:
                     line = lines[1]
 
-                trace.insert(
-                    0,
-                    [source, line, source_func.__name__]  # type: ignore
-                )
+                trace.insert(0, (str(source), line, source_func.__name__))
             except (IOError, TypeError):
                 pass
 
-        for frame in trace:
-            file_name = os.path.abspath(str(frame[0]))
-            in_project = False
+        return trace
 
-            skip_module = False
-            for module_path in exclude_module_paths:
-                if file_name.startswith(module_path):
-                    skip_module = True
-                    break
-            if skip_module:
+    def _stacktrace_from(
+        self,
+        trace: List[FrameLocation]
+    ) -> List[Dict[str, Any]]:
+        classifier = self.config._get_frame_classifier()
+        frames = []  # type: List[Any]
+
+        # repeated frames and frames past the limit are removed before any
+        # code is read for them
+        for location in collapse_repeated_frames(trace):
+            if isinstance(location, OmittedFrames):
+                frames.append(location)
+                continue
+
+            classification = classifier.classify(location[0])
+
+            if classification is not None:
+                frames.append((classification, location[1], location[2]))
+
+        stacktrace = []
+
+        for frame in limit_frames(frames, self.config.stacktrace_max_frames):
+            if isinstance(frame, OmittedFrames):
+                stacktrace.append(frame.to_dict())
                 continue
 
-            # Fetch the code before (potentially) removing the project root
-            # from the file path
-            code = self._code_for(file_name, int(str(frame[1])))
+            classification, frame_line, method = frame
+            absolute_path, file_name, in_project = classification
 
-            if lib_root and file_name.startswith(lib_root):
-                file_name = file_name[len(lib_root):]
-            elif project_root and file_name.startswith(project_root):
-                file_name = file_name[len(project_root):]
-                in_project = True
+            # the code is read from the absolute path, before the project
+            # root is removed
+            if in_project or self.config.send_code_out_of_project:
+                code = self._code_for(absolute_path, int(str(frame_line)))
+            else:
+                code = None
 
             stacktrace.append({
                 "file": file_name,
-                "lineNumber": int(str(frame[1])),
-                "method": str(frame[2]),
+                "lineNumber": int(str(frame_line)),
+                "method": str(method),
                 "inProject": in_project,
                 "code": code
             })
@@ -408,61 +430,104 @@ class Event:
             return None
 
         try:
-            lines = linecache.getlines(file_name)
-
-            start = max(line - int(window_size / 2), 1)
-            end = start + window_size
+            return self.config._snippet_cache.get(file_name, line, window_size)
+        except Exception:
+            return None
 
-            # The last line of the file is len(lines). End of an
-            # exclusive range is one greater.
-            if end > len(lines) + 1:
-                end = len(lines) + 1
-                start = max(end - window_size, 1)
+    def _payload(self) -> str:
+        return self._encoded_payload().decode('utf-8')
 
-            return dict((n, lines[n - 1].rstrip()) for n in range(start, end))
+    def _encoded_payload(self) -> bytes:
+        return self._assemble_payload(self.api_key, [self._event_payload()])
 
-        except Exception:
-            return None
+    @classmethod
+    def _assemble_payload(cls, api_key, encoded_events: List[bytes]) -> bytes:
+        """
+        Wrap one or more encoded events in a payload document
+        """
+        return b'{"apiKey":%s,%s,"events":[%s]}' % (
+            json.dumps(api_key).encode('utf-8'),
+            _encoded_notifier_fields(cls.PAYLOAD_VERSION),
+            b','.join(encoded_events)
+        )
 
-    def _payload(self):
-        # Fetch the notifier version from the package
+    def _event_payload(self) -> bytes:
         encoder = SanitizingJSONEncoder(
             self.config.logger,
             separators=(',', ':'),
-            keyword_filters=self.config.params_filters
+            keyword_matcher=self.config._get_keyword_matcher(),
+            serializer=self.config._get_serializer(),
+            type_encoders=self.config._type_encoders
         )
 
-        # Construct the payload dictionary
-        return encoder.encode({
-            "apiKey": self.api_key,
-            "notifier": _NOTIFIER_INFORMATION,
-            "payloadVersion": self.PAYLOAD_VERSION,
-            "events": [{
-                "severity": self.severity,
-                "severityReason": self.severity_reason,
-                "unhandled": self.unhandled,
-                "releaseStage": self.release_stage,
-                "app": {
-                    "version": self.app_version,
-                    "type": self.app_type,
-                },
-                "context": self.context,
-                "groupingHash": self.grouping_hash,
-                "exceptions": [
-                    error.to_dict() for error in self.errors
-                ],
-                "metaData": FilterDict(self.metadata),
-                "user": FilterDict(self.user),
-                "device": FilterDict({
-                    "hostname": self.hostname,
-                    "runtimeVersions": self.runtime_versions
-                }),
-                "projectRoot": self.config.project_root,
-                "libRoot": self.config.lib_root,
-                "session": self.session,
-                "breadcrumbs": [
-                    breadcrumb.to_dict() for breadcrumb in self._breadcrumbs
-                ],
-                "featureFlags": self._feature_flag_delegate.to_json()
-            }]
-        })
+        # the app and device details rarely change so are encoded once and
+        # spliced into each event. Events can override some of them so those
+        # are checked each time
+        static_fields = self.config._get_payload_fragment('event', (
+            self.app_version,
+            self.app_type,
+            self.hostname,
+            self.runtime_versions,
+        ), {
+            "app": {
+                "version": self.app_version,
+                "type": self.app_type,
+            },
+            "device": FilterDict({
+                "hostname": self.hostname,
+                "runtimeVersions": self.runtime_versions
+            }),
+            "projectRoot": self.config.project_root,
+            "libRoot": self.config.lib_root,
+        }, encoder)
+
+        # leave room for the rest of the payload document
+        budget = MAX_PAYLOAD_LENGTH - len(static_fields) - 1 - len(
+            self._assemble_payload(self.api_key, [b''])
+        )
+
+        # user supplied data is limited in order of priority, as they share
+        # a budget of nodes
+        limiter = Limiter(self.config, encoder)
+        metadata = limiter.limit(self.metadata)
+        user = limiter.limit(self.user)
+        breadcrumbs = [
+            breadcrumb.to_dict() for breadcrumb in self._breadcrumbs
+        ]
+
+        for breadcrumb in breadcrumbs:
+            breadcrumb['metaData'] = limiter.limit(breadcrumb['metaData'])
+
+        encoded = encode_within_budget(encoder, {
+            "severity": self.severity,
+            "severityReason": self.severity_reason,
+            "unhandled": self.unhandled,
+            "releaseStage": self.release_stage,
+            "context": self.context,
+            "groupingHash": self.grouping_hash,
+            "exceptions": [
+                error.to_dict() for error in self.errors
+            ],
+            "metaData": FilterDict(metadata),
+            "user": FilterDict(user),
+            "session": self.session,
+            "breadcrumbs": breadcrumbs,
+            "featureFlags": self._feature_flag_delegate.to_json()
+        }, budget)
+
+        return b'{' + static_fields + b',' + encoded[1:]
+
+
+@lru_cache(maxsize=None)
+def _encoded_notifier_fields(payload_version: str) -> bytes:
+    """
+    The "notifier" and "payloadVersion" members of a payload, which are the
+    same for the life of the process so are only encoded once
+    """
+    return b'"notifier":%s,"payloadVersion":%s' % (
+        json.dumps(
+            _NOTIFIER_INFORMATION,
+            separators=(',', ':')
+        ).encode('utf-8'),
+        json.dumps(payload_version).encode('utf-8')
+    )
@@ -0,0 +1,376 @@
+import atexit
+import heapq
+import itertools
+import os
+import logging
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Callable, Optional, List  # noqa
+
+__all__ = []  # type: List[str]
+
+OVERFLOW_DROP_NEWEST = 'drop_newest'
+OVERFLOW_DROP_OLDEST = 'drop_oldest'
+OVERFLOW_BLOCK = 'block'
+OVERFLOW_POLICIES = (
+    OVERFLOW_DROP_NEWEST,
+    OVERFLOW_DROP_OLDEST,
+    OVERFLOW_BLOCK,
+)
+
+# the maximum time to spend delivering queued requests when the interpreter
+# is shutting down
+SHUTDOWN_TIMEOUT = 5.0
+
+# every executor which has been created, so their state can be reset in
+# forked child processes
+_executors = weakref.WeakSet()  # type: weakref.WeakSet
+
+
+def _reset_after_fork() -> None:
+    for executor in list(_executors):
+        executor._reset_after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class _Task:
+    __slots__ = ('run', 'on_drop', 'on_abandon')
+
+    def __init__(self, run: Callable[[], None],
+                 on_drop: Optional[Callable[[], None]],
+                 on_abandon: Optional[Callable[[], None]] = None):
+        self.run = run
+        self.on_drop = on_drop
+        self.on_abandon = on_abandon
+
+
+class DeliveryExecutor:
+    """
+    A fixed number of long-lived worker threads fed by a bounded queue.
+
+    When the queue is full the overflow policy decides what happens to a new
+    task: 'drop_newest' discards it, 'drop_oldest' discards the task at the
+    front of the queue to make room and 'block' waits up to 'block_timeout'
+    seconds for space before discarding it.
+
+    Tasks can also be scheduled to run after a delay with 'submit_later'.
+    These wait on a single scheduler thread rather than a worker, so a task
+    waiting to be retried doesn't stop other tasks from running.
+
+    >>> executor = DeliveryExecutor(worker_count=1, queue_size=10)
+    >>> executor.submit(lambda: None)
+    True
+    >>> executor.join(timeout=1)
+    True
+    >>> executor.shutdown()
+    """
+
+    def __init__(self, worker_count: int = 1, queue_size: int = 100,
+                 overflow_policy: str = OVERFLOW_DROP_NEWEST,
+                 block_timeout: float = 1.0,
+                 logger: Optional[logging.Logger] = None):
+        self.worker_count = max(worker_count, 1)
+        self.queue_size = max(queue_size, 1)
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout
+        self.logger = logger or logging.getLogger('bugsnag')
+
+        self._condition = threading.Condition()
+        self._tasks = deque()  # type: deque
+        self._workers = []  # type: List[threading.Thread]
+        self._active = 0
+        self._is_shutdown = False
+        self._pid = None  # type: Optional[int]
+        self._registered_atexit = False
+
+        self._scheduled = []  # type: List[tuple]
+        self._sequence = itertools.count()
+        self._scheduler = None  # type: Optional[threading.Thread]
+
+        _executors.add(self)
+
+    def submit(self, task: Callable[[], None],
+               on_drop: Optional[Callable[[], None]] = None,
+               on_abandon: Optional[Callable[[], None]] = None) -> bool:
+        """
+        Queue a task to be run by a worker thread, returning False if the task
+        was dropped. 'on_drop' is called for any task discarded because the
+        queue was full and 'on_abandon' for any task still queued when the
+        interpreter exits.
+        """
+        dropped = None  # type: Optional[_Task]
+        new_task = _Task(task, on_drop, on_abandon)
+
+        with self._condition:
+            if self._is_shutdown:
+                dropped = new_task
+            else:
+                self._ensure_workers()
+
+                if len(self._tasks) >= self.queue_size:
+                    if self.overflow_policy == OVERFLOW_DROP_OLDEST:
+                        dropped = self._tasks.popleft()
+                    elif self.overflow_policy == OVERFLOW_BLOCK:
+                        self._condition.wait_for(
+                            lambda: len(self._tasks) < self.queue_size,
+                            self.block_timeout
+                        )
+
+                if len(self._tasks) >= self.queue_size:
+                    dropped = new_task
+                else:
+                    self._tasks.append(new_task)
+                    self._condition.notify_all()
+
+        if dropped is not None:
+            self.logger.warning(
+                'Delivery queue is full, dropping a request'
+            )
+
+            if dropped.on_drop is not None:
+                dropped.on_drop()
+
+        return dropped is not new_task
+
+    def submit_later(self, delay: float, task: Callable[[], None],
+                     on_drop: Optional[Callable[[], None]] = None,
+                     on_abandon: Optional[Callable[[], None]] = None) -> None:
+        """
+        Queue a task once 'delay' seconds have passed. 'on_drop' is called if
+        the queue is full at that point and 'on_abandon' if the executor is
+        shut down first.
+        """
+        new_task = _Task(task, on_drop, on_abandon)
+
+        with self._condition:
+            if not self._is_shutdown:
+                self._ensure_workers()
+
+                heapq.heappush(self._scheduled, (
+                    time.monotonic() + delay,
+                    next(self._sequence),
+                    new_task
+                ))
+                self._condition.notify_all()
+
+                return
+
+        self._abandon([new_task])
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every queued task has been run, including tasks which are
+        waiting for their delay to pass, returning False if the timeout was
+        reached first.
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: (
+                    not self._tasks and
+                    not self._scheduled and
+                    self._active == 0
+                ),
+                timeout
+            )
+
+    def shutdown(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop accepting new tasks. Workers finish the tasks that are already
+        queued and then exit; if a timeout is given, wait up to that long for
+        them to do so.
+        """
+        with self._condition:
+            self._is_shutdown = True
+            abandoned = self._take_scheduled()
+            self._condition.notify_all()
+            workers = list(self._workers)
+            registered_atexit = self._registered_atexit
+            self._registered_atexit = False
+
+        # the exit hook holds a reference to this executor, so would keep it
+        # alive until the interpreter exits
+        if registered_atexit:
+            atexit.unregister(self._drain_at_exit)
+
+        self._abandon(abandoned)
+
+        if timeout is None:
+            return
+
+        deadline = time.monotonic() + timeout
+        for worker in workers:
+            remaining = deadline - time.monotonic()
+
+            if remaining <= 0:
+                break
+
+            worker.join(remaining)
+
+    @property
+    def pending_count(self) -> int:
+        """
+        The number of tasks waiting for a worker
+        """
+        with self._condition:
+            return len(self._tasks)
+
+    @property
+    def scheduled_count(self) -> int:
+        """
+        The number of tasks waiting for their delay to pass
+        """
+        with self._condition:
+            return len(self._scheduled)
+
+    def _ensure_workers(self) -> None:
+        # worker threads do not survive a fork, so a child process needs to
+        # start its own workers. Where os.register_at_fork is available the
+        # rest of the state has already been reset by '_reset_after_fork'
+        pid = os.getpid()
+
+        if self._pid != pid:
+            if self._pid is not None:
+                self._tasks.clear()
+                self._scheduled = []
+
+            self._pid = pid
+            self._workers = []
+            self._active = 0
+            self._scheduler = None
+
+        while len(self._workers) < self.worker_count:
+            worker = threading.Thread(
+                target=self._work,
+                name='bugsnag-delivery-{}'.format(len(self._workers))
+            )
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+
+        if self._scheduler is None:
+            self._scheduler = threading.Thread(
+                target=self._schedule,
+                name='bugsnag-delivery-scheduler'
+            )
+            self._scheduler.daemon = True
+            self._scheduler.start()
+
+        if not self._registered_atexit:
+            self._registered_atexit = True
+            atexit.register(self._drain_at_exit)
+
+    def _work(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._tasks or self._is_shutdown
+                )
+
+                if not self._tasks:
+                    return
+
+                task = self._tasks.popleft()
+                self._active += 1
+                self._condition.notify_all()
+
+            try:
+                task.run()
+            except Exception:
+                self.logger.exception('Delivery task failed')
+            finally:
+                with self._condition:
+                    self._active -= 1
+                    self._condition.notify_all()
+
+    def _schedule(self) -> None:
+        while True:
+            with self._condition:
+                if self._is_shutdown:
+                    return
+
+                if not self._scheduled:
+                    self._condition.wait()
+                    continue
+
+                due, _, task = self._scheduled[0]
+                remaining = due - time.monotonic()
+
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+
+                heapq.heappop(self._scheduled)
+
+                # count the task as active while it moves to the queue so
+                # 'join' doesn't miss it while it is in neither
+                self._active += 1
+
+            try:
+                self.submit(task.run, task.on_drop, task.on_abandon)
+            finally:
+                with self._condition:
+                    self._active -= 1
+                    self._condition.notify_all()
+
+    def _take_scheduled(self) -> List[_Task]:
+        tasks = [task for _, _, task in sorted(self._scheduled)]
+        self._scheduled = []
+
+        return tasks
+
+    def _abandon(self, tasks: List[_Task]) -> None:
+        for task in tasks:
+            callback = task.on_abandon or task.on_drop
+
+            if callback is None:
+                continue
+
+            try:
+                callback()
+            except Exception:
+                self.logger.exception('Failed to save an abandoned request')
+
+    def _reset_after_fork(self) -> None:
+        # the parent's lock may have been held by one of its threads when the
+        # process forked and its tasks will be delivered by the parent, so the
+        # child starts from an empty executor
+        self._condition = threading.Condition()
+        self._tasks = deque()
+        self._scheduled = []
+        self._workers = []
+        self._active = 0
+        self._scheduler = None
+        self._pid = os.getpid()
+
+    def _drain_at_exit(self) -> None:
+        # waiting for retries to become due would hold up the exit, so they
+        # are abandoned straight away along with any retries scheduled while
+        # the queue drains
+        with self._condition:
+            self._is_shutdown = True
+            self._registered_atexit = False
+            abandoned = self._take_scheduled()
+            self._condition.notify_all()
+
+        self._abandon(abandoned)
+
+        if self.join(SHUTDOWN_TIMEOUT):
+            return
+
+        with self._condition:
+            abandoned = list(self._tasks)
+            self._tasks.clear()
+            self._condition.notify_all()
+
+        self.logger.warning(
+            'Delivery queue was not drained before exiting, %d requests '
+            'may be lost',
+            len(abandoned)
+        )
+
+        self._abandon(abandoned)
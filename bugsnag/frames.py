@@ -0,0 +1,338 @@
+import logging
+import os
+from functools import lru_cache
+from types import FrameType, TracebackType
+from typing import (  # noqa
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union
+)
+
+__all__ = []  # type: List[str]
+
+# the number of files a FrameClassifier remembers classifications for
+FRAME_CACHE_SIZE = 2048
+
+# the number of distinct combinations of settings which classifiers are kept
+# for, usually there's only one per process
+CLASSIFIER_CACHE_SIZE = 16
+
+# repeated frames are only collapsed if at least this many would be omitted
+MIN_OMITTED_FRAMES = 2
+
+# the file of the frame which stands in for omitted frames
+OMITTED_FILE = '[OMITTED]'
+
+# frames from these directories are never included in stacktraces
+_BUGSNAG_MODULE_PATH = os.path.dirname(os.path.abspath(__file__))
+_LOGGING_MODULE_PATH = os.path.dirname(logging.__file__)
+
+# (absolute path, path to display, whether the file is in the project)
+Classification = Tuple[str, str, bool]
+
+# (file name, line number, function name)
+FrameLocation = Tuple[str, int, str]
+
+_T = TypeVar('_T')
+
+
+class FrameClassifier:
+    """
+    Decides how frames from each file appear in stacktraces: whether they're
+    excluded, the file name to show (relative to lib_root or project_root if
+    it's inside them) and whether the file is in the project.
+
+    Classifications are cached by the file name from the frame, so a
+    traceback from the same call sites is only classified once. Classifiers
+    are shared by every configuration with the same settings; see
+    'get_frame_classifier'.
+
+    >>> classifier = FrameClassifier('/usr/lib/', '/app/', ('/app/vendor',))
+    >>> classifier.classify('/app/views.py')
+    ('/app/views.py', 'views.py', True)
+    >>> classifier.classify('/usr/lib/json/decoder.py')
+    ('/usr/lib/json/decoder.py', 'json/decoder.py', False)
+    >>> classifier.classify('/app/vendor/thing.py') is None
+    True
+    """
+
+    def __init__(self, lib_root: Optional[str], project_root: Optional[str],
+                 exclude_paths: Tuple[str, ...],
+                 cache_size: int = FRAME_CACHE_SIZE):
+        if lib_root and lib_root[-1] != os.sep:
+            lib_root += os.sep
+
+        if project_root and project_root[-1] != os.sep:
+            project_root += os.sep
+
+        self.lib_root = lib_root
+        self.project_root = project_root
+        self.exclude_paths = exclude_paths
+
+        self._cached_classify = lru_cache(maxsize=cache_size)(self._classify)
+
+    def classify(self, file_name: str) -> Optional[Classification]:
+        """
+        Classify a frame's file name, or return None if frames from it should
+        be excluded from stacktraces
+        """
+        # relative file names are resolved against the working directory,
+        # which can change
+        if os.path.isabs(file_name):
+            return self._cached_classify(file_name, None)
+
+        return self._cached_classify(file_name, os.getcwd())
+
+    def _classify(
+        self,
+        file_name: str,
+        working_directory: Optional[str]
+    ) -> Optional[Classification]:
+        if working_directory is None:
+            absolute_path = os.path.normpath(file_name)
+        else:
+            absolute_path = os.path.normpath(
+                os.path.join(working_directory, file_name)
+            )
+
+        if absolute_path.startswith(self.exclude_paths):
+            return None
+
+        lib_root = self.lib_root
+        project_root = self.project_root
+
+        if lib_root and absolute_path.startswith(lib_root):
+            return absolute_path, absolute_path[len(lib_root):], False
+
+        if project_root and absolute_path.startswith(project_root):
+            return absolute_path, absolute_path[len(project_root):], True
+
+        return absolute_path, absolute_path, False
+
+
+@lru_cache(maxsize=CLASSIFIER_CACHE_SIZE)
+def get_frame_classifier(lib_root: Optional[str], project_root: Optional[str],
+                         exclude_paths: Tuple[str, ...]) -> FrameClassifier:
+    """
+    Get the classifier for a combination of settings, which is shared by
+    every configuration using them
+    """
+    return FrameClassifier(lib_root, project_root, exclude_paths)
+
+
+def exclude_module_paths(modules: Iterable[Any],
+                         logger: logging.Logger) -> Tuple[str, ...]:
+    """
+    The paths which frames are excluded from: bugsnag, logging and the files
+    of 'modules'
+    """
+    paths = [_BUGSNAG_MODULE_PATH, _LOGGING_MODULE_PATH]
+
+    for module in modules:
+        try:
+            module_file = module.__file__
+            if module_file[-4:] == '.pyc':
+                module_file = module_file[:-1]
+            paths.append(module_file)
+        except Exception:
+            logger.exception('Could not exclude module: %s' % repr(module))
+
+    return tuple(paths)
+
+
+def walk_traceback(tb: Optional[TracebackType]) -> Iterator[FrameLocation]:
+    """
+    The location of each frame in a traceback, outermost first. Unlike
+    traceback.extract_tb, nothing is read from the source files
+    """
+    while tb is not None:
+        code = tb.tb_frame.f_code
+
+        yield code.co_filename, tb.tb_lineno, code.co_name
+
+        tb = tb.tb_next
+
+
+def walk_stack(frame: Optional[FrameType]) -> List[FrameLocation]:
+    """
+    The location of 'frame' and each of its callers, outermost first. Unlike
+    traceback.extract_stack, nothing is read from the source files
+    """
+    locations = []
+
+    while frame is not None:
+        code = frame.f_code
+        locations.append((code.co_filename, frame.f_lineno, code.co_name))
+        frame = frame.f_back
+
+    locations.reverse()
+
+    return locations
+
+
+class OmittedFrames:
+    """
+    Stands in for frames left out of a stacktrace, and becomes a frame
+    saying how many there were
+    """
+    __slots__ = ('count', 'repeated')
+
+    def __init__(self, count: int, repeated: bool = False):
+        self.count = count
+        self.repeated = repeated
+
+    def __repr__(self) -> str:
+        return 'OmittedFrames({!r}, repeated={!r})'.format(
+            self.count,
+            self.repeated
+        )
+
+    def __eq__(self, other: Any) -> bool:
+        return (
+            isinstance(other, OmittedFrames) and
+            self.count == other.count and
+            self.repeated == other.repeated
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        noun = 'repeated frame' if self.repeated else 'frame'
+
+        if self.count != 1:
+            noun += 's'
+
+        return {
+            'file': OMITTED_FILE,
+            'lineNumber': 0,
+            'method': '{} {}'.format(self.count, noun),
+            'inProject': False,
+            'code': None,
+        }
+
+
+def collapse_repeated_frames(
+    locations: Sequence[FrameLocation]
+) -> List[Union[FrameLocation, OmittedFrames]]:
+    """
+    Collapse runs of a repeating cycle of frames, like those of a recursive
+    function, to the first and last time the cycle appears with an
+    OmittedFrames between them. Cycles of any length are found in linear
+    time, by checking whether each frame repeats the one a cycle's length
+    before it; the length of a new cycle is the distance to the last time
+    the frame was seen
+
+    >>> collapse_repeated_frames(
+    ...     [('a.py', 1, 'a')] + [('b.py', 2, 'b'), ('c.py', 3, 'c')] * 4
+    ... )  # doctest: +NORMALIZE_WHITESPACE
+    [('a.py', 1, 'a'), ('b.py', 2, 'b'), ('c.py', 3, 'c'),
+     OmittedFrames(4, repeated=True),
+     ('b.py', 2, 'b'), ('c.py', 3, 'c')]
+    """
+    collapsed = []  # type: List[Union[FrameLocation, OmittedFrames]]
+    last_seen = {}  # type: Dict[FrameLocation, int]
+
+    # the run being followed repeats with this period from 'start'
+    period = 0
+    start = 0
+
+    # the index of the first location which hasn't been added to 'collapsed'
+    added = 0
+
+    for index, location in enumerate(locations):
+        if period == 0 or locations[index - period] != location:
+            added = _collapse_run(
+                locations, start, index, period, added, collapsed
+            )
+
+            previous = last_seen.get(location)
+
+            if previous is None:
+                period = 0
+            else:
+                period = index - previous
+                start = previous
+
+        last_seen[location] = index
+
+    added = _collapse_run(
+        locations, start, len(locations), period, added, collapsed
+    )
+    collapsed.extend(locations[added:])
+
+    return collapsed
+
+
+def _collapse_run(
+    locations: Sequence[FrameLocation],
+    start: int,
+    end: int,
+    period: int,
+    added: int,
+    collapsed: List[Union[FrameLocation, OmittedFrames]]
+) -> int:
+    """
+    Collapse the run of 'locations[start:end]' which repeats every 'period'
+    locations, returning the index of the first location which hasn't been
+    added to 'collapsed'
+    """
+    if period == 0:
+        return added
+
+    # part of the run may be in an earlier run which was collapsed
+    start = max(start, added)
+    repeats = (end - start) // period
+    omitted = (repeats - 2) * period
+
+    if omitted < MIN_OMITTED_FRAMES:
+        return added
+
+    collapsed.extend(locations[added:start + period])
+    collapsed.append(OmittedFrames(omitted, repeated=True))
+
+    last = start + (repeats - 1) * period
+    collapsed.extend(locations[last:last + period])
+
+    return last + period
+
+
+def limit_frames(
+    frames: List[Union[_T, OmittedFrames]],
+    max_frames: int
+) -> List[Union[_T, OmittedFrames]]:
+    """
+    Limit a stacktrace, outermost frame first, to 'max_frames' frames by
+    replacing frames from the middle with an OmittedFrames. More of the
+    innermost frames, nearest to where the error happened, are kept. A
+    limit of 0 turns it off
+
+    >>> limit_frames(list('abcdefgh'), 5)
+    ['a', 'b', OmittedFrames(4, repeated=False), 'g', 'h']
+    """
+    if max_frames == 0 or len(frames) <= max_frames:
+        return frames
+
+    if max_frames < 3:
+        # there's no room for a frame to stand in for the others
+        return frames[len(frames) - max_frames:]
+
+    head = (max_frames - 1) // 2
+    tail = max_frames - 1 - head
+    omitted = frames[head:len(frames) - tail]
+
+    # frames standing in for repeated frames count all of them
+    count = sum(
+        frame.count if isinstance(frame, OmittedFrames) else 1
+        for frame in omitted
+    )
+
+    return (
+        frames[:head] +
+        [OmittedFrames(count)] +
+        frames[len(frames) - tail:]
+    )
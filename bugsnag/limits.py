@@ -0,0 +1,296 @@
+import sys
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Set  # noqa
+
+from bugsnag.utils import (
+    FilterDict,
+    SanitizingJSONEncoder,
+    _RECURSIVE,
+    _leave_chain
+)
+
+__all__ = []  # type: List[str]
+
+# the key added to a dict to record how many of its keys were elided
+TRUNCATED_KEY = '...'
+
+_CONTAINER_TYPES = (dict, list, tuple, set, frozenset)
+
+_NO_LIMIT = sys.maxsize
+
+# values of these exact types never need to be visited
+_LEAF_TYPES = frozenset([str, int, float, bool, type(None), bytes])
+
+
+class Limiter:
+    """
+    Bounds the cost of encoding user supplied data, like metadata, by
+    replacing anything past these limits with a placeholder which records
+    how much was elided:
+
+    * 'metadata_max_depth' levels of nesting
+    * 'metadata_max_keys' keys in each dict
+    * 'metadata_max_items' items in each list, tuple or set
+    * 'metadata_max_nodes' values in total, shared by every call to 'limit'
+
+    A limit of 0 turns it off. Values with a type encoder, like dataclasses,
+    are converted with the encoder's type encoders first so their contents
+    are limited too, and the converted value is used in their place. The
+    traversal is iterative so even very deep structures can't exceed the
+    recursion limit, and values are only copied if something inside them
+    was converted or elided.
+
+    >>> from bugsnag import Configuration
+    >>> config = Configuration()
+    >>> config = config.configure(metadata_max_items=2)
+    >>> Limiter(config).limit({'numbers': [1, 2, 3, 4]})
+    {'numbers': [1, 2, '[TRUNCATED: 2 more items]']}
+    """
+
+    def __init__(self, config,
+                 encoder: Optional[SanitizingJSONEncoder] = None):
+        if encoder is None:
+            encoder = SanitizingJSONEncoder(
+                config.logger,
+                type_encoders=config._type_encoders
+            )
+
+        self.encoder = encoder
+        self.max_depth = config.metadata_max_depth
+        self.max_keys = config.metadata_max_keys
+        self.max_items = config.metadata_max_items
+
+        # None means there's no limit on the number of nodes
+        self.remaining_nodes = (
+            config.metadata_max_nodes or None
+        )  # type: Optional[int]
+
+    def limit(self, value: Any) -> Any:
+        """
+        Return 'value' if it's within the limits, otherwise a copy with
+        anything past them replaced
+        """
+        if not isinstance(value, _CONTAINER_TYPES):
+            return value
+
+        max_depth = self.max_depth or _NO_LIMIT
+        max_keys = self.max_keys or _NO_LIMIT
+        max_items = self.max_items or _NO_LIMIT
+        resolve = self.encoder._resolve
+
+        # the containers being visited, innermost last
+        stack = []  # type: List[_Frame]
+        path = set()  # type: Set[int]
+        result = value
+
+        # the value itself is never replaced, so callers get the same type
+        # back, but its contents may be elided
+        self._push(value, 0, stack, path)
+
+        while stack:
+            frame = stack[-1]
+            visited = frame.count
+            remaining = self.remaining_nodes
+
+            # the position of the last item this frame can take, given its
+            # own limit and the budget of nodes
+            count_stop = frame.max_count or _NO_LIMIT
+            node_stop = _NO_LIMIT if remaining is None else visited + remaining
+            stop = min(count_stop, node_stop)
+            too_deep = frame.depth + 1 >= max_depth
+
+            count = visited
+            child = None  # type: Any
+
+            # items are visited until one needs its own frame, then this
+            # frame's iterator is resumed once that one is finished
+            for count, item in enumerate(frame.items, visited + 1):
+                if count > stop:
+                    count -= 1
+                    break
+
+                item_type = type(item)
+
+                if item_type in _LEAF_TYPES:
+                    continue
+
+                chain = None  # type: Any
+
+                # the encoder doesn't look up type encoders for plain dicts
+                # and lists either
+                if item_type is not dict and item_type is not list:
+                    converted, chain = resolve(item, path)
+
+                    if converted is not item:
+                        frame.replace(count, converted)
+                        item = converted
+
+                    if chain is _RECURSIVE:
+                        continue
+
+                    if not isinstance(item, _CONTAINER_TYPES):
+                        _leave_chain(chain, path)
+                        continue
+
+                if id(item) in path:
+                    frame.replace(count, SanitizingJSONEncoder.recursive_value)
+                    _leave_chain(chain, path)
+                    continue
+
+                if too_deep:
+                    frame.replace(count, _placeholder(item))
+                    _leave_chain(chain, path)
+                    continue
+
+                # containers which only hold strings, numbers, booleans and
+                # None are kept without visiting their items if they are
+                # within the limits
+                size = len(item)
+
+                if isinstance(item, dict):
+                    small = size <= max_keys and _LEAF_TYPES.issuperset(
+                        map(type, item.values())
+                    )
+                else:
+                    small = size <= max_items and _LEAF_TYPES.issuperset(
+                        map(type, item)
+                    )
+
+                if small and size <= node_stop - count:
+                    node_stop -= size
+                    stop = min(stop, node_stop)
+                    _leave_chain(chain, path)
+                else:
+                    child = item
+                    break
+
+            frame.count = count
+
+            if remaining is not None:
+                self.remaining_nodes = node_stop - count
+
+            if child is not None:
+                self._push(child, frame.depth + 1, stack, path)
+                stack[-1].position = count
+                stack[-1].chain = chain
+
+                continue
+
+            stack.pop()
+            path.remove(id(frame.value))
+            _leave_chain(frame.chain, path)
+            limited = frame.close()
+
+            if not stack:
+                result = limited
+            elif limited is not frame.value:
+                stack[-1].replace(frame.position, limited)
+
+        return result
+
+    def _push(self, value: Any, depth: int, stack: List['_Frame'],
+              path: Set[int]) -> None:
+        if isinstance(value, dict):
+            frame = _Frame(value, iter(value.values()), self.max_keys, depth)
+        else:
+            frame = _Frame(value, iter(value), self.max_items, depth)
+
+        stack.append(frame)
+        path.add(id(value))
+
+
+class _Frame:
+    __slots__ = (
+        'value', 'items', 'max_count', 'depth', 'position', 'count',
+        'replacements', 'chain'
+    )
+
+    def __init__(self, value: Any, items: Iterator[Any], max_count: int,
+                 depth: int):
+        self.value = value
+        self.items = items
+        self.max_count = max_count
+        self.depth = depth
+
+        # the position of this container in its parent, counting from 1
+        self.position = 0
+
+        # the number of items which have been visited
+        self.count = 0
+
+        # replaced items by their position
+        self.replacements = None  # type: Optional[Dict[int, Any]]
+
+        # the values which were converted to this container, which are on
+        # the path until it's closed
+        self.chain = None  # type: Optional[List[Any]]
+
+    def replace(self, position: int, item: Any) -> None:
+        if self.replacements is None:
+            self.replacements = {}
+
+        self.replacements[position] = item
+
+    def close(self) -> Any:
+        """
+        Return the container, or a copy of it if any items were replaced or
+        elided
+        """
+        value = self.value
+        elided = len(value) - self.count
+
+        if self.replacements is None and elided == 0:
+            return value
+
+        replacements = self.replacements or {}
+
+        if isinstance(value, dict):
+            if isinstance(value, FilterDict):
+                limited = FilterDict()  # type: dict
+            else:
+                limited = {}
+
+            items = enumerate(islice(value.items(), self.count), 1)
+
+            for position, (key, item) in items:
+                limited[key] = replacements.get(position, item)
+
+            if elided:
+                limited[TRUNCATED_KEY] = '[TRUNCATED: {}]'.format(
+                    _count(elided, 'more key')
+                )
+
+            return limited
+
+        limited_items = [
+            replacements.get(position, item)
+            for position, item in enumerate(islice(value, self.count), 1)
+        ]
+
+        if elided:
+            limited_items.append('[TRUNCATED: {}]'.format(
+                _count(elided, 'more item')
+            ))
+
+        # sets become lists, as replaced items may not be hashable
+        if isinstance(value, tuple):
+            return tuple(limited_items)
+
+        return limited_items
+
+
+def _placeholder(value: Any) -> str:
+    if isinstance(value, dict):
+        return '[TRUNCATED: dict of {}]'.format(_count(len(value), 'key'))
+
+    return '[TRUNCATED: {} of {}]'.format(
+        type(value).__name__,
+        _count(len(value), 'item')
+    )
+
+
+def _count(count: int, noun: str) -> str:
+    if count == 1:
+        return '1 ' + noun
+
+    return '{} {}s'.format(count, noun)
@@ -0,0 +1,178 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from types import FrameType, TracebackType  # noqa
+from typing import Any, List, Optional, Tuple  # noqa
+
+__all__ = []  # type: List[str]
+
+# the number of error keys to track, the least recently seen keys are
+# forgotten first
+MAX_KEYS = 1000
+
+_Key = Tuple[str, Optional[str], Optional[int]]
+
+
+class _TokenBucket:
+    __slots__ = ('tokens', 'updated_at', 'suppressed')
+
+    def __init__(self, capacity: float, now: float):
+        self.tokens = capacity
+        self.updated_at = now
+        self.suppressed = 0
+
+    def refill(self, rate: float, capacity: float, now: float) -> None:
+        elapsed = max(now - self.updated_at, 0)
+        self.tokens = min(capacity, self.tokens + elapsed * rate)
+        self.updated_at = now
+
+
+class RateLimiter:
+    """
+    Limits how often the same error can be reported using a token bucket for
+    each error key, made up of the error class and the top in-project frame,
+    along with a bucket shared by every error.
+
+    Each key's bucket holds up to 'rate_limit_burst' events and refills at
+    'rate_limit_per_key' events per second. The shared bucket refills at
+    'rate_limit_global' events per second and holds one second's worth of
+    events. A rate of 0 turns that limit off.
+    """
+
+    def __init__(self):
+        self._mutex = threading.Lock()
+        self._buckets = OrderedDict()  # type: OrderedDict
+        self._global_bucket = None  # type: Optional[_TokenBucket]
+
+    def acquire(self, config, exception: BaseException,
+                tb: Optional[TracebackType]) -> Optional[int]:
+        """
+        Take a token for an error, returning None if it should be suppressed
+        or the number of times its key was suppressed since it was last
+        allowed through
+        """
+        per_key_rate = config.rate_limit_per_key
+        global_rate = config.rate_limit_global
+
+        if not per_key_rate and not global_rate:
+            return 0
+
+        key = _error_key(config, exception, tb)
+        now = time.monotonic()
+
+        with self._mutex:
+            bucket = self._bucket_for(key, config.rate_limit_burst, now)
+            bucket.refill(per_key_rate, config.rate_limit_burst, now)
+
+            global_capacity = max(global_rate, 1)
+
+            if self._global_bucket is None:
+                self._global_bucket = _TokenBucket(global_capacity, now)
+
+            global_bucket = self._global_bucket
+            global_bucket.refill(global_rate, global_capacity, now)
+
+            if (
+                (per_key_rate and bucket.tokens < 1) or
+                (global_rate and global_bucket.tokens < 1)
+            ):
+                bucket.suppressed += 1
+
+                return None
+
+            if per_key_rate:
+                bucket.tokens -= 1
+
+            if global_rate:
+                global_bucket.tokens -= 1
+
+            suppressed = bucket.suppressed
+            bucket.suppressed = 0
+
+            return suppressed
+
+    def _bucket_for(self, key: _Key, capacity: float,
+                    now: float) -> _TokenBucket:
+        bucket = self._buckets.get(key)
+
+        if bucket is None:
+            bucket = _TokenBucket(capacity, now)
+            self._buckets[key] = bucket
+
+            if len(self._buckets) > MAX_KEYS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+
+        return bucket
+
+
+def _error_key(config, exception: BaseException,
+               tb: Optional[TracebackType]) -> _Key:
+    error_class = type(exception)
+    class_name = '{}.{}'.format(
+        error_class.__module__,
+        error_class.__qualname__
+    )
+
+    location = _top_project_location(config, tb)
+
+    if location is None:
+        return class_name, None, None
+
+    return class_name, location[0], location[1]
+
+
+def _top_project_location(
+    config,
+    tb: Optional[TracebackType]
+) -> Optional[Tuple[str, int]]:
+    """
+    Find the file name and line number of the innermost frame in the project,
+    or of the innermost frame if none are. Without a traceback, the frames
+    calling into Bugsnag are used
+    """
+    project_root = config.project_root
+    if project_root and project_root[-1] != os.sep:
+        project_root += os.sep
+
+    lib_root = config.lib_root
+    if lib_root and lib_root[-1] != os.sep:
+        lib_root += os.sep
+
+    locations = []  # type: List[Tuple[str, int]]
+
+    if tb is not None:
+        # a traceback's line number is where the exception passed through
+        # its frame, which can differ from the frame's current line
+        while tb is not None:
+            locations.append((tb.tb_frame.f_code.co_filename, tb.tb_lineno))
+            tb = tb.tb_next
+
+        locations.reverse()
+    else:
+        bugsnag_path = os.path.dirname(os.path.abspath(__file__))
+        frame = sys._getframe(1)  # type: Optional[FrameType]
+
+        while frame is not None:
+            file_name = frame.f_code.co_filename
+
+            if not file_name.startswith(bugsnag_path):
+                locations.append((file_name, frame.f_lineno))
+
+            frame = frame.f_back
+
+    for file_name, line_number in locations:
+        if (
+            project_root and
+            file_name.startswith(project_root) and
+            not (lib_root and file_name.startswith(lib_root))
+        ):
+            return file_name, line_number
+
+    if locations:
+        return locations[0]
+
+    return None
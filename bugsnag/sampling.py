@@ -0,0 +1,113 @@
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional  # noqa
+
+__all__ = []  # type: List[str]
+
+# how often the adaptive sampler re-estimates the rate of handled events
+_WINDOW = 1.0
+
+# how much weight the latest window has in the estimated rate of events
+_SMOOTHING = 0.5
+
+
+class Sampler:
+    """
+    Decides which handled events are reported.
+
+    A sample rate between 0 and 1 can be set for each 'severityReason' type
+    or severity in 'sample_rates', where the severity reason takes precedence.
+    When 'sample_max_events_per_second' is set the rate is scaled down
+    further so that, on average, no more than that many events per second
+    are reported.
+
+    >>> from bugsnag import Configuration
+    >>> config = Configuration()
+    >>> config = config.configure(sample_rates={'info': 0})
+    >>> sampler = Sampler()
+    >>> sampler.sample(config, 'info', 'handledException')
+    >>> sampler.sample(config, 'warning', 'handledException')
+    1.0
+    """
+
+    def __init__(self, random_function: Callable[[], float] = random.random):
+        self._random = random_function
+        self._mutex = threading.Lock()
+        self._window_started_at = time.monotonic()
+        self._window_count = 0
+        self._estimated_rate = None  # type: Optional[float]
+
+    @property
+    def estimated_rate(self) -> Optional[float]:
+        """
+        The smoothed number of events per second which passed the configured
+        sample rates, or None before the first window has ended
+        """
+        return self._estimated_rate
+
+    def sample(self, config, severity: str,
+               severity_reason_type: str) -> Optional[float]:
+        """
+        Return None if an event should be dropped, otherwise the rate it was
+        sampled at
+        """
+        rate = _configured_rate(config, severity, severity_reason_type)
+        budget = config.sample_max_events_per_second
+
+        if rate <= 0 or (rate < 1 and self._random() >= rate):
+            return None
+
+        # the adaptive rate is estimated from the events which passed the
+        # configured rate, as those are the ones it needs to thin out
+        if budget > 0:
+            adaptive_rate = self._adaptive_rate(budget)
+
+            if adaptive_rate < 1 and self._random() >= adaptive_rate:
+                return None
+
+            rate *= adaptive_rate
+
+        return float(rate)
+
+    def _adaptive_rate(self, budget: float) -> float:
+        now = time.monotonic()
+
+        with self._mutex:
+            elapsed = now - self._window_started_at
+
+            if elapsed >= _WINDOW:
+                window_rate = self._window_count / elapsed
+
+                if self._estimated_rate is None:
+                    self._estimated_rate = window_rate
+                else:
+                    self._estimated_rate = (
+                        _SMOOTHING * window_rate +
+                        (1 - _SMOOTHING) * self._estimated_rate
+                    )
+
+                self._window_started_at = now
+                self._window_count = 0
+
+            self._window_count += 1
+
+            # a burst in the current window is reacted to straight away
+            # rather than waiting for it to end
+            current_rate = self._window_count / _WINDOW
+            estimated_rate = max(self._estimated_rate or 0.0, current_rate)
+
+        if estimated_rate <= budget:
+            return 1.0
+
+        return budget / estimated_rate
+
+
+def _configured_rate(config, severity: str,
+                     severity_reason_type: str) -> float:
+    sample_rates = config.sample_rates
+
+    if severity_reason_type in sample_rates:
+        return sample_rates[severity_reason_type]
+
+    return sample_rates.get(severity, 1.0)
@@ -0,0 +1,95 @@
+from typing import Any, Dict, List, Optional  # noqa
+
+try:
+    import orjson  # type: ignore[import]
+except ImportError:
+    orjson = None  # type: ignore
+
+try:
+    import ujson  # type: ignore[import]
+except ImportError:
+    ujson = None  # type: ignore
+
+__all__ = []  # type: List[str]
+
+JSON_BACKEND_AUTO = 'auto'
+JSON_BACKEND_STDLIB = 'json'
+JSON_BACKEND_ORJSON = 'orjson'
+JSON_BACKEND_UJSON = 'ujson'
+JSON_BACKENDS = (
+    JSON_BACKEND_AUTO,
+    JSON_BACKEND_STDLIB,
+    JSON_BACKEND_ORJSON,
+    JSON_BACKEND_UJSON,
+)
+
+
+class Serializer:
+    """
+    Writes objects made of dicts with string keys, lists, tuples, strings,
+    numbers, booleans and None as UTF-8 encoded JSON.
+
+    Serializers never see anything else: SanitizingJSONEncoder filters,
+    replaces recursive values and converts other objects to strings first,
+    and encodes payloads a serializer fails on itself.
+    """
+    name = ''
+
+    def dumps(self, obj: Any) -> bytes:
+        raise NotImplementedError()
+
+
+class OrjsonSerializer(Serializer):
+    name = JSON_BACKEND_ORJSON
+
+    def dumps(self, obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+
+class UjsonSerializer(Serializer):
+    name = JSON_BACKEND_UJSON
+
+    def dumps(self, obj: Any) -> bytes:
+        # ujson can only return a string, but as it's ASCII it's cheap to
+        # convert
+        return ujson.dumps(
+            obj,
+            ensure_ascii=True,
+            escape_forward_slashes=False
+        ).encode('ascii')
+
+
+_serializers = {}  # type: Dict[str, Serializer]
+
+if orjson is not None:
+    _serializers[JSON_BACKEND_ORJSON] = OrjsonSerializer()
+
+if ujson is not None:
+    _serializers[JSON_BACKEND_UJSON] = UjsonSerializer()
+
+
+def is_available(backend: str) -> bool:
+    """
+    Whether a JSON backend can be used, which depends on its package being
+    installed
+    """
+    return (
+        backend in (JSON_BACKEND_AUTO, JSON_BACKEND_STDLIB) or
+        backend in _serializers
+    )
+
+
+def get_serializer(backend: str) -> Optional[Serializer]:
+    """
+    Get the serializer for a JSON backend, or None if payloads should be
+    encoded by the standard library, which is the case for "json" and for
+    backends which aren't installed. "auto" uses orjson if it's installed,
+    then ujson.
+    """
+    if backend == JSON_BACKEND_AUTO:
+        return (
+            _serializers.get(JSON_BACKEND_ORJSON) or
+            _serializers.get(JSON_BACKEND_UJSON)
+        )
+
+    return _serializers.get(backend)
@@ -16,6 +16,7 @@ except ImportError:
 from bugsnag.notifier import _NOTIFIER_INFORMATION
 from bugsnag.utils import FilterDict, SanitizingJSONEncoder
 from bugsnag.event import Event
+from bugsnag.delivery import DeliveryPayload, payload_for
 from bugsnag.request_tracker import RequestTracker
 
 
@@ -115,27 +116,44 @@ class SessionTracker:
             self.config.logger.debug("Not delivering due to release_stages")
             return
 
-        payload = {
-            'notifier': _NOTIFIER_INFORMATION,
-            'device': FilterDict({
-                'hostname': self.config.hostname,
-                'runtimeVersions': self.config.runtime_versions
-            }),
-            'app': {
-                'releaseStage': self.config.release_stage,
-                'version': self.config.app_version
-            },
-            'sessionCounts': sessions
-        }
-
         try:
             encoder = SanitizingJSONEncoder(
                 self.config.logger,
                 separators=(',', ':'),
-                keyword_filters=self.config.params_filters
+                keyword_matcher=self.config._get_keyword_matcher(),
+                serializer=self.config._get_serializer(),
+                type_encoders=self.config._type_encoders
             )
 
-            encoded_payload = encoder.encode(payload)
+            # the notifier, device and app details rarely change so are
+            # encoded once and spliced into each payload. Runtime versions can
+            # be changed in place so are checked each time
+            static_fields = self.config._get_payload_fragment('session', (
+                self.config.runtime_versions,
+            ), {
+                'notifier': _NOTIFIER_INFORMATION,
+                'device': FilterDict({
+                    'hostname': self.config.hostname,
+                    'runtimeVersions': self.config.runtime_versions
+                }),
+                'app': {
+                    'releaseStage': self.config.release_stage,
+                    'version': self.config.app_version
+                },
+            }, encoder)
+
+            encoded_sessions = encoder.encode_bytes({
+                'sessionCounts': sessions
+            })
+
+            encoded_payload = payload_for(
+                self.config.delivery.deliver_sessions,
+                DeliveryPayload(
+                    b'{' + static_fields + b',' + encoded_sessions[1:],
+                    self.config.api_key,
+                    DeliveryPayload.SESSION
+                )
+            )
 
             deliver = self.config.delivery.deliver_sessions
 
@@ -0,0 +1,197 @@
+import linecache
+import os
+import sys
+import tokenize
+from collections import OrderedDict, deque
+from itertools import islice
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple  # noqa
+
+__all__ = []  # type: List[str]
+
+# the number of lines of code sent around each frame
+DEFAULT_WINDOW_SIZE = 7
+
+# the default total size of the snippets a SnippetCache keeps
+DEFAULT_MAX_BYTES = 1024 * 1024
+
+# an approximation of the memory used by each cached snippet and each of its
+# lines, on top of the text itself
+_ENTRY_OVERHEAD = 256
+_LINE_OVERHEAD = 64
+
+Snippet = Dict[int, str]
+
+# the modification time and size of a file, or None if it isn't validated
+Signature = Optional[Tuple[int, int]]
+
+
+class SnippetCache:
+    """
+    Reads the lines of code around a line of a file, and keeps the most
+    recently used snippets up to a total of 'max_bytes'. Only the lines up
+    to the end of the window are read, so unlike linecache whole files are
+    never kept in memory.
+
+    If 'validate' is True, cached snippets are only used while the file's
+    modification time and size are unchanged.
+
+    Sources which aren't files, like code typed into IPython or modules
+    imported from zip files, are read through linecache instead.
+
+    >>> cache = SnippetCache()
+    >>> snippet = cache.get(__file__, 1)
+    >>> sorted(snippet)
+    [1, 2, 3, 4, 5, 6, 7]
+    >>> snippet[1]
+    'import linecache'
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES,
+                 validate: bool = True):
+        self.max_bytes = max_bytes
+        self.validate = validate
+        self.size = 0
+
+        self._mutex = Lock()
+        self._snippets = OrderedDict()  # type: OrderedDict[Tuple[str, int, int], Tuple[Snippet, Signature, int]]  # noqa: E501
+
+    def get(self, file_name: str, line: int,
+            window_size: int = DEFAULT_WINDOW_SIZE) -> Snippet:
+        """
+        Get the 'window_size' lines around 'line' by their line numbers,
+        moved back to fit if 'line' is near the end of the file. Files which
+        can't be read have no lines
+        """
+        key = (file_name, line, window_size)
+        signature = None  # type: Signature
+
+        if self.validate:
+            try:
+                stat = os.stat(file_name)
+            except OSError:
+                # linecache keeps these sources so they aren't cached here
+                return read_linecache_snippet(file_name, line, window_size)
+
+            signature = (stat.st_mtime_ns, stat.st_size)
+
+        with self._mutex:
+            entry = self._snippets.get(key)
+
+            if entry is not None:
+                if entry[1] == signature:
+                    self._snippets.move_to_end(key)
+
+                    # callers get a copy, as snippets end up in events which
+                    # can be changed by callbacks
+                    return dict(entry[0])
+
+                self._remove(key)
+
+        snippet = read_snippet(file_name, line, window_size)
+
+        if snippet:
+            self._add(key, snippet, signature)
+
+        return dict(snippet)
+
+    def resize(self, max_bytes: int) -> None:
+        """
+        Change the total size of the snippets kept, evicting the least
+        recently used ones if they no longer fit
+        """
+        with self._mutex:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self) -> None:
+        with self._mutex:
+            self._snippets.clear()
+            self.size = 0
+
+    def _add(self, key: Tuple[str, int, int], snippet: Snippet,
+             signature: Signature) -> None:
+        size = _ENTRY_OVERHEAD + sum(
+            len(text) + _LINE_OVERHEAD for text in snippet.values()
+        )
+
+        with self._mutex:
+            if size > self.max_bytes:
+                return
+
+            if key in self._snippets:
+                self._remove(key)
+
+            self._snippets[key] = (snippet, signature, size)
+            self.size += size
+            self._evict()
+
+    def _remove(self, key: Tuple[str, int, int]) -> None:
+        self.size -= self._snippets.pop(key)[2]
+
+    def _evict(self) -> None:
+        while self.size > self.max_bytes:
+            self.size -= self._snippets.popitem(last=False)[1][2]
+
+
+def read_snippet(file_name: str, line: int,
+                 window_size: int = DEFAULT_WINDOW_SIZE) -> Snippet:
+    """
+    Read the 'window_size' lines around 'line' from a file, like
+    'SnippetCache.get' without caching, holding at most 'window_size' lines
+    in memory
+    """
+    start = max(line - window_size // 2, 1)
+    end = start + window_size
+
+    try:
+        # tokenize.open decodes the file like the interpreter does, using its
+        # encoding declaration if it has one
+        with tokenize.open(file_name) as source:
+            # if the file ends before the window does, the window is moved
+            # back so the last lines read are the ones kept
+            lines = deque(
+                enumerate(islice(source, end - 1), 1),
+                maxlen=window_size
+            )
+    except OSError:
+        return read_linecache_snippet(file_name, line, window_size)
+    except (SyntaxError, UnicodeDecodeError):
+        return {}
+
+    return dict((number, text.rstrip()) for number, text in lines)
+
+
+def read_linecache_snippet(file_name: str, line: int,
+                           window_size: int = DEFAULT_WINDOW_SIZE) -> Snippet:
+    """
+    Read the 'window_size' lines around 'line' from linecache, which has
+    sources that can't be opened as files: code registered with it, like
+    IPython cells, and modules whose loader provides their source, like
+    modules imported from zip files
+    """
+    lines = linecache.getlines(file_name, _module_globals(file_name))
+
+    start = max(line - window_size // 2, 1)
+    end = min(start + window_size, len(lines) + 1)
+    start = max(end - window_size, 1)
+
+    return dict(
+        (number, lines[number - 1].rstrip())
+        for number in range(start, end)
+    )
+
+
+def _module_globals(file_name: str) -> Optional[Dict[str, Any]]:
+    """
+    The globals of the module loaded from a file, which linecache uses to
+    find the module's loader
+    """
+    if file_name.startswith('<') and file_name.endswith('>'):
+        return None
+
+    for module in list(sys.modules.values()):
+        if getattr(module, '__file__', None) == file_name:
+            return vars(module)
+
+    return None
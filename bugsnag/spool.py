@@ -0,0 +1,283 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple  # noqa
+
+__all__ = []  # type: List[str]
+
+_SUFFIX = '.payload'
+_TEMP_SUFFIX = '.tmp'
+_CLAIMED_SUFFIX = '.claimed'
+
+# temporary files older than this were left behind by a process that died
+# while writing them
+_STALE_TEMP_FILE_AGE = 60
+
+# claimed payloads older than this were left behind by a process that died
+# while sending them, so they are put back to be sent again
+_STALE_CLAIM_AGE = 600
+
+
+class PayloadSpool:
+    """
+    A directory of payloads waiting to be delivered, which survives the
+    process exiting.
+
+    Each payload is written to a temporary file, flushed to disk and then
+    renamed into place so a crash never leaves a partially written payload
+    behind. The spool is bounded by 'max_bytes' and 'max_files'; when either
+    would be exceeded the oldest payloads are evicted first.
+
+    >>> import tempfile
+    >>> spool = PayloadSpool(tempfile.mkdtemp())
+    >>> path = spool.write(b'{"events":[]}', {'apiKey': 'abc123'})
+    >>> spool.read(path)
+    (b'{"events":[]}', {'apiKey': 'abc123'})
+    >>> spool.remove(path)
+    >>> spool.paths()
+    []
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 10 * 1024 * 1024,
+                 max_files: int = 1000,
+                 logger: Optional[logging.Logger] = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.logger = logger or logging.getLogger('bugsnag')
+
+        self._mutex = threading.Lock()
+        self._has_entries = True
+
+        os.makedirs(directory, exist_ok=True)
+        self._recover_stale_files()
+
+    @property
+    def has_entries(self) -> bool:
+        """
+        If the spool may contain payloads. This doesn't touch the disk so it
+        is cheap to check after every delivery
+        """
+        return self._has_entries
+
+    def write(self, body: bytes, metadata: Dict[str, Any]) -> Optional[str]:
+        """
+        Persist a payload and the metadata needed to send it, returning its
+        path or None if it could not be written
+        """
+        header = json.dumps(metadata, separators=(',', ':')).encode('utf-8')
+        size = len(header) + 1 + len(body)
+
+        if size > self.max_bytes:
+            self.logger.warning(
+                'Payload is larger than the spool size limit, dropping it'
+            )
+            return None
+
+        # names sort by creation time so the oldest payloads are replayed and
+        # evicted first
+        name = '{:017d}-{}'.format(int(time.time() * 1e6), uuid.uuid4().hex)
+        path = os.path.join(self.directory, name + _SUFFIX)
+        temp_path = os.path.join(self.directory, name + _TEMP_SUFFIX)
+
+        try:
+            with open(temp_path, 'wb') as temp_file:
+                temp_file.write(header)
+                temp_file.write(b'\n')
+                temp_file.write(body)
+                temp_file.flush()
+                os.fsync(temp_file.fileno())
+
+            with self._mutex:
+                self._evict(size)
+                os.replace(temp_path, path)
+                self._has_entries = True
+
+            self._sync_directory()
+        except OSError as e:
+            self.logger.warning('Failed to spool payload: %s', e)
+            self._remove_file(temp_path)
+
+            return None
+
+        return path
+
+    def read(self, path: str) -> Optional[Tuple[bytes, Dict[str, Any]]]:
+        """
+        Read a spooled payload and its metadata. Unreadable payloads are
+        removed and None is returned
+        """
+        try:
+            with open(path, 'rb') as spooled_file:
+                header = spooled_file.readline()
+                body = spooled_file.read()
+
+            metadata = json.loads(header.decode('utf-8'))
+
+            if not isinstance(metadata, dict):
+                raise ValueError('Spooled payload has no metadata')
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            self.logger.warning('Discarding unreadable spooled payload: %s', e)
+            self.remove(path)
+
+            return None
+
+        return body, metadata
+
+    def claim(self, path: str) -> Optional[str]:
+        """
+        Take a payload so that no other process sharing the spool sends it,
+        returning its new path or None if it has already been claimed. The
+        payload must then be removed once sent, or released to be sent later
+        """
+        name = os.path.basename(path)[:-len(_SUFFIX)]
+        claimed_path = os.path.join(self.directory, '{}.{}-{}{}'.format(
+            name,
+            os.getpid(),
+            uuid.uuid4().hex,
+            _CLAIMED_SUFFIX
+        ))
+
+        # renames are atomic, so only one process can succeed
+        try:
+            os.rename(path, claimed_path)
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            self.logger.warning('Failed to claim spooled payload: %s', e)
+
+            return None
+
+        # record when the payload was claimed so abandoned claims can be
+        # recognised
+        try:
+            os.utime(claimed_path)
+        except OSError:
+            pass
+
+        return claimed_path
+
+    def release(self, claimed_path: str) -> None:
+        """
+        Put a claimed payload back in the spool to be sent later
+        """
+        name = os.path.basename(claimed_path).split('.', 1)[0]
+        path = os.path.join(self.directory, name + _SUFFIX)
+
+        try:
+            os.rename(claimed_path, path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self.logger.warning('Failed to release spooled payload: %s', e)
+
+        with self._mutex:
+            self._has_entries = True
+
+    def remove(self, path: str) -> None:
+        """
+        Remove a payload from the spool
+        """
+        self._remove_file(path)
+
+    def paths(self) -> List[str]:
+        """
+        The paths of every spooled payload, oldest first
+        """
+        with self._mutex:
+            paths = [path for path, _ in self._entries()]
+            self._has_entries = len(paths) > 0
+
+            return paths
+
+    def _entries(self) -> List[Tuple[str, int]]:
+        entries = []
+
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+
+        for name in names:
+            if not name.endswith(_SUFFIX):
+                continue
+
+            path = os.path.join(self.directory, name)
+
+            try:
+                entries.append((path, os.path.getsize(path)))
+            except FileNotFoundError:
+                pass
+
+        entries.sort()
+
+        return entries
+
+    def _evict(self, incoming_size: int) -> None:
+        entries = self._entries()
+        total_size = sum(size for _, size in entries) + incoming_size
+
+        while entries and (
+            total_size > self.max_bytes or
+            len(entries) + 1 > self.max_files
+        ):
+            path, size = entries.pop(0)
+            self._remove_file(path)
+            total_size -= size
+
+            self.logger.warning(
+                'Spool is full, discarding the oldest spooled payload'
+            )
+
+    def _remove_file(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self.logger.warning('Failed to remove spooled payload: %s', e)
+
+    def _recover_stale_files(self) -> None:
+        now = time.time()
+
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+
+        for name in names:
+            path = os.path.join(self.directory, name)
+
+            try:
+                if (
+                    name.endswith(_TEMP_SUFFIX) and
+                    os.path.getmtime(path) < now - _STALE_TEMP_FILE_AGE
+                ):
+                    self._remove_file(path)
+                elif (
+                    name.endswith(_CLAIMED_SUFFIX) and
+                    os.path.getmtime(path) < now - _STALE_CLAIM_AGE
+                ):
+                    self.release(path)
+            except OSError:
+                pass
+
+    def _sync_directory(self) -> None:
+        # make the rename itself durable; directories can't be opened on
+        # Windows, where the rename is already durable
+        try:
+            fd = os.open(self.directory, os.O_RDONLY)
+        except OSError:
+            return
+
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
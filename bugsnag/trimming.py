@@ -0,0 +1,263 @@
+import logging
+from typing import Any, Dict, List, Set  # noqa
+
+from bugsnag.utils import FilterDict, SanitizingJSONEncoder
+
+__all__ = []  # type: List[str]
+
+# the metadata tab recording what was trimmed from an event
+TRIMMED_TAB = 'trimmed'
+
+TRIMMED_VALUE = '[TRIMMED]'
+
+# metadata values are only trimmed if their JSON is longer than this, as
+# smaller values are rarely what makes an event too large
+LARGE_VALUE_LENGTH = 256
+
+# the number of trimmed metadata paths to list in the trimmed tab
+MAX_RECORDED_PATHS = 20
+
+# deep stacktraces keep at least this many frames until the last resort
+MIN_FRAMES = 2
+
+_logger = logging.getLogger('bugsnag')
+
+
+def encode_within_budget(encoder: SanitizingJSONEncoder,
+                         payload: Dict[str, Any], budget: int) -> bytes:
+    """
+    Encode an event payload as UTF-8 JSON, trimming it if it is longer than
+    'budget' bytes.
+
+    Parts of the event are trimmed in order of priority until it fits:
+
+    1. metadata values longer than LARGE_VALUE_LENGTH, largest first
+    2. breadcrumbs, oldest first
+    3. code snippets of frames outside of the project, outermost first
+    4. frames from the middle of the longest stacktraces
+    5. strings longer than MAX_STRING_LENGTH characters
+
+    If the event still doesn't fit, everything but the essential fields of
+    the first exception is removed. What was trimmed is recorded in the
+    'trimmed' metadata tab. The payload is modified in place, but objects it
+    references (like the metadata) are copied before being changed
+    """
+    # strings are only trimmed once everything else has been, so the event
+    # is encoded without the encoder trimming them
+    encoded = encoder._encode_untrimmed_bytes(payload)
+
+    if len(encoded) <= budget:
+        return encoded
+
+    return _EventTrimmer(encoder, payload, budget).trim(encoded)
+
+
+class _EventTrimmer:
+    def __init__(self, encoder: SanitizingJSONEncoder,
+                 payload: Dict[str, Any], budget: int):
+        self.encoder = encoder
+        self.payload = payload
+        self.budget = budget
+        self.record = {}  # type: Dict[str, Any]
+        self.trimmed_paths = []  # type: List[str]
+        self.copied_exceptions = False
+        self.trimmed_strings = False
+
+        metadata = FilterDict(payload.get('metaData') or {})
+        metadata[TRIMMED_TAB] = self.record
+        payload['metaData'] = metadata
+
+    def trim(self, encoded: bytes) -> bytes:
+        steps = [
+            self.trim_metadata,
+            self.trim_breadcrumbs,
+            self.trim_code,
+            self.trim_frames,
+            self.trim_strings,
+        ]
+
+        # sizes are estimated while trimming so a step is repeated until
+        # there's nothing left for it to trim
+        for step in steps:
+            while step(len(encoded) - self.budget):
+                encoded = self.encode(self.payload)
+
+                if len(encoded) <= self.budget:
+                    return encoded
+
+        self.trim_to_essentials()
+        encoded = self.encoder._encode_trimmed_bytes(self.payload)
+
+        if len(encoded) > self.budget:
+            _logger.warning(
+                'Event payload is still %d bytes after trimming',
+                len(encoded)
+            )
+
+        return encoded
+
+    def encode(self, value: Any) -> bytes:
+        if self.trimmed_strings:
+            return self.encoder._encode_trimmed_bytes(value)
+
+        return self.encoder._encode_untrimmed_bytes(value)
+
+    def size(self, value: Any) -> int:
+        return len(self.encode(value))
+
+    def trim_metadata(self, overflow: int) -> bool:
+        metadata = self.payload['metaData']
+        candidates = []
+
+        for tab, values in metadata.items():
+            if tab == TRIMMED_TAB or values is TRIMMED_VALUE:
+                continue
+
+            if isinstance(values, dict):
+                for key, value in values.items():
+                    if value is TRIMMED_VALUE:
+                        continue
+
+                    # encode the key too so that filtered values are small
+                    size = self.size(FilterDict({key: value}))
+
+                    if size > LARGE_VALUE_LENGTH:
+                        candidates.append((size, tab, key))
+            else:
+                size = self.size(values)
+
+                if size > LARGE_VALUE_LENGTH:
+                    candidates.append((size, tab, None))
+
+        if not candidates:
+            return False
+
+        candidates.sort(key=lambda candidate: -candidate[0])
+        copied_tabs = set()  # type: Set[int]
+
+        for size, tab, key in candidates:
+            if overflow <= 0:
+                break
+
+            if key is None:
+                metadata[tab] = TRIMMED_VALUE
+                self.trimmed_paths.append(str(tab))
+            else:
+                if id(metadata[tab]) not in copied_tabs:
+                    metadata[tab] = dict(metadata[tab])
+                    copied_tabs.add(id(metadata[tab]))
+
+                metadata[tab][key] = TRIMMED_VALUE
+                self.trimmed_paths.append('{}.{}'.format(tab, key))
+
+            overflow -= size - len(TRIMMED_VALUE)
+
+        recorded = self.trimmed_paths[:MAX_RECORDED_PATHS]
+        remaining = len(self.trimmed_paths) - len(recorded)
+
+        if remaining > 0:
+            recorded.append('and {} more'.format(remaining))
+
+        self.record['metadata'] = recorded
+
+        return True
+
+    def trim_breadcrumbs(self, overflow: int) -> bool:
+        breadcrumbs = list(self.payload.get('breadcrumbs') or [])
+        removed = 0
+
+        while breadcrumbs and overflow > 0:
+            overflow -= self.size(breadcrumbs.pop(0)) + 1
+            removed += 1
+
+        self.payload['breadcrumbs'] = breadcrumbs
+
+        return self.count('breadcrumbs', removed)
+
+    def trim_code(self, overflow: int) -> bool:
+        removed = 0
+
+        for stacktrace in self.stacktraces():
+            for frame in reversed(stacktrace):
+                if overflow <= 0:
+                    break
+
+                if frame.get('inProject') or frame.get('code') is None:
+                    continue
+
+                overflow -= self.size(frame['code']) - len('null')
+                frame['code'] = None
+                removed += 1
+
+        return self.count('codeSnippets', removed)
+
+    def trim_frames(self, overflow: int) -> bool:
+        stacktraces = self.stacktraces()
+        removed = 0
+
+        while overflow > 0:
+            stacktrace = max(stacktraces, key=len, default=[])
+
+            if len(stacktrace) <= MIN_FRAMES:
+                break
+
+            frame = stacktrace.pop(len(stacktrace) // 2)
+            overflow -= self.size(frame) + 1
+            removed += 1
+
+        return self.count('stackFrames', removed)
+
+    def trim_strings(self, overflow: int) -> bool:
+        if self.trimmed_strings:
+            return False
+
+        self.trimmed_strings = True
+        self.record['strings'] = True
+
+        return True
+
+    def trim_to_essentials(self) -> None:
+        for stacktrace in self.stacktraces()[:1]:
+            del stacktrace[1:]
+
+            for frame in stacktrace:
+                frame['code'] = None
+
+        self.payload['exceptions'] = self.payload['exceptions'][:1]
+        self.payload['metaData'] = FilterDict({TRIMMED_TAB: self.record})
+        self.payload['user'] = FilterDict()
+        self.payload['breadcrumbs'] = []
+        self.payload['featureFlags'] = []
+        self.record['essentialsOnly'] = True
+
+    def stacktraces(self) -> List[List[Dict[str, Any]]]:
+        """
+        The stacktrace of each exception, copied so frames can be changed
+        without affecting the event
+        """
+        if not self.copied_exceptions:
+            self.payload['exceptions'] = [
+                dict(
+                    exception,
+                    stacktrace=[
+                        dict(frame)
+                        for frame in exception.get('stacktrace') or []
+                    ]
+                )
+                for exception in self.payload.get('exceptions') or []
+            ]
+
+            self.copied_exceptions = True
+
+        return [
+            exception['stacktrace']
+            for exception in self.payload['exceptions']
+        ]
+
+    def count(self, name: str, removed: int) -> bool:
+        if removed == 0:
+            return False
+
+        self.record[name] = self.record.get(name, 0) + removed
+
+        return True
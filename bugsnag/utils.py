@@ -1,8 +1,16 @@
-from functools import wraps, partial
+from functools import lru_cache, wraps, partial
 import inspect
+import math
+import re
 from json import JSONEncoder
+from json.encoder import (  # type: ignore
+    encode_basestring,
+    encode_basestring_ascii
+)
 from threading import local as threadlocal
-from typing import AnyStr, Tuple, Optional
+from typing import (  # noqa
+    Any, AnyStr, Callable, Dict, Iterable, List, Optional, Set, Tuple
+)
 import warnings
 import sys
 import copy
@@ -10,6 +18,8 @@ import logging
 from datetime import datetime, timedelta
 from urllib.parse import urlparse, urlunsplit, parse_qs
 
+from bugsnag.encoders import TypeEncoders, default_type_encoders
+
 
 try:
     from os import PathLike
@@ -22,6 +32,9 @@ except ImportError:
 MAX_PAYLOAD_LENGTH = 128 * 1024
 MAX_STRING_LENGTH = 1024
 
+# the number of keys a KeywordMatcher remembers decisions for
+MATCH_CACHE_SIZE = 4096
+
 
 __all__ = []  # type: ignore
 
@@ -46,116 +59,179 @@ class SanitizingJSONEncoder(JSONEncoder):
     recursive_value = '[RECURSIVE]'
     unencodeable_value = '[BADENCODING]'
 
-    def __init__(self, logger: logging.Logger, keyword_filters=None, **kwargs):
+    def __init__(self, logger: logging.Logger, keyword_filters=None,
+                 keyword_matcher: Optional['KeywordMatcher'] = None,
+                 serializer: Any = None,
+                 type_encoders: Optional[TypeEncoders] = None, **kwargs):
+        if keyword_matcher is None:
+            keyword_matcher = KeywordMatcher(keyword_filters or [])
+
+        if type_encoders is None:
+            type_encoders = _DEFAULT_TYPE_ENCODERS
+
         self.logger = logger
-        self.filters = list(map(str.lower, keyword_filters or []))
+        self.keyword_matcher = keyword_matcher
+        self.filters = keyword_matcher.keywords
         self.bytes_filters = [x.encode('utf-8') for x in self.filters]
+        self.serializer = serializer
+        self.type_encoders = type_encoders
         super(SanitizingJSONEncoder, self).__init__(**kwargs)
 
     def encode(self, obj):
-        safe_obj = self._sanitize(obj, False)
-        payload = super(SanitizingJSONEncoder, self).encode(safe_obj)
+        payload = self._encode_built(obj, False)
+
         if len(payload) > MAX_PAYLOAD_LENGTH:
-            safe_obj = self._sanitize(safe_obj, True)
-            return super(SanitizingJSONEncoder, self).encode(safe_obj)
-        else:
+            return self._encode_built(obj, True)
+
+        return payload
+
+    def encode_bytes(self, obj) -> bytes:
+        """
+        Encode an object as UTF-8 JSON, using the serializer if one was given.
+        The result is equivalent to the output of 'encode'
+        """
+        payload = self._serialize(obj, False)
+
+        if payload is not None and len(payload) > MAX_PAYLOAD_LENGTH:
+            payload = self._serialize(obj, True)
+
+        if payload is None:
+            return self.encode(obj).encode('utf-8', 'replace')
+
+        return payload
+
+    def _encode_trimmed_bytes(self, obj) -> bytes:
+        """
+        Encode an object as UTF-8 JSON with every string trimmed, whatever the
+        length of the payload
+        """
+        return self._encode_bytes(obj, True)
+
+    def _encode_untrimmed_bytes(self, obj) -> bytes:
+        """
+        Encode an object as UTF-8 JSON without trimming any strings, whatever
+        the length of the payload
+        """
+        return self._encode_bytes(obj, False)
+
+    def _encode_bytes(self, obj, trim_strings: bool) -> bytes:
+        payload = self._serialize(obj, trim_strings)
+
+        if payload is not None:
             return payload
 
-    def filter_string_values(self, obj, ignored=None, seen=None):
+        return self._encode_built(obj, trim_strings).encode('utf-8', 'replace')
+
+    def _encode_built(self, obj, trim_strings: bool) -> str:
+        """
+        Encode a sanitized copy of an object with the standard encoder
+        """
+        payload = _build_payload(self, obj, trim_strings)
+
+        try:
+            return super(SanitizingJSONEncoder, self).encode(payload)
+        except RecursionError:
+            # the standard encoder recurses into nested containers, so deeply
+            # nested payloads are written with an explicit stack instead
+            if self.indent is not None or self.sort_keys:
+                raise
+
+            return _encode_deeply_nested(self, payload)
+
+    def _serialize(self, obj, trim_strings: bool) -> Optional[bytes]:
         """
-        Remove any value from the dictionary which match the key filters
+        Encode an object with the serializer, or return None if there isn't
+        one or it can't write the object the same way as 'encode' would
         """
-        if not ignored:
-            ignored = set()
+        if (
+            self.serializer is None or
+            self.indent is not None or
+            self.sort_keys
+        ):
+            return None
 
-        # Keep track of nested objects to avoid having references garbage
-        # collected (which would cause id reuse and false positive recursion
-        if seen is None:
-            seen = []
+        try:
+            return self.serializer.dumps(
+                _build_payload(self, obj, trim_strings, strict=True)
+            )
+        except (_UnsupportedValue, TypeError, ValueError, OverflowError):
+            # e.g. NaN or an integer wider than 64 bits, which serializers
+            # either reject or write differently
+            return None
+
+    def filter_string_values(self, obj, ignored=None, seen=None):
+        """
+        Remove any value from the dictionary which match the key filters.
+        Nested dicts are filtered too and any depth of nesting can be
+        filtered. 'seen' is no longer needed and is only accepted for
+        backwards compatibility
+        """
+        return _build_payload(
+            self, obj, False, ignored_ids=ignored, filter_only=True
+        )
 
-        if type(ignored) is list:
-            ignored = set(ignored)
+    def _resolve(self, value, path):
+        """
+        Convert a value with its type encoder, until it has none. The values
+        which were converted are added to 'path' and returned with the
+        result, as (result, converted values). If a value is already in
+        'path' this returns '[RECURSIVE]' and _RECURSIVE instead
+        """
+        chain = None
 
-        if id(obj) in ignored:
-            return self.recursive_value
+        while True:
+            if id(value) in path:
+                _leave_chain(chain, path)
 
-        if isinstance(obj, dict):
-            ignored.add(id(obj))
-            seen.append(obj)
+                return self.recursive_value, _RECURSIVE
 
-            clean_dict = {}
-            for key, value in obj.items():
-                if self._should_filter(key):
-                    clean_dict[key] = self.filtered_value
-                else:
-                    clean_dict[key] = self.filter_string_values(
-                        value, ignored, seen)
+            type_encoder = self.type_encoders.lookup(type(value))
 
-            # Only ignore whilst encoding children
-            ignored.remove(id(obj))
+            if type_encoder is None:
+                return value, chain
 
-            return clean_dict
+            # converted values are filtered and sanitized too, as a
+            # dataclass may well have a 'password' field
+            if chain is None:
+                chain = []
 
-        return obj
+            path.add(id(value))
+            chain.append(value)
+            value = self._convert(value, type_encoder)
 
     def default(self, obj):
         """
-        Coerce values to strings if possible, otherwise replace with
-        '[BADENCODING]'
+        Convert values using their type encoder, or coerce them to strings,
+        otherwise replace with '[BADENCODING]'
         """
         try:
             if isinstance(obj, bytes):
                 return str(obj, encoding='utf-8', errors='replace')
             else:
-                return str(obj)
+                return self.type_encoders.encode(obj)
 
         except Exception:
             self.logger.exception('Could not add object to payload')
             return self.unencodeable_value
 
+    def _convert(self, obj, type_encoder):
+        """
+        Convert a value with its type encoder, or replace it with
+        '[BADENCODING]' if the encoder fails
+        """
+        try:
+            return type_encoder(obj)
+        except Exception:
+            self.logger.exception('Could not add object to payload')
+            return self.unencodeable_value
+
     def _sanitize(self, obj, trim_strings, ignored=None, seen=None):
         """
         Replace recursive values and trim strings longer than
-        MAX_STRING_LENGTH
+        MAX_STRING_LENGTH, leaving values which the standard encoder can
+        write by calling 'default'
         """
-        if not ignored:
-            ignored = set()
-
-        # Keep track of nested objects to avoid having references garbage
-        # collected (which would cause id reuse and false positive recursion)
-        if seen is None:
-            seen = []
-
-        if type(ignored) is list:
-            ignored = set(ignored)
-
-        if id(obj) in ignored:
-            return self.recursive_value
-        elif isinstance(obj, dict):
-            seen.append(obj)
-
-            ignored.add(id(obj))
-            sanitized = self._sanitize_dict(obj, trim_strings, ignored, seen)
-            # Only ignore whilst encoding children
-            ignored.remove(id(obj))
-
-            return sanitized
-        elif isinstance(obj, (set, tuple, list)):
-            seen.append(obj)
-
-            ignored.add(id(obj))
-            items = []
-            for value in obj:
-                items.append(
-                        self._sanitize(value, trim_strings, ignored, seen))
-            # Only ignore whilst encoding children
-            ignored.remove(id(obj))
-
-            return items
-        elif trim_strings and isinstance(obj, str):
-            return obj[:MAX_STRING_LENGTH]
-        else:
-            return obj
+        return _build_payload(self, obj, trim_strings, ignored_ids=ignored)
 
     def _sanitize_dict_key_value(self, clean_dict, key, clean_value):
         """
@@ -180,33 +256,51 @@ class SanitizingJSONEncoder(JSONEncoder):
                     'Could not add sanitize key for dictionary, '
                     'dropping value.')
 
-    def _sanitize_dict(self, obj, trim_strings, ignored, seen):
-        """
-        Trim individual values in an object, applying filtering if the object
-        is a FilterDict
-        """
-        if isinstance(obj, FilterDict):
-            obj = self.filter_string_values(obj)
+    def _should_filter(self, key):
+        return self.keyword_matcher.matches(key)
 
-        clean_dict = {}
-        for key, value in obj.items():
 
-            clean_value = self._sanitize(value, trim_strings, ignored, seen)
+class KeywordMatcher:
+    """
+    Decides whether a key contains any of a list of keywords, ignoring case.
+    The keywords are compiled into a single regular expression for str keys
+    and another for bytes keys, and the decision for recently seen keys is
+    cached.
 
-            self._sanitize_dict_key_value(clean_dict, key, clean_value)
+    Matchers are built once per set of keywords and shared, so the cache
+    is shared by every encoder using the same matcher.
 
-        return clean_dict
+    >>> matcher = KeywordMatcher(['password', 'token'])
+    >>> matcher.matches('X-Auth-Token')
+    True
+    >>> matcher.matches(b'PASSWORD_CONFIRMATION')
+    True
+    >>> matcher.matches('username')
+    False
+    """
 
-    def _should_filter(self, key):
-        if isinstance(key, str):
-            key_lower = key.lower()
-            return any(f in key_lower for f in self.filters)
+    def __init__(self, keywords: Iterable[str],
+                 cache_size: int = MATCH_CACHE_SIZE):
+        self.keywords = [keyword.lower() for keyword in keywords]
 
-        if isinstance(key, bytes):
-            key_lower = key.lower()
-            return any(f in key_lower for f in self.bytes_filters)
+        self._pattern = re.compile('|'.join(map(re.escape, self.keywords)))
+        self._bytes_pattern = re.compile(b'|'.join(
+            re.escape(keyword.encode('utf-8')) for keyword in self.keywords
+        ))
 
-        return False
+        self._cached_match = lru_cache(maxsize=cache_size)(self._match)
+
+    def matches(self, key: Any) -> bool:
+        if not self.keywords or not isinstance(key, (str, bytes)):
+            return False
+
+        return self._cached_match(key)
+
+    def _match(self, key: AnyStr) -> bool:
+        if isinstance(key, str):
+            return self._pattern.search(key.lower()) is not None
+
+        return self._bytes_pattern.search(key.lower()) is not None
 
 
 class FilterDict(dict):
@@ -216,9 +310,374 @@ class FilterDict(dict):
     pass
 
 
+# converts values for encoders which weren't given a registry of their own
+_DEFAULT_TYPE_ENCODERS = default_type_encoders()
+
+# stands in for the value of a key which matched a keyword filter
+_FILTERED = object()
+
+# returned by SanitizingJSONEncoder._resolve for values which are already on
+# the path being walked
+_RECURSIVE = object()
+
+
+def _leave_chain(chain: Optional[List[Any]], path: Set[int]) -> None:
+    if chain:
+        for value in chain:
+            path.discard(id(value))
+
+
+# values of these exact types are encoded the same way with or without
+# sanitizing, apart from long strings when trimming
+_PLAIN_TYPES = frozenset([str, int, float, bool, type(None)])
+
+# how deeply _build_payload recurses into containers before continuing from a
+# list of deferred containers, which keeps the common shallow payloads fast
+# without deep ones exhausting the stack
+_MAX_NESTING = 50
+
+
 ContentType = Tuple[str, Optional[str], Optional[str], Optional[str]]
 
 
+class _UnsupportedValue(Exception):
+    pass
+
+
+def _build_payload(encoder: SanitizingJSONEncoder, obj: Any,
+                   trim_strings: bool, strict: bool = False,
+                   ignored_ids: Optional[Iterable[Any]] = None,
+                   filter_only: bool = False) -> Any:
+    """
+    Build a sanitized copy of an object, replacing recursive values,
+    filtering FilterDicts, coercing keys and (optionally) trimming strings.
+    This is the only walk over payloads: 'encode' writes the copy with the
+    standard encoder and serializers write it themselves. Containers which
+    need no sanitizing are reused rather than copied.
+
+    Dicts nested in a FilterDict are filtered with their own recursion
+    tracking and values produced by 'default' are never trimmed. Values with
+    a type encoder are converted first and the result is built in their
+    place.
+
+    Values the standard encoder writes by calling 'default', and NaN or
+    infinite floats, are left in the copy unless 'strict' is set. Then
+    'default' is called while building and _UnsupportedValue is raised for
+    values which other serializers can't write the way the standard encoder
+    does, so they can be encoded by the standard encoder instead.
+
+    With 'filter_only' set, only the keys of dicts and converted values are
+    filtered and every other value is left as it is, as
+    SanitizingJSONEncoder.filter_string_values does.
+
+    Containers nested more than _MAX_NESTING deep are returned empty and
+    filled afterwards, so any depth can be built without recursing further.
+    """
+    ignored = set(ignored_ids) if ignored_ids else set()  # type: Set[int]
+    depth = 0
+    # values made by type encoders are kept while their ids are on the path,
+    # so deferred containers can't mistake new values for them
+    converting = []  # type: List[Any]
+    deferred = []  # type: List[Tuple[Set[int], List[Any], Callable[..., Any], Tuple[Any, ...]]]  # noqa: E501
+    lookup_type_encoder = encoder.type_encoders.lookup
+    filtered_value = encoder.filtered_value
+    recursive_value = encoder.recursive_value
+
+    def defer(fill, built, *args):
+        deferred.append(
+            (set(ignored), list(converting), fill, (built,) + args)
+        )
+
+        return built
+
+    def is_plain(item):
+        item_type = type(item)
+
+        if item_type is str:
+            return not trim_strings or len(item) <= MAX_STRING_LENGTH
+
+        if item_type is float:
+            return not strict or math.isfinite(item)
+
+        return item_type in _PLAIN_TYPES
+
+    def build_value(value):
+        value_type = type(value)
+
+        if value_type is str:
+            return value[:MAX_STRING_LENGTH] if trim_strings else value
+        elif value_type is dict:
+            return build_dict(value)
+        elif value_type is list:
+            return build_list(value)
+        elif (
+            value_type is int or
+            value is None or
+            value is True or
+            value is False
+        ):
+            return value
+
+        return build_other(value)
+
+    def build_other(value):
+        type_encoder = lookup_type_encoder(type(value))
+
+        if type_encoder is not None:
+            return build_converted(value, type_encoder)
+        elif isinstance(value, FilterDict):
+            return build_filter_dict(value)
+        elif isinstance(value, dict):
+            return build_dict(value)
+        elif isinstance(value, (set, tuple, list)):
+            return build_list(value)
+        elif isinstance(value, str):
+            value = str.__str__(value)
+
+            return value[:MAX_STRING_LENGTH] if trim_strings else value
+        elif isinstance(value, int):
+            return int.__int__(value)
+        elif isinstance(value, float) and math.isfinite(value):
+            return float.__float__(value)
+        elif not strict:
+            # the standard encoder writes the rest itself, calling 'default'
+            # for values it doesn't support
+            return value
+        elif isinstance(value, float):
+            raise _UnsupportedValue()
+
+        value = encoder.default(value)
+
+        if isinstance(value, str):
+            return value
+
+        raise _UnsupportedValue()
+
+    def build_converted(value, type_encoder):
+        value_id = id(value)
+
+        if value_id in ignored:
+            return recursive_value
+
+        ignored.add(value_id)
+        converting.append(encoder._convert(value, type_encoder))
+        built = build_value(converting[-1])
+        converting.pop()
+        ignored.remove(value_id)
+
+        return built
+
+    def build_list(value):
+        value_id = id(value)
+
+        if value_id in ignored:
+            return recursive_value
+
+        if not isinstance(value, set) and all(map(is_plain, value)):
+            return value if type(value) in (list, tuple) else list(value)
+
+        if depth >= _MAX_NESTING:
+            return defer(fill_list, [], value, value_id)
+
+        return fill_list([], value, value_id)
+
+    def fill_list(built, value, value_id):
+        nonlocal depth
+        depth += 1
+        ignored.add(value_id)
+        built.extend(map(build_value, value))
+        ignored.remove(value_id)
+        depth -= 1
+
+        return built
+
+    def clean_items(items):
+        if filter_only:
+            return items
+
+        for key, _ in items:
+            if type(key) is not str:
+                break
+        else:
+            return items
+
+        # keys which become the same string when coerced replace each other
+        clean_dict = {}  # type: Dict[str, Any]
+        for key, item in items:
+            encoder._sanitize_dict_key_value(clean_dict, key, item)
+
+        return clean_dict.items()
+
+    def build_dict(value):
+        value_id = id(value)
+
+        if value_id in ignored:
+            return recursive_value
+
+        items = value.items()
+
+        for key, item in items:
+            if type(key) is not str or not is_plain(item):
+                break
+        else:
+            return value if type(value) is dict else dict(value)
+
+        if depth >= _MAX_NESTING:
+            return defer(fill_dict, {}, items, value_id)
+
+        return fill_dict({}, items, value_id)
+
+    def fill_dict(built, items, value_id):
+        nonlocal depth
+        depth += 1
+        ignored.add(value_id)
+
+        for key, item in clean_items(items):
+            built[key] = build_value(item)
+
+        ignored.remove(value_id)
+        depth -= 1
+
+        return built
+
+    def build_filter_dict(value):
+        value_id = id(value)
+
+        if value_id in ignored:
+            return recursive_value
+
+        ignored.add(value_id)
+        built = build_filtered_dict(value, {value_id})
+        ignored.remove(value_id)
+
+        return built
+
+    def build_filtered_dict(value, filtering):
+        if depth >= _MAX_NESTING:
+            return defer(fill_filtered_dict, {}, value, set(filtering))
+
+        return fill_filtered_dict({}, value, filtering)
+
+    def fill_filtered_dict(built, value, filtering):
+        # keys are filtered before they are coerced to strings and nested
+        # dicts are tracked separately for recursion
+        nonlocal depth
+        depth += 1
+        items = value.items()
+
+        if encoder.filters:
+            should_filter = encoder._should_filter
+            items = [
+                (key, _FILTERED if should_filter(key) else item)
+                for key, item in items
+            ]
+
+        for key, item in clean_items(items):
+            if item is _FILTERED:
+                built[key] = filtered_value
+            else:
+                built[key] = build_filtered_value(item, filtering)
+
+        depth -= 1
+
+        return built
+
+    def build_filtered_value(value, filtering):
+        type_encoder = lookup_type_encoder(type(value))
+
+        if id(value) in filtering:
+            return recursive_value
+        elif type_encoder is not None:
+            filtering.add(id(value))
+            converting.append(encoder._convert(value, type_encoder))
+            built = build_filtered_value(converting[-1], filtering)
+            converting.pop()
+            filtering.remove(id(value))
+
+            return built
+        elif isinstance(value, dict):
+            filtering.add(id(value))
+            built = build_filtered_dict(value, filtering)
+            filtering.remove(id(value))
+
+            return built
+        elif filter_only:
+            return value
+
+        return build_value(value)
+
+    if filter_only:
+        payload = build_filtered_value(obj, ignored)
+    else:
+        payload = build_value(obj)
+
+    for path, converting, fill, args in deferred:
+        ignored = path
+        depth = 0
+        fill(*args)
+
+    return payload
+
+
+def _encode_deeply_nested(encoder: SanitizingJSONEncoder, payload: Any) -> str:
+    """
+    Write a payload built by _build_payload as compact JSON, walking
+    containers with an explicit stack so payloads nested too deeply for the
+    standard encoder can be written. Everything other than dicts and lists is
+    written by the standard encoder
+    """
+    if encoder.ensure_ascii:
+        encode_string = encode_basestring_ascii
+    else:
+        encode_string = encode_basestring
+
+    item_separator = encoder.item_separator
+    key_separator = encoder.key_separator
+    parts = []  # type: List[str]
+    append = parts.append
+    # each entry is (items, whether they're dict items, the closing bracket)
+    stack = []  # type: List[Tuple[Any, bool, str]]
+
+    def write(value):
+        value_type = type(value)
+
+        if value_type is dict:
+            append('{')
+            stack.append((iter(value.items()), True, '}'))
+        elif value_type is list or value_type is tuple:
+            append('[')
+            stack.append((iter(value), False, ']'))
+        else:
+            append(JSONEncoder.encode(encoder, value))
+
+    write(payload)
+
+    while stack:
+        items, is_dict, closing = stack[-1]
+        depth = len(stack)
+
+        for item in items:
+            # items after the first follow a separator
+            if parts[-1] != '{' and parts[-1] != '[':
+                append(item_separator)
+
+            if is_dict:
+                key, item = item
+                append(encode_string(key) + key_separator)
+
+            write(item)
+
+            # a nested container was entered, so these items are continued
+            # once it has been written
+            if len(stack) > depth:
+                break
+        else:
+            stack.pop()
+            append(closing)
+
+    return ''.join(parts)
+
+
 def parse_content_type(value: str) -> ContentType:
     """
     Generate a tuple of (type, subtype, suffix, parameters) from a type based
@@ -315,7 +774,9 @@ validate_required_str_setter = partial(_validate_setter, (str,),
                                        should_error=True)
 validate_bool_setter = partial(_validate_setter, (bool,))
 validate_iterable_setter = partial(_validate_setter, (list, tuple))
+validate_dict_setter = partial(_validate_setter, (dict,))
 validate_int_setter = partial(_validate_setter, (int,))
+validate_number_setter = partial(_validate_setter, (int, float))
 validate_path_setter = partial(_validate_setter, (str, PathLike))
 
 
@@ -383,7 +844,10 @@ def sanitize_url(url: AnyStr, config) -> Optional[str]:
         # there's anything to redact, so have to omit the URL entirely
         return None
 
-    encoder = SanitizingJSONEncoder(config.logger, config.params_filters)
+    encoder = SanitizingJSONEncoder(
+        config.logger,
+        keyword_matcher=config._get_keyword_matcher()
+    )
     redacted_parameter_dict = encoder.filter_string_values(query_parameters)
 
     filtered_value = SanitizingJSONEncoder.filtered_value
@@ -1,5 +1,6 @@
 import bugsnag
 from bugsnag.asgi import BugsnagMiddleware
+from bugsnag.asyncio_delivery import AsyncioDelivery
 from tests.async_utils import AsyncIntegrationTest, ASGITestClient
 
 
@@ -213,3 +214,57 @@ class TestASGIMiddleware(AsyncIntegrationTest):
         payload = await self.last_event_request()
         request = payload['events'][0]['metaData']['request']
         self.assertEqual('http://testserver/path?page=6', request['url'])
+
+    async def test_lifespan_starts_and_drains_asyncio_delivery(self):
+        self.addCleanup(
+            bugsnag.configure,
+            delivery=bugsnag.configure().delivery
+        )
+
+        delivery = AsyncioDelivery()
+        bugsnag.configure(delivery=delivery)
+        sent = []
+
+        async def app(scope, receive, send):
+            assert (await receive())['type'] == 'lifespan.startup'
+            await send({'type': 'lifespan.startup.complete'})
+
+            bugsnag.notify(CustomException('during shutdown'))
+
+            assert (await receive())['type'] == 'lifespan.shutdown'
+            await send({'type': 'lifespan.shutdown.complete'})
+
+        messages = iter([
+            {'type': 'lifespan.startup'},
+            {'type': 'lifespan.shutdown'},
+        ])
+
+        async def receive():
+            message = next(messages)
+
+            if message['type'] == 'lifespan.startup':
+                assert delivery._workers is None
+            else:
+                assert delivery._workers is not None
+
+            return message
+
+        async def send(message):
+            if message['type'] == 'lifespan.shutdown.complete':
+                # the queue has been drained before the server is told the
+                # app has shut down
+                assert len(self.server.events_received) == 1
+                assert delivery._workers is None
+
+            sent.append(message['type'])
+
+        await BugsnagMiddleware(app)({'type': 'lifespan'}, receive, send)
+
+        assert sent == [
+            'lifespan.startup.complete',
+            'lifespan.shutdown.complete',
+        ]
+
+        payload = await self.last_event_request()
+        exception = payload['events'][0]['exceptions'][0]
+        self.assertEqual('during shutdown', exception['message'])
@@ -42,3 +42,56 @@ class RequestsDeliveryTest(IntegrationTest):
         delivery = create_default_delivery()
 
         self.assertTrue(isinstance(delivery, RequestsDelivery))
+
+    def test_requests_delivery_reuses_its_session(self):
+        delivery = RequestsDelivery()
+
+        delivery.deliver(self.config, '{"legit": 1}')
+        session = delivery.get_session(self.config)
+        delivery.deliver(self.config, '{"legit": 2}')
+
+        self.assertSentReportCount(2)
+        self.assertIs(delivery.get_session(self.config), session)
+
+    def test_requests_delivery_rebuilds_session_when_endpoint_changes(self):
+        delivery = RequestsDelivery()
+        session = delivery.get_session(self.config)
+
+        self.config.configure(endpoint=self.server.events_url + '?v=2')
+        new_session = delivery.get_session(self.config)
+
+        self.assertIsNot(new_session, session)
+        self.assertEqual(new_session.proxies, {})
+
+    def test_requests_delivery_uses_proxy_from_configuration(self):
+        delivery = RequestsDelivery()
+        self.config.configure(proxy_host='http://localhost:1234')
+
+        session = delivery.get_session(self.config)
+
+        self.assertEqual(session.proxies, {
+            'https': 'http://localhost:1234',
+            'http': 'http://localhost:1234',
+        })
+
+    def test_requests_delivery_pool_is_sized_for_the_workers(self):
+        delivery = RequestsDelivery()
+        self.config.configure(delivery_worker_count=7)
+
+        adapter = delivery.get_session(self.config).get_adapter(
+            self.server.events_url
+        )
+
+        self.assertEqual(adapter._pool_maxsize, 7)
+
+    def test_requests_delivery_compresses_payloads(self):
+        self.config.configure(compress_payloads=True, compression_threshold=0)
+
+        RequestsDelivery().deliver(self.config, '{"legit": 4}')
+
+        self.assertSentReportCount(1)
+
+        request = self.server.events_received[0]
+
+        self.assertEqual(request['headers']['Content-Encoding'], 'gzip')
+        self.assertEqual(request['json_body'], {"legit": 4})
@@ -0,0 +1,325 @@
+import asyncio
+import json
+import shutil
+import tempfile
+import threading
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+from bugsnag import Client, Configuration
+from bugsnag.asyncio_delivery import AsyncioDelivery
+from bugsnag.delivery import DeliveryPayload, UrllibDelivery
+from bugsnag.event import Event
+from tests.utils import FakeBugsnagServer
+
+
+class KeepAliveServer:
+    """
+    An HTTP/1.1 server which keeps connections open between requests and
+    counts how many connections it has accepted
+    """
+
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+        self.response = None
+        self.connections = 0
+        self.bodies = []
+
+    async def start(self):
+        self.server = await asyncio.start_server(
+            self.handle,
+            '127.0.0.1',
+            0
+        )
+        self.url = 'http://127.0.0.1:%d/events' % (
+            self.server.sockets[0].getsockname()[1]
+        )
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line == b'\r\n':
+                    break
+
+                name, _, value = line.decode().partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            body = await reader.readexactly(int(headers['content-length']))
+            self.bodies.append(json.loads(body.decode()))
+
+            writer.write(self.response or (
+                b'HTTP/1.1 %d OK\r\nContent-Length: 2\r\n\r\nOK' %
+                self.status_code
+            ))
+            await writer.drain()
+
+        writer.close()
+
+
+class AsyncioDeliveryTest(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = KeepAliveServer()
+        await self.server.start()
+
+        self.config = Configuration()
+        self.config.configure(
+            api_key='abc',
+            endpoint=self.server.url,
+            session_endpoint=self.server.url,
+            asynchronous=True,
+            delivery_retry_base_delay=0.01
+        )
+        self.delivery = AsyncioDelivery()
+
+    async def asyncTearDown(self):
+        await self.delivery.drain()
+        await self.server.stop()
+
+    async def test_payloads_are_sent_on_the_event_loop(self):
+        with patch.object(UrllibDelivery, '_post') as threaded_post:
+            for index in range(3):
+                self.delivery.deliver(
+                    self.config,
+                    DeliveryPayload(b'{"index":%d}' % index, 'abc')
+                )
+
+            await self.delivery.drain()
+
+        threaded_post.assert_not_called()
+        assert sorted(body['index'] for body in self.server.bodies) == [
+            0, 1, 2
+        ]
+        assert self.delivery.stats['delivered'] == 3
+
+    async def test_lazy_events_are_built_off_the_event_loop(self):
+        self.config.configure(lazy_events=True, delivery=self.delivery)
+        client = Client(self.config, install_sys_hook=False)
+        stacktrace_from = Event._stacktrace_from
+        threads = []
+
+        def record_thread(event, *args, **kwargs):
+            threads.append(threading.current_thread())
+
+            return stacktrace_from(event, *args, **kwargs)
+
+        with patch.object(Event, '_stacktrace_from', record_thread):
+            client.notify(Exception('oops'))
+            await self.delivery.drain()
+
+        assert len(self.server.bodies) == 1
+        assert threads != []
+        assert threading.current_thread() not in threads
+
+    async def test_failing_bodies_do_not_use_up_a_half_open_trial(self):
+        self.config.configure(
+            circuit_breaker_threshold=1,
+            circuit_breaker_cooldown=0.01
+        )
+        breaker = self.delivery.get_circuit_breaker(
+            self.config,
+            self.server.url
+        )
+        breaker.record_failure()
+        await asyncio.sleep(0.02)
+
+        def fail():
+            raise ValueError('oops')
+
+        with patch.object(self.config.logger, 'exception'):
+            self.delivery.deliver(
+                self.config,
+                DeliveryPayload.deferred(fail, 'abc')
+            )
+            await self.delivery.drain()
+
+        self.delivery.deliver(self.config, DeliveryPayload(b'{}', 'abc'))
+        await self.delivery.drain()
+
+        assert len(self.server.bodies) == 1
+        assert breaker.state == 'closed'
+
+    async def test_the_spool_is_only_used_off_the_event_loop(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        self.config.configure(spool_directory=directory)
+
+        get_spool = UrllibDelivery.get_spool
+        threads = []
+
+        def record_thread(delivery, config):
+            threads.append(threading.current_thread())
+
+            return get_spool(delivery, config)
+
+        with patch.object(UrllibDelivery, 'get_spool', record_thread):
+            # a successful delivery checks the spool for earlier payloads
+            self.delivery.deliver(self.config, DeliveryPayload(b'{}', 'abc'))
+            await self.delivery.drain()
+
+            # payloads still queued at shutdown are spooled
+            for index in range(2):
+                self.delivery.deliver(
+                    self.config,
+                    DeliveryPayload(b'{"index":%d}' % index, 'abc')
+                )
+
+            await self.delivery.drain(0)
+
+        assert self.delivery.stats['spooled'] == 2
+        assert len(threads) >= 3
+        assert threading.current_thread() not in threads
+
+    async def test_connections_are_reused(self):
+        self.config.configure(delivery_worker_count=1)
+
+        for index in range(5):
+            self.delivery.deliver(
+                self.config,
+                DeliveryPayload(b'{"index":%d}' % index, 'abc')
+            )
+
+        await self.delivery.drain()
+
+        assert len(self.server.bodies) == 5
+        assert self.server.connections == 1
+
+    async def test_responses_without_a_body_are_not_waited_for(self):
+        self.config.configure(delivery_worker_count=1)
+        self.server.response = (
+            b'HTTP/1.1 100 Continue\r\n\r\n'
+            b'HTTP/1.1 204 No Content\r\n\r\n'
+        )
+
+        for index in range(2):
+            self.delivery.deliver(
+                self.config,
+                DeliveryPayload(b'{"index":%d}' % index, 'abc')
+            )
+
+        await asyncio.wait_for(self.delivery.drain(), 2)
+
+        assert len(self.server.bodies) == 2
+        assert self.server.connections == 1
+        assert self.delivery.stats['delivered'] == 2
+        assert self.delivery.stats['retried'] == 0
+
+    async def test_unframed_keep_alive_responses_close_the_connection(self):
+        self.config.configure(delivery_worker_count=1)
+        self.server.response = b'HTTP/1.1 200 OK\r\n\r\n'
+
+        for index in range(2):
+            self.delivery.deliver(
+                self.config,
+                DeliveryPayload(b'{"index":%d}' % index, 'abc')
+            )
+
+        await asyncio.wait_for(self.delivery.drain(), 2)
+
+        assert len(self.server.bodies) == 2
+        assert self.server.connections == 2
+        assert self.delivery.stats['retried'] == 0
+
+    async def test_post_delivery_callback_is_called(self):
+        called = asyncio.Event()
+
+        self.delivery.deliver(
+            self.config,
+            DeliveryPayload(b'{}', 'abc'),
+            {'post_delivery_callback': called.set}
+        )
+
+        await asyncio.wait_for(called.wait(), 2)
+
+    async def test_payloads_are_dropped_when_the_queue_is_full(self):
+        self.config.configure(delivery_queue_size=1)
+        dropped = []
+
+        for index in range(3):
+            self.delivery.deliver(
+                self.config,
+                DeliveryPayload(b'{"index":%d}' % index, 'abc'),
+                {'post_delivery_callback': lambda: dropped.append(1)}
+            )
+
+        # the queue holds one payload so the others are dropped immediately
+        assert dropped == [1, 1]
+
+        await self.delivery.drain()
+
+        assert len(self.server.bodies) == 1
+
+    async def test_server_errors_are_retried(self):
+        self.server.status_code = 503
+        done = asyncio.Event()
+
+        self.delivery.deliver(
+            self.config,
+            DeliveryPayload(b'{}', 'abc'),
+            {'post_delivery_callback': done.set}
+        )
+
+        await asyncio.wait_for(done.wait(), 2)
+
+        assert len(self.server.bodies) == 4
+        assert self.delivery.stats['retried'] == 3
+        assert self.delivery.stats['retries_exhausted'] == 1
+
+    async def test_start_creates_the_workers(self):
+        await self.delivery.start(self.config)
+
+        workers = self.delivery._workers
+        assert workers is not None
+        assert len(workers.tasks) == self.config.delivery_worker_count
+
+    async def test_synchronous_requests_use_the_threaded_path(self):
+        with patch.object(
+            UrllibDelivery,
+            '_post',
+            return_value=(200, {})
+        ) as threaded_post:
+            self.delivery.deliver(
+                self.config,
+                DeliveryPayload(b'{}', 'abc'),
+                {'asynchronous': False}
+            )
+
+        threaded_post.assert_called_once()
+        assert self.server.bodies == []
+
+
+def test_delivery_falls_back_to_threads_without_a_running_loop():
+    server = FakeBugsnagServer(wait_for_duplicate_requests=False)
+    config = Configuration()
+    config.configure(
+        api_key='abc',
+        endpoint=server.events_url,
+        session_endpoint=server.sessions_url,
+        asynchronous=True
+    )
+    delivery = AsyncioDelivery()
+    done = threading.Event()
+
+    try:
+        delivery.deliver(
+            config,
+            DeliveryPayload(b'{"a":1}', 'abc'),
+            {'post_delivery_callback': done.set}
+        )
+
+        assert done.wait(2)
+        assert server.events_received[0]['json_body'] == {'a': 1}
+        assert delivery._workers is None
+    finally:
+        server.shutdown()
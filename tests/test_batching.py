@@ -0,0 +1,170 @@
+import json
+import time
+
+from bugsnag import Client
+from bugsnag.batching import EventBatcher
+from bugsnag.configuration import Configuration
+from bugsnag.delivery import Delivery
+from tests.utils import IntegrationTest
+
+
+class RecordingDelivery(Delivery):
+    def __init__(self):
+        super().__init__()
+        self.payloads = []
+
+    def deliver(self, config, payload, options=None):
+        self.payloads.append(json.loads(payload))
+        options['post_delivery_callback']()
+
+
+def batching_configuration(**options):
+    config = Configuration()
+    config.configure(
+        api_key='abc',
+        delivery=RecordingDelivery(),
+        batch_events=True,
+        **options
+    )
+
+    return config
+
+
+def test_batch_is_sent_when_it_reaches_max_events():
+    config = batching_configuration(batch_max_events=3, batch_linger_ms=10000)
+    batcher = EventBatcher()
+    callbacks = []
+
+    for index in range(3):
+        batcher.add(
+            config,
+            'abc',
+            b'{"index":%d}' % index,
+            lambda index=index: callbacks.append(index)
+        )
+
+    payloads = config.delivery.payloads
+
+    assert len(payloads) == 1
+    assert payloads[0]['apiKey'] == 'abc'
+    assert payloads[0]['payloadVersion'] == '4.0'
+    assert payloads[0]['notifier']['name'] == 'Python Bugsnag Notifier'
+    assert payloads[0]['events'] == [{'index': 0}, {'index': 1}, {'index': 2}]
+    assert callbacks == [0, 1, 2]
+
+
+def test_batch_is_sent_after_linger_time():
+    config = batching_configuration(batch_linger_ms=10)
+    batcher = EventBatcher()
+
+    batcher.add(config, 'abc', b'{"index":0}', lambda: None)
+    assert config.delivery.payloads == []
+
+    start = time.time()
+    while not config.delivery.payloads and time.time() - start < 2:
+        time.sleep(0.005)
+
+    assert config.delivery.payloads[0]['events'] == [{'index': 0}]
+
+
+def test_events_are_batched_by_api_key():
+    config = batching_configuration(batch_linger_ms=10000)
+    batcher = EventBatcher()
+
+    batcher.add(config, 'abc', b'{"index":0}', lambda: None)
+    batcher.add(config, 'xyz', b'{"index":1}', lambda: None)
+    batcher.add(config, 'abc', b'{"index":2}', lambda: None)
+    batcher.flush()
+
+    payloads = sorted(config.delivery.payloads, key=lambda p: p['apiKey'])
+
+    assert len(payloads) == 2
+    assert payloads[0]['apiKey'] == 'abc'
+    assert payloads[0]['events'] == [{'index': 0}, {'index': 2}]
+    assert payloads[1]['apiKey'] == 'xyz'
+    assert payloads[1]['events'] == [{'index': 1}]
+
+
+def test_batch_is_sent_before_it_would_exceed_max_bytes():
+    config = batching_configuration(batch_max_bytes=25, batch_linger_ms=10000)
+    batcher = EventBatcher()
+
+    batcher.add(config, 'abc', b'{"index":0}', lambda: None)
+    assert config.delivery.payloads == []
+
+    batcher.add(config, 'abc', b'{"index":1}', lambda: None)
+    assert config.delivery.payloads == []
+
+    batcher.add(config, 'abc', b'{"index":2}', lambda: None)
+    assert len(config.delivery.payloads) == 1
+    assert config.delivery.payloads[0]['events'] == [
+        {'index': 0},
+        {'index': 1}
+    ]
+
+    batcher.flush()
+    assert len(config.delivery.payloads) == 2
+    assert config.delivery.payloads[1]['events'] == [{'index': 2}]
+
+
+def test_flush_does_nothing_with_no_pending_batches():
+    config = batching_configuration()
+    batcher = EventBatcher()
+
+    batcher.flush()
+
+    assert config.delivery.payloads == []
+
+
+def test_client_batches_asynchronous_events():
+    config = batching_configuration(batch_linger_ms=10000)
+    client = Client(config, install_sys_hook=False)
+
+    client.notify(Exception('one'))
+    client.notify(Exception('two'))
+
+    assert config.delivery.payloads == []
+    assert client._request_tracker.has_in_flight_requests()
+
+    client.flush(1000)
+
+    assert len(config.delivery.payloads) == 1
+    events = config.delivery.payloads[0]['events']
+    assert [e['exceptions'][0]['message'] for e in events] == ['one', 'two']
+    assert not client._request_tracker.has_in_flight_requests()
+
+
+def test_client_does_not_batch_synchronous_events():
+    config = batching_configuration(batch_linger_ms=10000)
+    client = Client(config, install_sys_hook=False)
+
+    client.notify(Exception('one'), asynchronous=False)
+
+    assert len(config.delivery.payloads) == 1
+    assert len(config.delivery.payloads[0]['events']) == 1
+
+
+class BatchingIntegrationTest(IntegrationTest):
+    def test_batched_events_are_sent_in_one_request(self):
+        client = Client(
+            api_key='abc',
+            endpoint=self.server.events_url,
+            session_endpoint=self.server.sessions_url,
+            asynchronous=True,
+            batch_events=True,
+            batch_linger_ms=10000,
+            install_sys_hook=False
+        )
+
+        for index in range(5):
+            client.notify(Exception('oh no %d' % index))
+
+        client.flush(2000)
+
+        self.assertSentReportCount(1)
+        payload = self.server.events_received[0]['json_body']
+        self.assertEqual(len(payload['events']), 5)
+        self.assertEqual(
+            self.server.events_received[0]['headers']['Bugsnag-Api-Key'],
+            'abc'
+        )
@@ -0,0 +1,108 @@
+import time
+
+from bugsnag.circuit_breaker import (
+    CircuitBreaker,
+    STATE_CLOSED,
+    STATE_HALF_OPEN,
+    STATE_OPEN,
+)
+
+
+def open_breaker(cooldown=60):
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=cooldown)
+    breaker.record_failure()
+    breaker.record_failure()
+
+    return breaker
+
+
+def test_breaker_is_initially_closed():
+    breaker = CircuitBreaker()
+
+    assert breaker.state == STATE_CLOSED
+    assert breaker.allow_request()
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3)
+
+    assert not breaker.record_failure()
+    assert not breaker.record_failure()
+    assert breaker.record_failure()
+    assert breaker.state == STATE_OPEN
+    assert not breaker.allow_request()
+
+
+def test_successes_reset_the_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2)
+
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+
+    assert breaker.state == STATE_CLOSED
+
+
+def test_breaker_is_half_open_after_the_cooldown():
+    breaker = open_breaker(cooldown=0.01)
+    time.sleep(0.02)
+
+    assert breaker.state == STATE_HALF_OPEN
+
+    # only a single trial request is allowed through
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+
+
+def test_successful_trial_closes_the_breaker():
+    breaker = open_breaker(cooldown=0.01)
+    time.sleep(0.02)
+
+    assert breaker.allow_request()
+    breaker.record_success()
+
+    assert breaker.state == STATE_CLOSED
+    assert breaker.allow_request()
+
+
+def test_failed_trial_opens_the_breaker_again():
+    breaker = open_breaker(cooldown=0.01)
+    time.sleep(0.02)
+
+    assert breaker.allow_request()
+    assert breaker.record_failure()
+
+    assert breaker.state == STATE_OPEN
+    assert not breaker.allow_request()
+
+
+def test_cancelled_trials_let_another_request_through():
+    breaker = open_breaker(cooldown=0.01)
+    time.sleep(0.02)
+
+    assert breaker.allow_request()
+    breaker.cancel_request()
+
+    assert breaker.state == STATE_HALF_OPEN
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+
+
+def test_failures_while_open_do_not_extend_the_cooldown():
+    breaker = open_breaker(cooldown=0.05)
+    time.sleep(0.03)
+
+    assert not breaker.record_failure()
+    time.sleep(0.03)
+
+    assert breaker.state == STATE_HALF_OPEN
+
+
+def test_threshold_of_zero_disables_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=0)
+
+    for _ in range(10):
+        assert not breaker.record_failure()
+
+    assert breaker.state == STATE_CLOSED
+    assert breaker.allow_request()
@@ -7,7 +7,7 @@ import inspect
 import logging
 import threading
 from datetime import datetime, timedelta, timezone
-from unittest.mock import Mock, ANY
+from unittest.mock import Mock, ANY, patch
 from tests import fixtures
 
 from bugsnag import (
@@ -19,6 +19,9 @@ from bugsnag import (
 )
 
 from bugsnag.delivery import Delivery
+from bugsnag.event import Event
+from bugsnag.sampling import Sampler
+from bugsnag.utils import fully_qualified_class_name
 import bugsnag.legacy as legacy
 from tests.utils import (
     BrokenDelivery,
@@ -1839,6 +1842,240 @@ class ClientTest(IntegrationTest):
         # the thread should have stopped before flush could exit
         assert not thread.is_alive()
 
+    def test_custom_delivery_receives_a_string_payload(self):
+        payloads = []
+
+        class CustomDelivery(Delivery):
+            def deliver(self, config, payload, options=None):
+                payloads.append(payload)
+
+        self.client.configuration.configure(delivery=CustomDelivery())
+        self.client.notify(Exception('oh dear'))
+
+        assert len(payloads) == 1
+        assert isinstance(payloads[0], str)
+        assert payloads[0].startswith('{"apiKey":"testing client key"')
+
+    def test_flush_waits_for_pooled_deliveries_before_returning(self):
+        self.client.configuration.configure(
+            asynchronous=True,
+            delivery_worker_count=1
+        )
+
+        self.server.paused = True
+        threading.Timer(0.05, lambda: setattr(self.server, 'paused', False)) \
+            .start()
+
+        for _ in range(3):
+            self.client.notify(Exception('oh dear'))
+
+        self.client.flush(2000)
+
+        assert not self.client._request_tracker.has_in_flight_requests()
+        assert self.sent_report_count == 3
+
+    def test_lazy_events_are_encoded_on_the_delivery_thread(self):
+        threads = []
+        encoded_payload = Event._encoded_payload
+
+        def recording_encoded_payload(event):
+            threads.append(threading.current_thread())
+            return encoded_payload(event)
+
+        self.client.configuration.configure(
+            asynchronous=True,
+            lazy_events=True
+        )
+
+        with patch.object(Event, '_encoded_payload',
+                          recording_encoded_payload):
+            self.client.notify(fixtures.exception_with_explicit_cause)
+            self.client.flush(2000)
+
+        assert len(threads) == 1
+        assert threads[0] is not threading.current_thread()
+
+        payload = self.server.events_received[0]['json_body']
+        exceptions = payload['events'][0]['exceptions']
+
+        assert [exception['message'] for exception in exceptions] == [
+            'a', 'b', 'c'
+        ]
+        assert exceptions[2]['stacktrace'][0] == {
+            'file': 'fixtures/caused_by.py',
+            'lineNumber': 16,
+            'method': 'c',
+            'inProject': True,
+            'code': ANY,
+        }
+
+    def test_lazy_stacktraces_can_be_changed_by_callbacks(self):
+        def remove_frames(event):
+            del event.errors[0].stacktrace[1:]
+
+        self.client.configuration.configure(lazy_events=True)
+        self.client.configuration.middleware.before_notify(remove_frames)
+        self.client.notify(fixtures.exception_with_explicit_cause)
+
+        payload = self.server.events_received[0]['json_body']
+        exceptions = payload['events'][0]['exceptions']
+
+        assert len(exceptions[0]['stacktrace']) == 1
+        assert len(exceptions[1]['stacktrace']) > 1
+
+    def test_notify_rate_limits_repeated_errors(self):
+        self.client.configuration.configure(
+            rate_limit_per_key=0.001,
+            rate_limit_burst=2
+        )
+
+        for _ in range(5):
+            try:
+                raise ScaryException('unexpected failover')
+            except ScaryException as e:
+                self.client.notify(e)
+
+        self.assertEqual(len(self.server.events_received), 2)
+
+    def test_notify_exc_info_rate_limits_repeated_errors(self):
+        self.client.configuration.configure(
+            rate_limit_per_key=0.001,
+            rate_limit_burst=1
+        )
+
+        for _ in range(3):
+            try:
+                raise ScaryException('unexpected failover')
+            except ScaryException:
+                self.client.notify_exc_info(*sys.exc_info())
+
+        self.assertEqual(len(self.server.events_received), 1)
+
+    def test_ignored_errors_do_not_use_up_the_rate_limit(self):
+        class Noise(Exception):
+            pass
+
+        self.client.configuration.configure(
+            rate_limit_global=5,
+            ignore_classes=[fully_qualified_class_name(Noise())]
+        )
+
+        for _ in range(50):
+            self.client.notify(Noise('ignored'))
+
+        self.client.notify(ValueError('reported'))
+
+        self.assertEqual(len(self.server.events_received), 1)
+
+    def test_other_release_stages_do_not_use_up_the_rate_limit(self):
+        self.client.configuration.configure(
+            rate_limit_global=1,
+            notify_release_stages=['production'],
+            release_stage='development'
+        )
+
+        for _ in range(5):
+            self.client.notify(ScaryException('unexpected failover'))
+
+        self.client.configuration.configure(release_stage='production')
+        self.client.notify(ScaryException('unexpected failover'))
+
+        self.assertEqual(len(self.server.events_received), 1)
+
+    def test_suppressed_event_count_is_attached_to_the_next_event(self):
+        self.client.configuration.configure(
+            rate_limit_per_key=0.001,
+            rate_limit_burst=1
+        )
+
+        for attempt in range(5):
+            if attempt == 4:
+                # pretend enough time has passed to refill the bucket
+                for bucket in self.client._rate_limiter._buckets.values():
+                    bucket.updated_at -= 1000
+
+            try:
+                raise ScaryException('unexpected failover')
+            except ScaryException as e:
+                self.client.notify(e)
+
+        self.assertEqual(len(self.server.events_received), 2)
+
+        first = self.server.events_received[0]['json_body']['events'][0]
+        second = self.server.events_received[1]['json_body']['events'][0]
+
+        self.assertNotIn('rate limit', first['metaData'])
+        self.assertEqual(
+            {'suppressedEvents': 3},
+            second['metaData']['rate limit']
+        )
+
+    def test_notify_samples_handled_events(self):
+        self.client.configuration.configure(sample_rates={'info': 0.5})
+        self.client._sampler = Sampler(lambda: 0.75)
+
+        self.client.notify(ScaryException('unexpected failover'))
+        self.client.notify(
+            ScaryException('unexpected failover'),
+            severity='info'
+        )
+
+        self.assertEqual(len(self.server.events_received), 1)
+
+        payload = self.server.events_received[0]['json_body']
+        self.assertNotIn('sampling', payload['events'][0]['metaData'])
+
+    def test_notify_records_the_sample_rate(self):
+        self.client.configuration.configure(
+            sample_rates={'handledException': 0.5}
+        )
+        self.client._sampler = Sampler(lambda: 0.25)
+
+        try:
+            raise ScaryException('unexpected failover')
+        except ScaryException:
+            self.client.notify_exc_info(*sys.exc_info())
+
+        self.assertEqual(len(self.server.events_received), 1)
+
+        payload = self.server.events_received[0]['json_body']
+        self.assertEqual(
+            {'rate': 0.5},
+            payload['events'][0]['metaData']['sampling']
+        )
+
+    def test_ignored_errors_are_not_sampled(self):
+        class Noise(Exception):
+            pass
+
+        self.client.configuration.configure(
+            sample_max_events_per_second=5,
+            ignore_classes=[fully_qualified_class_name(Noise())]
+        )
+        self.client._sampler = Sampler(lambda: 0.99)
+
+        for _ in range(50):
+            self.client.notify(Noise('ignored'))
+
+        self.client.notify(ValueError('reported'))
+
+        self.assertEqual(len(self.server.events_received), 1)
+        self.assertIsNone(self.client._sampler.estimated_rate)
+
+    def test_unhandled_events_are_not_sampled(self):
+        self.client.configuration.configure(
+            sample_rates={'error': 0, 'unhandledException': 0}
+        )
+
+        self.client.notify(
+            ScaryException('unexpected failover'),
+            severity='error',
+            unhandled=True,
+            severity_reason={'type': 'unhandledException'}
+        )
+
+        self.assertEqual(len(self.server.events_received), 1)
+
     def test_aws_lambda_handler_decorator(self):
         aws_lambda_context = LambdaContext(function_name='abcdef')
 
@@ -6,7 +6,7 @@ import sys
 import time
 import unittest
 from pathlib import PurePath, Path
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 from io import StringIO
 from threading import Thread
 
@@ -15,6 +15,7 @@ from bugsnag.configuration import Configuration
 from bugsnag.error import Error
 from bugsnag.middleware import DefaultMiddleware, SimpleMiddleware
 from bugsnag.sessiontracker import SessionMiddleware
+from bugsnag.utils import FilterDict, SanitizingJSONEncoder
 
 import pytest
 
@@ -303,6 +304,109 @@ class TestConfiguration(unittest.TestCase):
             assert len(record) == 1
             assert c.notify_release_stages == ['beta']
 
+    def test_keyword_matcher_is_reused(self):
+        c = Configuration()
+        c.configure(params_filters=['password', 'token'])
+
+        matcher = c._get_keyword_matcher()
+
+        assert c._get_keyword_matcher() is matcher
+        assert matcher.keywords == ['password', 'token']
+        assert matcher.matches('user_token')
+
+    def test_keyword_matcher_is_rebuilt_when_filters_change(self):
+        c = Configuration()
+        c.configure(params_filters=['password'])
+        matcher = c._get_keyword_matcher()
+
+        c.params_filters.append('token')
+        in_place = c._get_keyword_matcher()
+
+        assert in_place is not matcher
+        assert in_place.matches('token')
+
+        c.configure(params_filters=['secret'])
+        replaced = c._get_keyword_matcher()
+
+        assert replaced is not in_place
+        assert replaced.matches('secret')
+        assert not replaced.matches('password')
+
+    def test_payload_fragments_are_reused(self):
+        c = Configuration()
+        encoder = SanitizingJSONEncoder(logging.getLogger(__name__))
+        fields = {'app': {'version': '1.0'}}
+
+        fragment = c._get_payload_fragment('test', ('1.0',), fields, encoder)
+
+        assert fragment == b'"app": {"version": "1.0"}'
+        assert c._get_payload_fragment(
+            'test',
+            ('1.0',),
+            {'app': {'version': '1.0'}},
+            encoder
+        ) is fragment
+
+    def test_payload_fragments_are_encoded_again_when_the_key_changes(self):
+        c = Configuration()
+        encoder = SanitizingJSONEncoder(logging.getLogger(__name__))
+        versions = {'python': '3.11'}
+        fields = {'device': {'runtimeVersions': versions}}
+
+        def get_fragment():
+            key = (versions,)
+
+            return c._get_payload_fragment('test', key, fields, encoder)
+
+        fragment = get_fragment()
+        versions['django'] = '5.0'
+        changed = get_fragment()
+
+        assert changed is not fragment
+        assert b'"django": "5.0"' in changed
+
+        fields = {'app': {'version': '2.0'}}
+        changed = c._get_payload_fragment('test', ('2.0',), fields, encoder)
+
+        assert changed == b'"app": {"version": "2.0"}'
+
+    def test_payload_fragments_are_invalidated_by_settings(self):
+        c = Configuration()
+        encoder = SanitizingJSONEncoder(logging.getLogger(__name__))
+        fields = {'device': FilterDict({'hostname': 'example'})}
+
+        def get_fragment():
+            return c._get_payload_fragment('test', (), fields, encoder)
+
+        fragment = get_fragment()
+        c.configure(params_filters=['hostname'])
+        assert get_fragment() is not fragment
+
+        fragment = get_fragment()
+        c.params_filters.append('device')
+        c._get_keyword_matcher()
+        assert get_fragment() is not fragment
+
+        fragment = get_fragment()
+        c.configure(json_backend='json')
+        assert get_fragment() is not fragment
+
+        options = {
+            'app_type': 'worker',
+            'app_version': '2.0',
+            'hostname': 'example',
+            'lib_root': '/lib',
+            'project_root': '/app',
+            'release_stage': 'staging',
+        }
+
+        for name, value in options.items():
+            fragment = get_fragment()
+            assert get_fragment() is fragment
+
+            setattr(c, name, value)
+            assert get_fragment() is not fragment, name
+
     def test_validate_params_filters(self):
         c = Configuration()
         with pytest.warns(RuntimeWarning) as record:
@@ -634,6 +738,431 @@ class TestConfiguration(unittest.TestCase):
         c.configure(max_breadcrumbs=100)
         assert c.max_breadcrumbs == 100
 
+    def test_delivery_pool_defaults(self):
+        c = Configuration()
+
+        assert c.delivery_worker_count == 2
+        assert c.delivery_queue_size == 100
+        assert c.delivery_overflow_policy == 'drop_newest'
+        assert c.delivery_block_timeout == 1.0
+
+    def test_validate_delivery_worker_count(self):
+        c = Configuration()
+
+        with pytest.warns(RuntimeWarning) as record:
+            c.configure(delivery_worker_count='4')
+            c.configure(delivery_worker_count=0)
+
+            assert len(record) == 2
+            assert str(record[0].message) == \
+                'delivery_worker_count should be int, got str'
+            assert str(record[1].message) == \
+                'delivery_worker_count should be a positive int, got "0"'
+            assert c.delivery_worker_count == 2
+
+        c.configure(delivery_worker_count=4)
+        assert c.delivery_worker_count == 4
+
+    def test_validate_delivery_queue_size(self):
+        c = Configuration()
+
+        with pytest.warns(RuntimeWarning) as record:
+            c.configure(delivery_queue_size=-5)
+
+            assert len(record) == 1
+            assert str(record[0].message) == \
+                'delivery_queue_size should be a positive int, got "-5"'
+            assert c.delivery_queue_size == 100
+
+        c.configure(delivery_queue_size=5000)
+        assert c.delivery_queue_size == 5000
+
+    def test_validate_delivery_overflow_policy(self):
+        c = Configuration()
+
+        with pytest.warns(RuntimeWarning) as record:
+            c.configure(delivery_overflow_policy='explode')
+
+            assert len(record) == 1
+            assert str(record[0].message) == (
+                'delivery_overflow_policy should be one of drop_newest, '
+                'drop_oldest, block, got "explode"'
+            )
+            assert c.delivery_overflow_policy == 'drop_newest'
+
+        c.configure(delivery_overflow_policy='block')
+        assert c.delivery_overflow_policy == 'block'
+
+    def test_validate_delivery_block_timeout(self):
+        c = Configuration()
+
+        with pytest.warns(RuntimeWarning) as record:
+            c.configure(delivery_block_timeout='1s')
+            c.configure(delivery_block_timeout=-1)
+
+            assert len(record) == 2
+            assert str(record[0].message) == \
+                'delivery_block_timeout should be int or float, got str'
+            assert str(record[1].message) == (
+                'delivery_block_timeout should be a non-negative number, '
+                'got "-1"'
+            )
+            assert c.delivery_block_timeout == 1.0
+
+        c.configure(delivery_block_timeout=2)
+        assert c.delivery_block_timeout == 2
+
+    def test_batching_defaults(self):
+        c = Configuration()
+
+        assert c.batch_events is False
+        assert c.batch_linger_ms == 200
+        assert c.batch_max_events == 50
+        assert c.batch_max_bytes == 512 * 1024
+
+    def test_validate_batch_options(self):
+        c = Configuration()
+
+        with pytest.warns(RuntimeWarning) as record:
+            c.configure(batch_events='yes')
+            c.configure(batch_linger_ms=-1)
+            c.configure(batch_max_events=0)
+            c.configure(batch_max_bytes=0)
+
+            assert [str(warning.message) for warning in record] == [
+                'batch_events should be bool, got str',
+                'batch_linger_ms should be a non-negative int, got "-1"',
+                'batch_max_events should be a positive int, got "0"',
+                'batch_max_bytes should be a positive int, got "0"',
+            ]
+
+        c.configure(
+            batch_events=True,
+            batch_linger_ms=0,
+            batch_max_events=10,
+            batch_max_bytes=1024
+        )
+
+        assert c.batch_events is True
+        assert c.batch_linger_ms == 0
+        assert c.batch_max_events == 10
+        assert c.batch_max_bytes == 1024
+
+    def test_validate_lazy_events(self):
+        c = Configuration()
+
+        assert c.lazy_events is False
+
+        with pytest.warns(RuntimeWarning) as record:
+            c.configure(lazy_events='yes')
+
+            assert [str(warning.message) for warning in record] == [
+                'lazy_events should be bool, got str',
+            ]
+
+        c.configure(lazy_events=True)
+
+        assert c.lazy_events is True
+
+    def test_validate_compression_options(self):
+        c = Configuration()
+
+        assert c.compress_payloads is False
+        assert c.compression_level == 6
+        assert c.compression_threshold == 1024
+
+        with pytest.warns(RuntimeWarning) as record:
+            c.configure(compress_payloads='gzip')
+            c.configure(compression_level=10)
+            c.configure(compression_threshold=-1)
+
+            assert [str(warning.message) for warning in record] == [
+                'compress_payloads should be bool, got str',
+                'compression_level should be an int between 1 and 9, got '
+                '"10"',
+                'compression_threshold should be a non-negative int, got '
+                '"-1"',
+            ]
+
+        c.configure(
+            compress_payloads=True,
+            compression_level=9,
+            compression_threshold=0
+        )
+
+        assert c.compress_payloads is True
+        assert c.compression_level == 9
+        assert c.compression_threshold == 0
+
+    def test_retry_options(self):
+        c = Configuration()
+
+        assert c.delivery_max_retries == 3
+        assert c.delivery_retry_base_delay == 1.0
+        assert c.delivery_retry_max_delay == 30.0
+
+        with pytest.warns(RuntimeWarning) as record:
+            c.configure(delivery_max_retries=-1)
+            c.configure(delivery_retry_base_delay=0)
+            c.configure(delivery_retry_max_delay='30')
+
+            assert [str(warning.message) for warning in record] == [
+                'delivery_max_retries should be a non-negative int, got "-1"',
+                'delivery_retry_base_delay should be a positive number, got '
+                '"0"',
+                'delivery_retry_max_delay should be int or float, got str',
+            ]
+
+        c.configure(
+            delivery_max_retries=0,
+            delivery_retry_base_delay=0.5,
+            delivery_retry_max_delay=10
+        )
+
+        assert c.delivery_max_retries == 0
+        assert c.delivery_retry_base_delay == 0.5
+        assert c.delivery_retry_max_delay == 10
+
+    def test_circuit_breaker_options(self):
+        c = Configuration()
+
+        assert c.circuit_breaker_threshold == 5
+        assert c.circuit_breaker_cooldown == 30.0
+        assert c.circuit_breaker_fallback == 'spool'
+
+        with pytest.warns(RuntimeWarning) as record:
+            c.configure(circuit_breaker_threshold=-1)
+            c.configure(circuit_breaker_cooldown=0)
+            c.configure(circuit_breaker_fallback='retry')
+
+            assert [str(warning.message) for warning in record] == [
+                'circuit_breaker_threshold should be a non-negative int, got '
+                '"-1"',
+                'circuit_breaker_cooldown should be a positive number, got '
+                '"0"',
+                'circuit_breaker_fallback should be one of drop, spool, got '
+                '"retry"',
+            ]
+
+        c.configure(
+            circuit_breaker_threshold=0,
+            circuit_breaker_cooldown=5,
+            circuit_breaker_fallback='drop'
+        )
+
+        assert c.circuit_breaker_threshold == 0
+        assert c.circuit_breaker_cooldown == 5
+        assert c.circuit_breaker_fallback == 'drop'
+
+    def test_rate_limit_options(self):
+        c = Configuration()
+
+        assert c.rate_limit_per_key == 0
+        assert c.rate_limit_burst == 10
+        assert c.rate_limit_global == 0
+
+        with pytest.warns(RuntimeWarning) as record:
+            c.configure(rate_limit_per_key=-1)
+            c.configure(rate_limit_burst=0)
+            c.configure(rate_limit_global='lots')
+
+            assert [str(warning.message) for warning in record] == [
+                'rate_limit_per_key should be a non-negative number, got '
+                '"-1"',
+                'rate_limit_burst should be a positive int, got "0"',
+                'rate_limit_global should be int or float, got str',
+            ]
+
+        c.configure(
+            rate_limit_per_key=0.5,
+            rate_limit_burst=3,
+            rate_limit_global=20
+        )
+
+        assert c.rate_limit_per_key == 0.5
+        assert c.rate_limit_burst == 3
+        assert c.rate_limit_global == 20
+
+    def test_sampling_options(self):
+        c = Configuration()
+
+        assert c.sample_rates == {}
+        assert c.sample_max_events_per_second == 0
+
+        with pytest.warns(RuntimeWarning) as record:
+            c.configure(sample_rates=[0.5])
+            c.configure(sample_rates={'info': 1.5})
+            c.configure(sample_rates={'info': 'half'})
+            c.configure(sample_max_events_per_second=-1)
+
+            assert [str(warning.message) for warning in record] == [
+                'sample_rates should be dict, got list',
+                'sample_rates should contain numbers between 0 and 1, got '
+                '"1.5" for "info"',
+                'sample_rates should contain numbers between 0 and 1, got '
+                '"half" for "info"',
+                'sample_max_events_per_second should be a non-negative '
+                'number, got "-1"',
+            ]
+
+        assert c.sample_rates == {}
+
+        c.configure(
+            sample_rates={'info': 0.1, 'handledException': 1},
+            sample_max_events_per_second=50
+        )
+
+        assert c.sample_rates == {'info': 0.1, 'handledException': 1}
+        assert c.sample_max_events_per_second == 50
+
+    def test_json_backend_option(self):
+        c = Configuration()
+
+        assert c.json_backend == 'json'
+        assert c._get_serializer() is None
+
+        with pytest.warns(RuntimeWarning) as record:
+            c.configure(json_backend='simplejson')
+            c.configure(json_backend=1)
+
+            assert [str(warning.message) for warning in record] == [
+                'json_backend should be one of auto, json, orjson, ujson, '
+                'got "simplejson"',
+                'json_backend should be str, got int',
+            ]
+
+        assert c.json_backend == 'json'
+
+        c.configure(json_backend='auto')
+
+        assert c.json_backend == 'auto'
+
+    def test_json_backend_warns_when_not_installed(self):
+        c = Configuration()
+
+        with patch.dict('bugsnag.serializers._serializers', clear=True):
+            with pytest.warns(RuntimeWarning) as record:
+                c.configure(json_backend='orjson')
+
+            assert c._get_serializer() is None
+
+        assert [str(warning.message) for warning in record] == [
+            'json_backend is "orjson" but it is not installed, the standard '
+            'library will be used instead',
+        ]
+        assert c.json_backend == 'orjson'
+
+    def test_metadata_limit_options(self):
+        c = Configuration()
+
+        assert c.metadata_max_depth == 20
+        assert c.metadata_max_keys == 1000
+        assert c.metadata_max_items == 1000
+        assert c.metadata_max_nodes == 10000
+
+        with pytest.warns(RuntimeWarning) as record:
+            c.configure(metadata_max_depth=-1)
+            c.configure(metadata_max_keys=1.5)
+            c.configure(metadata_max_items=-2)
+            c.configure(metadata_max_nodes='many')
+
+            assert [str(warning.message) for warning in record] == [
+                'metadata_max_depth should be a non-negative int, got "-1"',
+                'metadata_max_keys should be int, got float',
+                'metadata_max_items should be a non-negative int, got "-2"',
+                'metadata_max_nodes should be int, got str',
+            ]
+
+        c.configure(
+            metadata_max_depth=0,
+            metadata_max_keys=10,
+            metadata_max_items=20,
+            metadata_max_nodes=30
+        )
+
+        assert c.metadata_max_depth == 0
+        assert c.metadata_max_keys == 10
+        assert c.metadata_max_items == 20
+        assert c.metadata_max_nodes == 30
+
+    def test_code_options(self):
+        c = Configuration()
+
+        assert c.send_code_out_of_project is True
+        assert c.code_cache_max_bytes == 1024 * 1024
+        assert c.code_cache_validate is True
+
+        with pytest.warns(RuntimeWarning) as record:
+            c.configure(send_code_out_of_project='no')
+            c.configure(code_cache_max_bytes=-1)
+            c.configure(code_cache_validate=1)
+
+            assert [str(warning.message) for warning in record] == [
+                'send_code_out_of_project should be bool, got str',
+                'code_cache_max_bytes should be a non-negative int, got "-1"',
+                'code_cache_validate should be bool, got int',
+            ]
+
+        c.configure(
+            send_code_out_of_project=False,
+            code_cache_max_bytes=0,
+            code_cache_validate=False
+        )
+
+        assert c.send_code_out_of_project is False
+        assert c.code_cache_max_bytes == 0
+        assert c.code_cache_validate is False
+        assert c._snippet_cache.max_bytes == 0
+        assert c._snippet_cache.validate is False
+
+    def test_stacktrace_max_frames(self):
+        c = Configuration()
+
+        assert c.stacktrace_max_frames == 200
+
+        with pytest.warns(RuntimeWarning) as record:
+            c.configure(stacktrace_max_frames=-1)
+            c.configure(stacktrace_max_frames='all')
+
+            assert [str(warning.message) for warning in record] == [
+                'stacktrace_max_frames should be a non-negative int, got "-1"',
+                'stacktrace_max_frames should be int, got str',
+            ]
+
+        c.configure(stacktrace_max_frames=0)
+
+        assert c.stacktrace_max_frames == 0
+
+    def test_spool_options(self):
+        c = Configuration()
+        c.configure(delivery=Mock())
+
+        assert c.spool_directory is None
+        assert c.spool_max_bytes == 10 * 1024 * 1024
+        assert c.spool_max_files == 1000
+
+        with pytest.warns(RuntimeWarning) as record:
+            c.configure(spool_directory=12)
+            c.configure(spool_max_bytes=0)
+            c.configure(spool_max_files=-1)
+
+            assert [str(warning.message) for warning in record] == [
+                'spool_directory should be str or PathLike, got int',
+                'spool_max_bytes should be a positive int, got "0"',
+                'spool_max_files should be a positive int, got "-1"',
+            ]
+
+        c.configure(
+            spool_directory=Path('/tmp/bugsnag'),
+            spool_max_bytes=1024,
+            spool_max_files=10
+        )
+
+        assert c.spool_directory == str(Path('/tmp/bugsnag'))
+        assert c.spool_max_bytes == 1024
+        assert c.spool_max_files == 10
+        c.delivery.get_spool.assert_called_with(c)
+
     def test_breadcrumb_log_level(self):
         c = Configuration()
         assert c.breadcrumb_log_level == logging.INFO
@@ -660,6 +1189,39 @@ class TestConfiguration(unittest.TestCase):
 
             assert str(e) == "AttributeError: can't set attribute"
 
+    def test_type_encoders_can_be_added(self):
+        c = Configuration()
+        other = Configuration()
+
+        def encode_complex(value):
+            return [value.real, value.imag]
+
+        c.add_type_encoder(complex, encode_complex)
+
+        assert c._type_encoders.lookup(complex) is encode_complex
+        assert other._type_encoders.lookup(complex) is None
+
+    def test_frame_classifier_follows_settings(self):
+        c = Configuration()
+        c.configure(lib_root='/usr/lib', project_root='/app')
+        classifier = c._get_frame_classifier()
+
+        assert c._get_frame_classifier() is classifier
+        assert classifier.project_root == '/app/'
+
+        c.configure(project_root='/other')
+        assert c._get_frame_classifier().project_root == '/other/'
+
+        c.configure(lib_root='/lib')
+        assert c._get_frame_classifier().lib_root == '/lib/'
+
+        # the list of modules can be changed in place
+        c.traceback_exclude_modules.append(random)
+        assert c._get_frame_classifier().exclude_paths[-1] == random.__file__
+
+        c.traceback_exclude_modules = []
+        assert random.__file__ not in c._get_frame_classifier().exclude_paths
+
     def test_on_breadcrumb_callbacks_can_be_added_and_removed(self):
         c = Configuration()
         assert c._on_breadcrumbs == []
@@ -1,18 +1,79 @@
+import gzip
+import os
 import pytest
+import shutil
+import tempfile
+import threading
+import time
 import warnings
 import sys
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from unittest.mock import Mock, patch
 
 from bugsnag import Configuration
 from bugsnag.delivery import (
+    Delivery,
+    DeliveryPayload,
+    payload_for,
     UrllibDelivery,
     RequestsDelivery,
+    compress_body,
     create_default_delivery,
     DEFAULT_SESSIONS_ENDPOINT
 )
 
+from bugsnag.spool import PayloadSpool
 from tests.utils import BrokenDelivery, IntegrationTest, QueueingDelivery
 
 
+class KeepAliveHTTPServer(ThreadingMixIn, HTTPServer):
+    """
+    An HTTP/1.1 server which keeps connections open between requests and
+    counts how many connections it has accepted. When 'drop_idle' is set it
+    closes each connection after responding without telling the client
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        self.connections = 0
+        self.requests = 0
+        self.drop_idle = False
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(handler):
+                super().setup()
+                self.connections += 1
+
+            def do_POST(handler):
+                handler.rfile.read(int(handler.headers['Content-Length']))
+                self.requests += 1
+
+                handler.send_response(200)
+                handler.send_header('Content-Length', '0')
+                handler.end_headers()
+
+                if self.drop_idle:
+                    handler.close_connection = True
+
+            def log_request(handler, *args):
+                pass
+
+        super().__init__(('localhost', 0), Handler)
+
+        self.url = 'http://localhost:%d/events' % self.server_address[1]
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.thread.join()
+        self.server_close()
+
+
 class DeliveryTest(IntegrationTest):
 
     def setUp(self):
@@ -197,3 +258,782 @@ class DeliveryTest(IntegrationTest):
         )
 
         assert callback_was_called
+
+    def test_asynchronous_requests_use_the_worker_pool(self):
+        delivery = UrllibDelivery()
+        self.config.configure(asynchronous=True, delivery_worker_count=1)
+
+        delivery.deliver(self.config, '{"legit": 1}')
+        delivery.deliver(self.config, '{"legit": 2}')
+
+        executor = delivery.get_executor(self.config)
+        assert executor.join(2)
+
+        self.assertSentReportCount(2)
+        assert len(executor._workers) == 1
+
+    def test_worker_pool_is_replaced_when_settings_change(self):
+        delivery = UrllibDelivery()
+        executor = delivery.get_executor(self.config)
+
+        assert delivery.get_executor(self.config) is executor
+
+        self.config.configure(delivery_queue_size=5)
+        new_executor = delivery.get_executor(self.config)
+
+        assert new_executor is not executor
+        assert new_executor.queue_size == 5
+
+    def test_dropped_requests_call_post_delivery_callback(self):
+        delivery = UrllibDelivery()
+        self.config.configure(
+            asynchronous=True,
+            delivery_worker_count=1,
+            delivery_queue_size=1
+        )
+
+        release = threading.Event()
+        started = threading.Event()
+
+        def blocking_task():
+            started.set()
+            release.wait(2)
+
+        executor = delivery.get_executor(self.config)
+        executor.submit(blocking_task)
+        assert started.wait(2)
+
+        callbacks = []
+        for index in range(2):
+            delivery.deliver(
+                self.config,
+                '{"legit": %d}' % index,
+                options={
+                    'post_delivery_callback':
+                        lambda index=index: callbacks.append(index)
+                }
+            )
+
+        # the second request can't fit in the queue so is dropped immediately
+        assert callbacks == [1]
+
+        release.set()
+        assert executor.join(2)
+
+        assert callbacks == [1, 0]
+        self.assertSentReportCount(1)
+
+    def test_urllib_delivery_reuses_its_opener(self):
+        delivery = UrllibDelivery()
+
+        delivery.deliver(self.config, '{"legit": 1}')
+        opener = delivery.get_opener(self.config)
+        delivery.deliver(self.config, '{"legit": 2}')
+
+        self.assertSentReportCount(2)
+        assert delivery.get_opener(self.config) is opener
+
+    def test_urllib_delivery_keeps_connections_alive(self):
+        server = KeepAliveHTTPServer()
+        self.addCleanup(server.stop)
+        self.config.configure(endpoint=server.url)
+        delivery = UrllibDelivery()
+
+        for index in range(3):
+            delivery.deliver(self.config, '{"legit": %d}' % index)
+
+        assert server.requests == 3
+        assert server.connections == 1
+
+    def test_urllib_delivery_replaces_connections_closed_while_idle(self):
+        server = KeepAliveHTTPServer()
+        server.drop_idle = True
+        self.addCleanup(server.stop)
+        self.config.configure(endpoint=server.url)
+        delivery = UrllibDelivery()
+
+        delivery.deliver(self.config, '{"legit": 1}')
+        delivery.deliver(self.config, '{"legit": 2}')
+
+        assert server.requests == 2
+        assert server.connections == 2
+        assert delivery.stats['failed'] == 0
+
+    def test_urllib_delivery_sends_through_the_proxy_host(self):
+        self.config.configure(proxy_host=self.server.address)
+
+        UrllibDelivery().deliver(self.config, '{"legit": 1}')
+
+        self.assertSentReportCount(1)
+        request = self.server.events_received[0]
+        assert request['path'] == self.server.events_url
+
+    def test_urllib_delivery_sends_through_environment_proxies(self):
+        proxy = 'http://' + self.server.address
+
+        with patch.dict(os.environ, {'http_proxy': proxy, 'no_proxy': ''}):
+            UrllibDelivery().deliver(self.config, '{"legit": 1}')
+
+        self.assertSentReportCount(1)
+        request = self.server.events_received[0]
+        assert request['path'] == self.server.events_url
+
+    def test_urllib_delivery_rebuilds_its_opener_when_the_proxy_changes(self):
+        delivery = UrllibDelivery()
+        opener = delivery.get_opener(self.config)
+
+        self.config.configure(proxy_host='http://localhost:1234')
+
+        assert delivery.get_opener(self.config) is not opener
+
+    def test_urllib_delivery_compresses_large_payloads(self):
+        self.config.configure(compress_payloads=True, compression_threshold=10)
+
+        UrllibDelivery().deliver(self.config, '{"legit": "%s"}' % ('a' * 100))
+
+        self.assertSentReportCount(1)
+        request = self.server.events_received[0]
+        self.assertEqual(request['headers']['Content-Encoding'], 'gzip')
+        self.assertEqual(request['json_body'], {'legit': 'a' * 100})
+        self.assertLess(int(request['headers']['Content-Length']), 100)
+
+    def test_urllib_delivery_does_not_compress_small_payloads(self):
+        self.config.configure(compress_payloads=True)
+
+        UrllibDelivery().deliver(self.config, '{"legit": 4}')
+
+        self.assertSentReportCount(1)
+        request = self.server.events_received[0]
+        self.assertNotIn('Content-Encoding', request['headers'])
+        self.assertEqual(request['json_body'], {'legit': 4})
+
+    def test_compression_is_disabled_by_default(self):
+        UrllibDelivery().deliver(self.config, '{"legit": "%s"}' % ('a' * 2000))
+
+        self.assertSentReportCount(1)
+        request = self.server.events_received[0]
+        self.assertNotIn('Content-Encoding', request['headers'])
+
+    def test_sessions_are_compressed(self):
+        self.config.configure(compress_payloads=True, compression_threshold=0)
+
+        UrllibDelivery().deliver_sessions(self.config, '{"legit": 7}')
+
+        self.assertEqual(len(self.server.sessions_received), 1)
+        request = self.server.sessions_received[0]
+        self.assertEqual(request['headers']['Content-Encoding'], 'gzip')
+        self.assertEqual(request['json_body'], {'legit': 7})
+
+    def test_compress_body_uses_configured_level(self):
+        self.config.configure(
+            compress_payloads=True,
+            compression_threshold=0,
+            compression_level=1
+        )
+        body = b'{"a":"' + b'abc' * 1000 + b'"}'
+        headers = {}
+
+        compressed = compress_body(self.config, body, headers)
+
+        assert headers == {'Content-Encoding': 'gzip'}
+        assert gzip.decompress(compressed) == body
+        assert compressed == gzip.compress(body, compresslevel=1)
+
+    def test_delivery_payload_is_sent_without_being_parsed(self):
+        payload = DeliveryPayload(b'{"legit": 9}', 'envelope-key')
+
+        with patch.object(DeliveryPayload, 'from_string') as from_string:
+            UrllibDelivery().deliver(self.config, payload)
+
+            from_string.assert_not_called()
+
+        self.assertSentReportCount(1)
+        request = self.server.events_received[0]
+        self.assertEqual(request['json_body'], {'legit': 9})
+        self.assertEqual(request['headers']['Bugsnag-Api-Key'], 'envelope-key')
+
+    def test_deferred_payloads_are_encoded_on_the_delivery_thread(self):
+        threads = []
+
+        def encode():
+            threads.append(threading.current_thread())
+            return b'{"legit": 11}'
+
+        self.config.configure(asynchronous=True)
+        payload = DeliveryPayload.deferred(encode, 'abc')
+
+        delivery = UrllibDelivery()
+        delivery.deliver(self.config, payload)
+        delivery.get_executor(self.config).join(timeout=2)
+
+        self.assertSentReportCount(1)
+        self.assertEqual(self.server.events_received[0]['json_body'], {
+            'legit': 11
+        })
+        assert len(threads) == 1
+        assert threads[0] is not threading.current_thread()
+
+    def test_deferred_payloads_are_encoded_once(self):
+        encode = Mock(return_value=b'{}')
+        payload = DeliveryPayload.deferred(encode, 'abc')
+
+        encode.assert_not_called()
+        assert payload.body == b'{}'
+        assert str(payload) == '{}'
+        encode.assert_called_once_with()
+
+        payload.body = b'[]'
+        assert payload.body == b'[]'
+
+    def test_string_payloads_are_still_supported(self):
+        UrllibDelivery().deliver(self.config, '{"apiKey": "xyz", "a": 1}')
+
+        self.assertSentReportCount(1)
+        request = self.server.events_received[0]
+        self.assertEqual(request['headers']['Bugsnag-Api-Key'], 'xyz')
+
+    def test_delivery_payload_endpoint_is_used(self):
+        payload = DeliveryPayload(
+            b'{"legit": 10}',
+            'abc',
+            DeliveryPayload.SESSION,
+            endpoint=self.server.sessions_url
+        )
+
+        UrllibDelivery().deliver(self.config, payload)
+
+        self.assertEqual(len(self.server.sessions_received), 1)
+        self.assertSentReportCount(0)
+
+    def test_payload_for_built_in_deliveries(self):
+        payload = DeliveryPayload(b'{"a":1}', 'abc')
+        delivery = UrllibDelivery()
+
+        assert payload_for(delivery.deliver, payload) is payload
+        assert payload_for(delivery.deliver_sessions, payload) is payload
+
+    def test_payload_for_custom_deliveries(self):
+        class CustomDelivery(Delivery):
+            def deliver(self, config, payload, options=None):
+                pass
+
+        class CustomUrllibDelivery(UrllibDelivery):
+            def deliver(self, config, payload, options=None):
+                super().deliver(config, payload, options)
+
+        payload = DeliveryPayload(b'{"a":1}', 'abc')
+
+        for delivery in (CustomDelivery(), CustomUrllibDelivery()):
+            assert payload_for(delivery.deliver, payload) == '{"a":1}'
+
+            # deliver_sessions isn't overridden but is still safe to pass an
+            # envelope as it converts it before calling "deliver"
+            assert payload_for(delivery.deliver_sessions, payload) is payload
+
+    def test_deliver_sessions_gives_custom_deliver_a_string(self):
+        received = []
+
+        class CustomDelivery(Delivery):
+            def deliver(self, config, payload, options=None):
+                received.append(payload)
+
+        CustomDelivery().deliver_sessions(
+            self.config,
+            DeliveryPayload(b'{"a":1}', 'abc', DeliveryPayload.SESSION)
+        )
+
+        assert received == ['{"a":1}']
+
+    def spool_directory(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+
+        return directory
+
+    def wait_for_report_count(self, count, timeout=2):
+        start = time.time()
+
+        while self.sent_report_count < count:
+            if time.time() - start > timeout:
+                break
+
+            time.sleep(0.01)
+
+        self.assertSentReportCount(count)
+
+    def test_payloads_are_spooled_when_the_endpoint_is_unreachable(self):
+        directory = self.spool_directory()
+        self.config.configure(
+            endpoint='http://localhost:4',
+            spool_directory=directory
+        )
+
+        with pytest.raises(Exception):
+            UrllibDelivery().deliver(
+                self.config,
+                DeliveryPayload(b'{"a":1}', 'abc')
+            )
+
+        spool = PayloadSpool(directory)
+        paths = spool.paths()
+
+        assert len(paths) == 1
+        assert spool.read(paths[0]) == (b'{"a":1}', {
+            'apiKey': 'abc',
+            'kind': 'event',
+            'endpoint': 'http://localhost:4',
+        })
+
+    def test_payloads_are_spooled_after_a_server_error(self):
+        directory = self.spool_directory()
+        self.config.configure(spool_directory=directory)
+        self.server.status_code = 503
+
+        for delivery in (UrllibDelivery(), RequestsDelivery()):
+            delivery.deliver(self.config, DeliveryPayload(b'{"a":1}', 'abc'))
+
+            # payloads are hidden while they are claimed by a replay
+            self.wait_for_replay(delivery)
+
+        assert len(PayloadSpool(directory).paths()) == 2
+
+    def test_payloads_are_not_spooled_after_a_client_error(self):
+        directory = self.spool_directory()
+        self.config.configure(spool_directory=directory)
+        self.server.status_code = 400
+
+        for delivery in (UrllibDelivery(), RequestsDelivery()):
+            delivery.deliver(self.config, DeliveryPayload(b'{"a":1}', 'abc'))
+
+        assert PayloadSpool(directory).paths() == []
+
+    def test_nothing_is_spooled_without_a_spool_directory(self):
+        self.server.status_code = 503
+        delivery = UrllibDelivery()
+
+        delivery.deliver(self.config, DeliveryPayload(b'{"a":1}', 'abc'))
+
+        assert delivery.get_spool(self.config) is None
+
+    def test_spooled_payloads_are_replayed_after_a_successful_delivery(self):
+        directory = self.spool_directory()
+        self.config.configure(spool_directory=directory)
+        delivery = UrllibDelivery()
+
+        # opening the spool replays it, so wait for that to finish before
+        # anything is spooled
+        delivery.get_spool(self.config)
+        start = time.time()
+        while delivery._replaying and time.time() - start < 2:
+            time.sleep(0.01)
+
+        self.server.status_code = 503
+        delivery.deliver(self.config, DeliveryPayload(b'{"a":1}', 'abc'))
+        assert len(PayloadSpool(directory).paths()) == 1
+
+        self.server.status_code = 200
+        self.server.events_received.clear()
+        delivery.deliver(self.config, DeliveryPayload(b'{"a":2}', 'abc'))
+
+        self.wait_for_stat(delivery, 'replayed', 1)
+        self.assertSentReportCount(2)
+        bodies = [r['json_body'] for r in self.server.events_received]
+        assert sorted(bodies, key=lambda body: body['a']) == [
+            {'a': 1},
+            {'a': 2},
+        ]
+        assert PayloadSpool(directory).paths() == []
+
+    def test_spooled_payloads_are_replayed_when_the_spool_is_configured(self):
+        directory = self.spool_directory()
+        PayloadSpool(directory).write(b'{"a":1}', {
+            'apiKey': 'xyz',
+            'kind': 'event',
+            'endpoint': self.server.events_url,
+        })
+
+        self.config.configure(
+            delivery=UrllibDelivery(),
+            spool_directory=directory
+        )
+
+        self.wait_for_report_count(1)
+        request = self.server.events_received[0]
+        assert request['json_body'] == {'a': 1}
+        assert request['headers']['Bugsnag-Api-Key'] == 'xyz'
+
+    def test_abandoned_requests_are_spooled(self):
+        directory = self.spool_directory()
+        self.config.configure(spool_directory=directory, asynchronous=True)
+        delivery = UrllibDelivery()
+        executor = delivery.get_executor(self.config)
+        submitted = []
+
+        with patch.object(
+            executor,
+            'submit',
+            side_effect=lambda *args, **kwargs: submitted.append(kwargs)
+        ):
+            delivery.deliver(self.config, DeliveryPayload(b'{"a":1}', 'abc'))
+
+        submitted[0]['on_abandon']()
+
+        spool = PayloadSpool(directory)
+        paths = spool.paths()
+        assert len(paths) == 1
+        assert spool.read(paths[0])[0] == b'{"a":1}'
+        assert self.sent_report_count == 0
+
+    def test_queue_request_overrides_without_on_abandon_still_work(self):
+        queued = []
+
+        class LegacyDelivery(UrllibDelivery):
+            def queue_request(self, request, config, options):
+                queued.append(request)
+                super().queue_request(request, config, options)
+
+        LegacyDelivery().deliver(self.config, '{"legit": 4}')
+
+        assert len(queued) == 1
+        self.assertSentReportCount(1)
+
+    def wait_for_replay(self, delivery, timeout=2):
+        start = time.time()
+
+        while delivery._replaying and time.time() - start < timeout:
+            time.sleep(0.01)
+
+    def wait_for_stat(self, delivery, name, value, timeout=2):
+        start = time.time()
+
+        while delivery.stats[name] < value:
+            if time.time() - start > timeout:
+                break
+
+            time.sleep(0.01)
+
+        assert delivery.stats[name] == value
+
+    def test_asynchronous_requests_are_retried_after_a_server_error(self):
+        self.config.configure(
+            asynchronous=True,
+            delivery_retry_base_delay=0.01
+        )
+        self.server.status_codes = [503, 500]
+
+        for delivery in (UrllibDelivery(), RequestsDelivery()):
+            self.server.status_codes = [503, 500]
+            self.server.events_received.clear()
+
+            delivery.deliver(self.config, DeliveryPayload(b'{"a":1}', 'abc'))
+
+            self.wait_for_stat(delivery, 'delivered', 1)
+            assert self.sent_report_count == 3
+            assert delivery.stats == {
+                'delivered': 1,
+                'failed': 2,
+                'retried': 2,
+                'retries_exhausted': 0,
+                'spooled': 0,
+                'replayed': 0,
+                'shed': 0,
+            }
+
+    def test_requests_are_not_retried_after_a_client_error(self):
+        self.config.configure(
+            asynchronous=True,
+            delivery_retry_base_delay=0.01
+        )
+        delivery = UrllibDelivery()
+
+        for status in (400, 401, 413):
+            self.server.status_code = status
+            delivery.deliver(self.config, DeliveryPayload(b'{"a":1}', 'abc'))
+
+        self.wait_for_stat(delivery, 'failed', 3)
+        delivery.get_executor(self.config).join(1)
+
+        assert self.sent_report_count == 3
+        assert delivery.stats['retried'] == 0
+
+    def test_retries_are_limited_and_then_spooled(self):
+        directory = self.spool_directory()
+        self.config.configure(
+            asynchronous=True,
+            delivery_max_retries=2,
+            delivery_retry_base_delay=0.01,
+            spool_directory=directory
+        )
+        self.server.status_code = 429
+        delivery = UrllibDelivery()
+        callback = threading.Event()
+
+        delivery.deliver(
+            self.config,
+            DeliveryPayload(b'{"a":1}', 'abc'),
+            {'post_delivery_callback': callback.set}
+        )
+
+        assert callback.wait(2)
+        assert self.sent_report_count == 3
+        assert delivery.stats['retried'] == 2
+        assert delivery.stats['retries_exhausted'] == 1
+        assert delivery.stats['spooled'] == 1
+        assert len(PayloadSpool(directory).paths()) == 1
+
+    def test_synchronous_requests_are_not_retried(self):
+        self.server.status_code = 503
+        delivery = UrllibDelivery()
+
+        delivery.deliver(self.config, DeliveryPayload(b'{"a":1}', 'abc'))
+
+        assert self.sent_report_count == 1
+        assert delivery.stats['retried'] == 0
+
+    def test_retry_after_header_is_respected(self):
+        self.config.configure(
+            asynchronous=True,
+            delivery_retry_base_delay=10
+        )
+        self.server.status_codes = [429]
+        self.server.response_headers = {'Retry-After': '0'}
+
+        for delivery in (UrllibDelivery(), RequestsDelivery()):
+            self.server.status_codes = [429]
+            self.server.events_received.clear()
+
+            delivery.deliver(self.config, DeliveryPayload(b'{"a":1}', 'abc'))
+
+            self.wait_for_stat(delivery, 'delivered', 1)
+            assert self.sent_report_count == 2
+
+    def test_retry_delay_uses_capped_exponential_backoff(self):
+        self.config.configure(
+            delivery_max_retries=10,
+            delivery_retry_base_delay=1,
+            delivery_retry_max_delay=8
+        )
+        delivery = Delivery()
+
+        for attempt, backoff in enumerate([1, 2, 4, 8, 8]):
+            delay = delivery._retry_delay(self.config, attempt)
+
+            assert backoff / 2 <= delay <= backoff
+
+        assert delivery._retry_delay(self.config, 10) is None
+
+    def test_retry_delay_uses_retry_after(self):
+        self.config.configure(delivery_retry_max_delay=30)
+        delivery = Delivery()
+
+        assert delivery._retry_delay(self.config, 0, 20) == 20
+        assert delivery._retry_delay(self.config, 0, 31) is None
+
+    def test_circuit_breaker_opens_after_consecutive_failures(self):
+        self.config.configure(
+            circuit_breaker_threshold=2,
+            circuit_breaker_cooldown=60
+        )
+        self.server.status_code = 503
+        delivery = UrllibDelivery()
+
+        for index in range(4):
+            delivery.deliver(self.config, DeliveryPayload(b'{"a":1}', 'abc'))
+
+        assert self.sent_report_count == 2
+        assert delivery.stats['shed'] == 2
+        assert delivery.circuit_breaker_states == {
+            self.server.events_url: 'open'
+        }
+
+    def test_circuit_breaker_sheds_to_the_spool(self):
+        directory = self.spool_directory()
+        self.config.configure(
+            endpoint='http://localhost:4',
+            circuit_breaker_threshold=1,
+            spool_directory=directory
+        )
+        delivery = UrllibDelivery()
+
+        with pytest.raises(Exception):
+            delivery.deliver(self.config, DeliveryPayload(b'{"a":1}', 'abc'))
+
+        delivery.deliver(self.config, DeliveryPayload(b'{"a":2}', 'abc'))
+
+        assert delivery.stats['shed'] == 1
+        assert delivery.stats['spooled'] == 2
+
+    def test_circuit_breaker_can_drop_shed_payloads(self):
+        directory = self.spool_directory()
+        self.config.configure(
+            circuit_breaker_threshold=1,
+            circuit_breaker_fallback='drop',
+            spool_directory=directory
+        )
+        self.server.status_code = 503
+        delivery = UrllibDelivery()
+
+        for index in range(2):
+            delivery.deliver(self.config, DeliveryPayload(b'{"a":1}', 'abc'))
+
+        assert delivery.stats['shed'] == 1
+        assert delivery.stats['spooled'] == 1
+
+    def test_circuit_breaker_closes_after_a_successful_trial(self):
+        self.config.configure(
+            circuit_breaker_threshold=1,
+            circuit_breaker_cooldown=0.01
+        )
+        self.server.status_code = 503
+        delivery = UrllibDelivery()
+
+        delivery.deliver(self.config, DeliveryPayload(b'{"a":1}', 'abc'))
+        assert delivery.circuit_breaker_states == {
+            self.server.events_url: 'open'
+        }
+
+        time.sleep(0.02)
+        self.server.status_code = 200
+        delivery.deliver(self.config, DeliveryPayload(b'{"a":2}', 'abc'))
+
+        assert self.sent_report_count == 2
+        assert delivery.circuit_breaker_states == {
+            self.server.events_url: 'closed'
+        }
+
+    def test_failing_bodies_do_not_use_up_a_half_open_trial(self):
+        self.config.configure(
+            circuit_breaker_threshold=1,
+            circuit_breaker_cooldown=0.01
+        )
+        delivery = UrllibDelivery()
+        breaker = delivery.get_circuit_breaker(
+            self.config,
+            self.server.events_url
+        )
+        breaker.record_failure()
+        time.sleep(0.02)
+
+        def fail():
+            raise ValueError('oops')
+
+        with pytest.raises(ValueError):
+            delivery.deliver(
+                self.config,
+                DeliveryPayload.deferred(fail, 'abc')
+            )
+
+        delivery.deliver(self.config, DeliveryPayload(b'{"a":1}', 'abc'))
+
+        assert self.sent_report_count == 1
+        assert delivery.circuit_breaker_states == {
+            self.server.events_url: 'closed'
+        }
+
+    def test_client_errors_do_not_open_the_circuit_breaker(self):
+        self.config.configure(circuit_breaker_threshold=1)
+        self.server.status_code = 400
+        delivery = UrllibDelivery()
+
+        for index in range(2):
+            delivery.deliver(self.config, DeliveryPayload(b'{"a":1}', 'abc'))
+
+        assert self.sent_report_count == 2
+        assert delivery.stats['shed'] == 0
+
+    def test_each_endpoint_has_its_own_circuit_breaker(self):
+        self.config.configure(circuit_breaker_threshold=1)
+        self.server.status_code = 503
+        delivery = UrllibDelivery()
+
+        delivery.deliver(self.config, DeliveryPayload(b'{"a":1}', 'abc'))
+        delivery.deliver_sessions(
+            self.config,
+            DeliveryPayload(b'{"a":1}', 'abc', DeliveryPayload.SESSION)
+        )
+
+        assert self.sent_session_count == 1
+        assert delivery.circuit_breaker_states == {
+            self.server.events_url: 'open',
+            self.server.sessions_url: 'open',
+        }
+
+    def spool_payloads(self, directory, count):
+        spool = PayloadSpool(directory)
+
+        for index in range(count):
+            spool.write(b'{"a":%d}' % index, {
+                'apiKey': 'abc',
+                'kind': 'event',
+                'endpoint': self.server.events_url,
+            })
+
+        return spool
+
+    def test_replay_waits_for_a_half_open_trial_to_finish(self):
+        spool = self.spool_payloads(self.spool_directory(), 2)
+        self.config.configure(
+            circuit_breaker_threshold=1,
+            circuit_breaker_cooldown=0.01
+        )
+        delivery = UrllibDelivery()
+        breaker = delivery.get_circuit_breaker(
+            self.config,
+            self.server.events_url
+        )
+        breaker.record_failure()
+        time.sleep(0.02)
+
+        # a live request is the half open trial
+        assert breaker.allow_request()
+
+        delivery._drain_spool(self.config, spool)
+
+        assert self.sent_report_count == 0
+        assert len(spool.paths()) == 2
+
+    def test_replay_stops_at_the_first_failed_send(self):
+        spool = self.spool_payloads(self.spool_directory(), 3)
+        self.config.configure(circuit_breaker_threshold=10)
+        self.server.status_code = 503
+        delivery = UrllibDelivery()
+
+        delivery._drain_spool(self.config, spool)
+
+        assert self.sent_report_count == 1
+        assert len(spool.paths()) == 3
+
+    def test_replay_skips_payloads_claimed_by_another_process(self):
+        spool = self.spool_payloads(self.spool_directory(), 2)
+        claimed_path = spool.claim(spool.paths()[0])
+        delivery = UrllibDelivery()
+
+        delivery._drain_spool(self.config, spool)
+
+        self.assertSentReportCount(1)
+        assert self.server.events_received[0]['json_body'] == {'a': 1}
+        assert spool.paths() == []
+        assert os.path.exists(claimed_path)
+
+    @pytest.mark.skipif(
+        not hasattr(os, 'register_at_fork'),
+        reason='forking is not supported'
+    )
+    def test_replaying_is_reset_in_forked_children(self):
+        spool = self.spool_payloads(self.spool_directory(), 1)
+        delivery = UrllibDelivery()
+
+        with patch.object(delivery, '_drain_spool'):
+            delivery._replay_spool(self.config, spool)
+
+        assert delivery._replaying
+
+        pid = os.fork()
+
+        if pid == 0:
+            os._exit(1 if delivery._replaying else 0)
+
+        _, status = os.waitpid(pid, 0)
+
+        assert os.WEXITSTATUS(status) == 0
+        assert delivery._replaying
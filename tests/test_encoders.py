@@ -0,0 +1,422 @@
+import gc
+import json
+import sys
+import tracemalloc
+import weakref
+from collections import namedtuple
+from datetime import date, datetime, time
+from decimal import Decimal
+from enum import Enum, IntEnum
+from pathlib import PurePosixPath
+from unittest.mock import patch
+from uuid import UUID
+
+import pytest
+
+from bugsnag.encoders import (
+    MAX_FALLBACK_LENGTH,
+    SUMMARY_COLUMNS,
+    SUMMARY_SAMPLE_SIZE,
+    SUMMARY_VALUES,
+    TypeEncoders,
+    default_type_encoders,
+    fallback_encoder,
+    summarize_array,
+    summarize_data_frame,
+    summarize_series
+)
+from bugsnag.serializers import get_serializer
+from bugsnag.utils import FilterDict
+from tests.utils import make_encoder
+
+
+dataclasses = pytest.importorskip('dataclasses')
+
+
+class Colour(Enum):
+    RED = 'red'
+
+
+class Size(IntEnum):
+    LARGE = 3
+
+
+Point = namedtuple('Point', ['x', 'y'])
+
+
+@dataclasses.dataclass
+class Account:
+    name: str
+    password: str
+    parent: object = None
+
+
+class Base:
+    pass
+
+
+class Child(Base):
+    pass
+
+
+class Long:
+    def __str__(self):
+        return 'a' * 5000
+
+
+@pytest.mark.parametrize('value, expected', [
+    (datetime(2020, 1, 2, 3, 4, 5), '2020-01-02T03:04:05'),
+    (date(2020, 1, 2), '2020-01-02'),
+    (time(3, 4, 5, 6000), '03:04:05.006000'),
+    (Decimal('1.10'), '1.10'),
+    (UUID(int=1), '00000000-0000-0000-0000-000000000001'),
+    (Colour.RED, 'Colour.RED'),
+    (Size.LARGE, 3),
+    (Point(1, [2]), {'x': 1, 'y': [2]}),
+    (PurePosixPath('/tmp/a'), '/tmp/a'),
+    (Account('a', 'b'), {'name': 'a', 'password': 'b', 'parent': None}),
+])
+def test_builtin_encoders(value, expected):
+    assert default_type_encoders().encode(value) == expected
+
+
+def test_types_without_an_encoder_are_coerced_to_strings():
+    encoders = default_type_encoders()
+
+    assert encoders.lookup(object) is None
+    assert encoders.encode(Exception('oops')) == 'oops'
+
+
+def test_json_types_never_have_an_encoder():
+    encoders = TypeEncoders()
+    encoders.register(object, repr)
+
+    for value_type in (str, int, float, bool, type(None), dict, list):
+        assert encoders.lookup(value_type) is None
+
+    assert encoders.lookup(tuple) is repr
+
+
+def test_the_closest_registered_base_class_is_used():
+    encoders = TypeEncoders()
+    encoders.register(object, lambda value: 'object')
+    encoders.register(Base, lambda value: 'base')
+
+    assert encoders.encode(Child()) == 'base'
+    assert encoders.encode(Long()) == 'object'
+
+
+def test_registered_types_take_precedence_over_kinds():
+    encoders = default_type_encoders()
+    encoders.register(Point, lambda value: 'point')
+
+    assert encoders.encode(Point(1, 2)) == 'point'
+
+
+def test_lookups_are_cached_by_exact_type():
+    checked = []
+    encoders = TypeEncoders()
+    encoders.register_kind(
+        lambda value_type: checked.append(value_type) or True,
+        str
+    )
+
+    encoders.lookup(Base)
+    encoders.lookup(Base)
+    encoders.lookup(Child)
+
+    assert checked == [Base, Child]
+
+
+def test_registering_clears_the_cache():
+    encoders = TypeEncoders()
+    assert encoders.lookup(Child) is None
+
+    encoders.register(Base, repr)
+
+    assert encoders.lookup(Child) is repr
+
+
+def test_types_are_not_kept_alive_once_they_leave_the_cache():
+    with patch('bugsnag.encoders.TYPE_CACHE_SIZE', 2):
+        encoders = TypeEncoders()
+
+    encoders.register(Base, repr)
+
+    created = type('Created', (Base,), {})
+    created_ref = weakref.ref(created)
+    assert encoders.lookup(created) is repr
+
+    for _ in range(2):
+        encoders.lookup(type('Other', (Base,), {}))
+
+    del created
+    gc.collect()
+
+    assert created_ref() is None
+
+
+def test_copies_are_independent():
+    encoders = default_type_encoders()
+    copied = encoders.copy()
+    copied.register(Base, repr)
+
+    assert copied.lookup(date) is not None
+    assert encoders.lookup(Base) is None
+
+
+def test_the_fallback_encoder_elides_the_middle_of_long_strings():
+    encoded = fallback_encoder(Long())
+
+    assert len(encoded) == MAX_FALLBACK_LENGTH
+    assert encoded.startswith('aaa')
+    assert '...' in encoded
+    assert encoded.endswith('aaa')
+
+
+def make_recursive_account():
+    account = Account('a', 'hunter2')
+    account.parent = account
+
+    return account
+
+
+@pytest.mark.parametrize('backend', ['json', 'orjson', 'ujson'])
+def test_encoding_paths_convert_values_identically(backend):
+    if backend != 'json':
+        pytest.importorskip(backend)
+
+    account = make_recursive_account()
+    value = FilterDict({
+        'account': account,
+        'nested': {'accounts': [account, Point(account, 2)]},
+        'when': datetime(2020, 1, 2),
+        'colour': Colour.RED,
+        'long': Long(),
+    })
+
+    encoder = make_encoder(serializer=get_serializer(backend))
+    encoded = json.loads(encoder.encode_bytes(value).decode('utf-8'))
+
+    assert encoded == json.loads(encoder.encode(value))
+    assert encoded == json.loads(make_encoder(indent=2).encode(value))
+    assert encoded['account'] == {
+        'name': 'a',
+        'password': '[FILTERED]',
+        'parent': '[RECURSIVE]',
+    }
+
+
+@pytest.mark.parametrize('backend', ['json', 'orjson', 'ujson'])
+def test_deeply_nested_converted_values_are_encoded(backend):
+    if backend != 'json':
+        pytest.importorskip(backend)
+
+    account = None
+    for _ in range(5000):
+        account = Account('a', 'hunter2', account)
+
+    value = {'filtered': FilterDict({'account': account}), 'plain': [account]}
+    encoder = make_encoder(serializer=get_serializer(backend))
+
+    expected = (
+        '{"filtered":{"account":' +
+        '{"name":"a","password":"[FILTERED]","parent":' * 5000 + 'null' +
+        '}' * 5000 + '},"plain":[' +
+        '{"name":"a","password":"hunter2","parent":' * 5000 + 'null' +
+        '}' * 5000 + ']}'
+    )
+
+    assert encoder.encode_bytes(value) == expected.encode('utf-8')
+    assert encoder.encode(value) == expected
+
+
+def test_failing_encoders_produce_bad_encoding_values():
+    encoders = TypeEncoders()
+    encoders.register(Base, lambda value: 1 / 0)
+    encoder = make_encoder(type_encoders=encoders)
+
+    assert encoder.encode({'a': Base()}) == '{"a":"[BADENCODING]"}'
+
+    encoder = make_encoder(type_encoders=encoders, sort_keys=True)
+
+    assert encoder.encode({'a': Base()}) == '{"a":"[BADENCODING]"}'
+
+
+def summary_allocations(summarize, value):
+    tracemalloc.start()
+
+    try:
+        summarize(value)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_arrays_are_summarized():
+    numpy = pytest.importorskip('numpy')
+
+    value = numpy.arange(100.0).reshape(10, 10)
+    value[0, 1] = numpy.nan
+
+    assert summarize_array(value) == {
+        'type': 'numpy.ndarray',
+        'shape': [10, 10],
+        'dtype': 'float64',
+        'nbytes': 800,
+        'head': [0.0, 'nan', 2.0, 3.0, 4.0],
+        'tail': [95.0, 96.0, 97.0, 98.0, 99.0],
+        'nanCount': 1,
+        'min': 0.0,
+        'max': 99.0,
+        'mean': 4949 / 99,
+    }
+
+
+def test_small_arrays_include_every_value():
+    numpy = pytest.importorskip('numpy')
+
+    summary = summarize_array(numpy.array([True, False, True]))
+
+    assert summary['values'] == [True, False, True]
+    assert summary['min'] is False
+    assert summary['max'] is True
+    assert 'head' not in summary
+
+
+def test_arrays_without_numbers_have_no_statistics():
+    numpy = pytest.importorskip('numpy')
+
+    summary = summarize_array(numpy.array(['a', 'b']))
+
+    assert summary['values'] == ['a', 'b']
+    assert 'min' not in summary
+
+
+def test_array_summaries_do_not_depend_on_the_size_of_the_array():
+    numpy = pytest.importorskip('numpy')
+
+    # a view of a trillion values which doesn't need any memory
+    huge = numpy.broadcast_to(numpy.float64(1.5), (10 ** 6, 10 ** 6))
+    summary = summarize_array(huge)
+
+    assert summary['shape'] == [10 ** 6, 10 ** 6]
+    assert summary['sampled'] is True
+    assert summary['sampleSize'] == SUMMARY_SAMPLE_SIZE
+    assert summary['mean'] == 1.5
+
+    small = summary_allocations(summarize_array, numpy.zeros(SUMMARY_VALUES))
+    large = summary_allocations(summarize_array, numpy.zeros(10 ** 7))
+
+    assert large < 1024 * 1024
+    assert large < small + SUMMARY_SAMPLE_SIZE * 8 * 4
+
+
+def test_exact_statistics_are_not_marked_as_sampled():
+    numpy = pytest.importorskip('numpy')
+
+    summary = summarize_array(numpy.arange(SUMMARY_SAMPLE_SIZE))
+
+    assert 'sampled' not in summary
+    assert 'sampleSize' not in summary
+
+
+def test_datetime_arrays_are_summarized_as_iso_strings():
+    numpy = pytest.importorskip('numpy')
+
+    value = numpy.array(
+        ['2020-01-02T03:04:05.123456789', 'NaT'],
+        dtype='datetime64[ns]'
+    )
+
+    assert summarize_array(value) == {
+        'type': 'numpy.ndarray',
+        'shape': [2],
+        'dtype': 'datetime64[ns]',
+        'nbytes': 16,
+        'values': ['2020-01-02T03:04:05.123456789', 'NaT'],
+    }
+
+
+def test_numpy_scalars_are_converted():
+    numpy = pytest.importorskip('numpy')
+    encoders = default_type_encoders()
+
+    assert encoders.encode(numpy.int64(5)) == 5
+    assert encoders.encode(numpy.bool_(True)) is True
+    assert encoders.encode(numpy.datetime64('2020-01-02')) == '2020-01-02'
+
+
+def test_series_are_summarized():
+    pandas = pytest.importorskip('pandas')
+
+    summary = summarize_series(pandas.Series(range(20), name='numbers'))
+
+    assert summary['type'] == 'pandas.Series'
+    assert summary['name'] == 'numbers'
+    assert summary['shape'] == [20]
+    assert summary['head'] == [0, 1, 2, 3, 4]
+    assert summary['tail'] == [15, 16, 17, 18, 19]
+    assert summary['min'] == 0
+    assert summary['max'] == 19
+    assert summary['mean'] == 9.5
+
+
+def test_data_frames_are_summarized_by_column():
+    pandas = pytest.importorskip('pandas')
+
+    frame = pandas.DataFrame({
+        str(column): [column, float('nan')]
+        for column in range(SUMMARY_COLUMNS + 3)
+    })
+
+    summary = summarize_data_frame(frame)
+
+    assert summary['type'] == 'pandas.DataFrame'
+    assert summary['shape'] == [2, SUMMARY_COLUMNS + 3]
+    assert summary['omittedColumns'] == 3
+    assert len(summary['columns']) == SUMMARY_COLUMNS
+    assert summary['columns'][1] == {
+        'name': '1',
+        'shape': [2],
+        'dtype': 'float64',
+        'nbytes': frame['1'].memory_usage(index=True, deep=False),
+        'values': [1.0, 'nan'],
+        'nanCount': 1,
+        'min': 1.0,
+        'max': 1.0,
+        'mean': 1.0,
+    }
+
+
+def test_series_summaries_do_not_depend_on_the_size_of_the_series():
+    pandas = pytest.importorskip('pandas')
+
+    small = pandas.Series(range(SUMMARY_VALUES), dtype='float64')
+    large = pandas.Series(range(10 ** 7), dtype='float64')
+
+    small_allocations = summary_allocations(summarize_series, small)
+    large_allocations = summary_allocations(summarize_series, large)
+
+    assert large_allocations < 1024 * 1024
+    assert large_allocations < small_allocations + SUMMARY_SAMPLE_SIZE * 8 * 4
+
+
+def test_arrays_in_metadata_are_summarized():
+    numpy = pytest.importorskip('numpy')
+
+    encoded = json.loads(make_encoder().encode({'a': numpy.zeros((2, 3))}))
+
+    assert encoded['a']['shape'] == [2, 3]
+    assert encoded['a']['values'] == [0.0] * 6
+
+
+def test_numpy_and_pandas_are_not_imported(monkeypatch):
+    monkeypatch.delitem(sys.modules, 'numpy', raising=False)
+    monkeypatch.delitem(sys.modules, 'pandas', raising=False)
+
+    encoders = default_type_encoders()
+
+    assert encoders.lookup(Base) is None
+    assert 'numpy' not in sys.modules
+    assert 'pandas' not in sys.modules
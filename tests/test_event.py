@@ -1,6 +1,8 @@
 from importlib import reload
 import inspect
 import json
+import linecache
+from datetime import date
 import os
 import sys
 import unittest
@@ -10,6 +12,7 @@ from bugsnag.breadcrumbs import Breadcrumb, BreadcrumbType
 from bugsnag.configuration import Configuration
 from bugsnag.event import Event
 from bugsnag.feature_flags import FeatureFlag
+from bugsnag.utils import MAX_PAYLOAD_LENGTH
 from tests import fixtures
 
 
@@ -186,6 +189,130 @@ class TestEvent(unittest.TestCase):
         code = payload['events'][0]['exceptions'][0]['stacktrace'][0]['code']
         self.assertEqual(code, None)
 
+    def test_code_turned_off_out_of_project(self):
+        config = Configuration()
+        config.configure(
+            project_root=os.path.join(os.getcwd(), 'tests', 'integrations'),
+            send_code_out_of_project=False
+        )
+        event = self.event_class(Exception("oops"), config, {},
+                                 traceback=fixtures.end_of_file[2])
+
+        payload = json.loads(event._payload())
+
+        frame = payload['events'][0]['exceptions'][0]['stacktrace'][0]
+        self.assertFalse(frame['inProject'])
+        self.assertEqual(frame['code'], None)
+
+        config.project_root = os.path.join(os.getcwd(), 'tests')
+        event = self.event_class(Exception("oops"), config, {},
+                                 traceback=fixtures.end_of_file[2])
+
+        payload = json.loads(event._payload())
+
+        frame = payload['events'][0]['exceptions'][0]['stacktrace'][0]
+        self.assertTrue(frame['inProject'])
+        self.assertEqual(frame['code']['12'],
+                         'except Exception: end_of_file = sys.exc_info()')
+
+    def test_lazy_events_build_stacktraces_when_they_are_used(self):
+        exception = fixtures.exception_with_explicit_cause
+        config = Configuration()
+        config.configure(project_root=os.path.join(os.getcwd(), 'tests'))
+        eager = self.event_class(exception, config, {})
+
+        config.lazy_events = True
+        lazy = self.event_class(exception, config, {})
+
+        assert [error._build_stacktrace for error in eager.errors] == [
+            None, None, None
+        ]
+        assert all(error._build_stacktrace for error in lazy.errors)
+        assert [error.error_class for error in lazy.errors] == [
+            'NameError', 'ArithmeticError', 'Exception'
+        ]
+
+        assert lazy.errors[1].stacktrace == eager.errors[1].stacktrace
+        assert lazy.errors[1]._build_stacktrace is None
+        assert lazy.errors[0]._build_stacktrace is not None
+
+        assert lazy._payload() == eager._payload()
+
+    def test_lazy_stacktraces_can_be_replaced(self):
+        config = Configuration()
+        config.lazy_events = True
+        event = self.event_class(fixtures.start_of_file[1], config, {},
+                                 traceback=fixtures.start_of_file[2])
+
+        with pytest.warns(DeprecationWarning):
+            event.stacktrace = [{'file': 'a.py'}]
+
+        assert event.errors[0].stacktrace == [{'file': 'a.py'}]
+
+        payload = json.loads(event._payload())
+        assert payload['events'][0]['exceptions'][0]['stacktrace'] == [
+            {'file': 'a.py'}
+        ]
+
+    def test_recursive_frames_are_collapsed(self):
+        def recurse():
+            recurse()
+
+        try:
+            recurse()
+        except RecursionError as error:
+            exception = error
+
+        config = Configuration()
+        config.configure(project_root=os.path.join(os.getcwd(), 'tests'))
+        event = self.event_class(exception, config, {})
+        stacktrace = event.errors[0].stacktrace
+
+        # the innermost frame is first
+        assert len(stacktrace) == 4
+        assert stacktrace[0]['method'] == 'recurse'
+        assert stacktrace[1]['file'] == '[OMITTED]'
+        assert stacktrace[1]['method'].endswith(' repeated frames')
+        assert stacktrace[1]['code'] is None
+        assert stacktrace[2]['method'] == 'recurse'
+        assert stacktrace[3]['method'] == 'test_recursive_frames_are_collapsed'
+
+    def test_stacktraces_are_limited(self):
+        def recurse(depth):
+            if depth == 0:
+                raise Exception('deep')
+
+            recurse(depth - 1)
+
+        try:
+            recurse(20)
+        except Exception as error:
+            exception = error
+
+        config = Configuration()
+        config.configure(stacktrace_max_frames=3)
+        event = self.event_class(exception, config, {})
+        stacktrace = event.errors[0].stacktrace
+
+        # the 20 recursive calls are collapsed to the first and last, and the
+        # limit leaves out those and the frames omitted between them
+        assert [frame['method'] for frame in stacktrace] == [
+            'recurse', '20 frames', 'test_stacktraces_are_limited'
+        ]
+        assert stacktrace[0]['code'] is not None
+        assert stacktrace[1]['code'] is None
+
+    def test_code_is_not_kept_in_linecache(self):
+        config = Configuration()
+        file_name = fixtures.start_of_file[2].tb_frame.f_code.co_filename
+        linecache.cache.pop(file_name, None)
+
+        event = self.event_class(fixtures.start_of_file[1], config, {},
+                                 traceback=fixtures.start_of_file[2])
+
+        assert event.errors[0].stacktrace[0]['code'][2] == 'try:'
+        assert file_name not in linecache.cache
+
     def test_no_traceback_exclude_modules(self):
         from tests.fixtures import helpers
         config = Configuration()
@@ -364,6 +491,148 @@ class TestEvent(unittest.TestCase):
                                                'with "metadata"')
             assert event.metadata['nuts']['almonds']
 
+    def test_deep_metadata_is_limited(self):
+        config = Configuration()
+        config.configure(metadata_max_depth=2)
+        event = self.event_class(Exception('oops'), config, {})
+
+        deep = {}
+        current = deep
+        for _ in range(10000):
+            current['child'] = {}
+            current = current['child']
+
+        event.add_tab('deep', {'value': deep})
+        event.user = {'id': '1', 'roles': [['admin']]}
+
+        payload = json.loads(event._payload())['events'][0]
+
+        self.assertEqual(
+            {'value': '[TRUNCATED: dict of 1 key]'},
+            payload['metaData']['deep']
+        )
+        self.assertEqual(
+            {'id': '1', 'roles': ['[TRUNCATED: list of 1 item]']},
+            payload['user']
+        )
+        self.assertIs(deep, event.metadata['deep']['value'])
+
+    def test_deep_converted_metadata_is_limited(self):
+        dataclasses = pytest.importorskip('dataclasses')
+        Node = dataclasses.make_dataclass('Node', ['child'])
+
+        config = Configuration()
+        config.configure(metadata_max_depth=2)
+        event = self.event_class(Exception('oops'), config, {})
+
+        node = None
+        for _ in range(5000):
+            node = Node(node)
+
+        event.add_tab('deep', {'value': node})
+
+        payload = json.loads(event._payload())['events'][0]
+
+        self.assertEqual(
+            {'value': '[TRUNCATED: dict of 1 key]'},
+            payload['metaData']['deep']
+        )
+
+    def test_metadata_nodes_are_limited_before_breadcrumbs(self):
+        config = Configuration()
+        config.configure(metadata_max_nodes=5)
+        config._breadcrumbs.append(
+            Breadcrumb('crumb', BreadcrumbType.LOG, {'a': 1}, 'now')
+        )
+
+        event = self.event_class(Exception('oops'), config, {})
+        event.add_tab('tab', {'items': [1, 2, 3, 4, 5]})
+
+        payload = json.loads(event._payload())['events'][0]
+
+        self.assertEqual(
+            {'items': [1, 2, 3, '[TRUNCATED: 2 more items]']},
+            payload['metaData']['tab']
+        )
+        self.assertEqual(
+            {'...': '[TRUNCATED: 1 more key]'},
+            payload['breadcrumbs'][0]['metaData']
+        )
+
+    def test_metadata_values_use_the_configured_type_encoders(self):
+        config = Configuration()
+        config.add_type_encoder(complex, lambda c: [c.real, c.imag])
+
+        event = self.event_class(Exception('oops'), config, {})
+        event.add_tab('tab', {'value': 1 + 2j, 'day': date(2020, 1, 2)})
+
+        payload = json.loads(event._payload())['events'][0]
+
+        self.assertEqual(
+            {'value': [1.0, 2.0], 'day': '2020-01-02'},
+            payload['metaData']['tab']
+        )
+
+    def test_static_fields_follow_changes_to_the_event(self):
+        config = Configuration()
+        config.configure(app_version='1.0', hostname='example')
+
+        event = self.event_class(Exception('oops'), config, {})
+        payload = json.loads(event._payload())['events'][0]
+
+        self.assertEqual({'version': '1.0', 'type': None}, payload['app'])
+        self.assertEqual('example', payload['device']['hostname'])
+
+        event.app_version = '2.0'
+        config.runtime_versions['django'] = '5.0'
+        config.configure(params_filters=['hostname'])
+        payload = json.loads(event._payload())['events'][0]
+
+        self.assertEqual({'version': '2.0', 'type': None}, payload['app'])
+        self.assertEqual('[FILTERED]', payload['device']['hostname'])
+        self.assertEqual('5.0', payload['device']['runtimeVersions']['django'])
+
+        event.app_type = 'worker'
+        payload = json.loads(event._payload())['events'][0]
+
+        self.assertEqual({'version': '2.0', 'type': 'worker'}, payload['app'])
+
+    def test_oversized_payloads_are_trimmed_to_fit(self):
+        config = Configuration()
+        event = self.event_class(Exception('oops'), config, {})
+
+        for i in range(200):
+            event.add_tab('tab{}'.format(i), {'value': 'a' * 1000})
+
+        payload = event._payload()
+        metadata = json.loads(payload)['events'][0]['metaData']
+
+        self.assertLessEqual(len(payload), MAX_PAYLOAD_LENGTH)
+        self.assertIn('metadata', metadata['trimmed'])
+        self.assertEqual('a' * 1000, event.metadata['tab0']['value'])
+
+    def test_long_strings_are_kept_when_trimming_metadata_is_enough(self):
+        config = Configuration()
+        event = self.event_class(Exception('m' * 5000), config, {})
+        event.add_tab('tab', {'value': 'a' * 200000})
+
+        payload = event._payload()
+        payload_event = json.loads(payload)['events'][0]
+
+        self.assertLessEqual(len(payload), MAX_PAYLOAD_LENGTH)
+        self.assertEqual(
+            'm' * 5000,
+            payload_event['exceptions'][0]['message']
+        )
+        self.assertEqual(
+            '[TRIMMED]',
+            payload_event['metaData']['tab']['value']
+        )
+        self.assertEqual(
+            {'metadata': ['tab.value']},
+            payload_event['metaData']['trimmed']
+        )
+
     def test_breadcrumbs_are_read_from_configuration(self):
         breadcrumb = Breadcrumb('example', BreadcrumbType.LOG, {'a': 1}, 'now')
 
@@ -0,0 +1,325 @@
+import atexit
+import os
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from bugsnag.executor import (
+    DeliveryExecutor,
+    OVERFLOW_BLOCK,
+    OVERFLOW_DROP_NEWEST,
+    OVERFLOW_DROP_OLDEST,
+)
+
+
+def blocked_executor(overflow_policy, queue_size=2, block_timeout=0.01):
+    """
+    Create an executor with a single worker that is stuck running a task until
+    the returned event is set
+    """
+    executor = DeliveryExecutor(
+        worker_count=1,
+        queue_size=queue_size,
+        overflow_policy=overflow_policy,
+        block_timeout=block_timeout
+    )
+
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocking_task():
+        started.set()
+        release.wait(2)
+
+    executor.submit(blocking_task)
+    assert started.wait(2)
+
+    return executor, release
+
+
+def test_tasks_are_run_on_worker_threads():
+    executor = DeliveryExecutor(worker_count=2, queue_size=10)
+    thread_names = []
+
+    for _ in range(5):
+        executor.submit(
+            lambda: thread_names.append(threading.current_thread().name)
+        )
+
+    assert executor.join(2)
+    assert len(thread_names) == 5
+    assert all(name.startswith('bugsnag-delivery-') for name in thread_names)
+
+    executor.shutdown(1)
+
+
+def test_workers_are_reused():
+    executor = DeliveryExecutor(worker_count=2, queue_size=100)
+    threads = set()
+
+    for _ in range(50):
+        executor.submit(lambda: threads.add(threading.current_thread()))
+
+    assert executor.join(2)
+    assert len(threads) <= 2
+
+    executor.shutdown(1)
+
+
+def test_exceptions_do_not_stop_workers():
+    executor = DeliveryExecutor(worker_count=1, queue_size=10)
+    results = []
+
+    def broken():
+        raise Exception('oh no')
+
+    executor.submit(broken)
+    executor.submit(lambda: results.append(1))
+
+    assert executor.join(2)
+    assert results == [1]
+
+    executor.shutdown(1)
+
+
+def test_drop_newest_discards_the_submitted_task():
+    executor, release = blocked_executor(OVERFLOW_DROP_NEWEST)
+    results = []
+    dropped = []
+
+    assert executor.submit(lambda: results.append(1))
+    assert executor.submit(lambda: results.append(2))
+    assert not executor.submit(
+        lambda: results.append(3),
+        on_drop=lambda: dropped.append(3)
+    )
+
+    release.set()
+    assert executor.join(2)
+
+    assert results == [1, 2]
+    assert dropped == [3]
+
+    executor.shutdown(1)
+
+
+def test_drop_oldest_discards_the_first_queued_task():
+    executor, release = blocked_executor(OVERFLOW_DROP_OLDEST)
+    results = []
+    dropped = []
+
+    executor.submit(lambda: results.append(1), lambda: dropped.append(1))
+    executor.submit(lambda: results.append(2), lambda: dropped.append(2))
+    assert executor.submit(
+        lambda: results.append(3),
+        on_drop=lambda: dropped.append(3)
+    )
+
+    release.set()
+    assert executor.join(2)
+
+    assert results == [2, 3]
+    assert dropped == [1]
+
+    executor.shutdown(1)
+
+
+def test_block_waits_for_space_in_the_queue():
+    executor, release = blocked_executor(
+        OVERFLOW_BLOCK,
+        queue_size=1,
+        block_timeout=2
+    )
+    results = []
+
+    executor.submit(lambda: results.append(1))
+
+    threading.Timer(0.05, release.set).start()
+    assert executor.submit(lambda: results.append(2))
+
+    assert executor.join(2)
+    assert results == [1, 2]
+
+    executor.shutdown(1)
+
+
+def test_block_drops_the_task_after_the_timeout():
+    executor, release = blocked_executor(OVERFLOW_BLOCK, queue_size=1)
+    dropped = []
+
+    executor.submit(lambda: None)
+    assert not executor.submit(lambda: None, lambda: dropped.append(1))
+    assert dropped == [1]
+
+    release.set()
+    executor.shutdown(1)
+
+
+def test_shutdown_runs_queued_tasks_then_stops_workers():
+    executor, release = blocked_executor(OVERFLOW_DROP_NEWEST)
+    results = []
+
+    executor.submit(lambda: results.append(1))
+    release.set()
+    executor.shutdown(2)
+
+    assert results == [1]
+    assert not any(worker.is_alive() for worker in executor._workers)
+
+    dropped = []
+    assert not executor.submit(lambda: None, lambda: dropped.append(1))
+    assert dropped == [1]
+
+
+def test_join_times_out_when_tasks_are_outstanding():
+    executor, release = blocked_executor(OVERFLOW_DROP_NEWEST)
+
+    assert not executor.join(0.01)
+
+    release.set()
+    assert executor.join(2)
+
+    executor.shutdown(1)
+
+
+def test_tasks_still_queued_at_exit_are_abandoned():
+    executor, release = blocked_executor(OVERFLOW_DROP_NEWEST)
+    abandoned = []
+    results = []
+
+    for index in (1, 2):
+        executor.submit(
+            lambda index=index: results.append(index),
+            on_abandon=lambda index=index: abandoned.append(index)
+        )
+
+    with patch('bugsnag.executor.SHUTDOWN_TIMEOUT', 0.01):
+        executor._drain_at_exit()
+
+    release.set()
+    executor.shutdown(2)
+
+    assert abandoned == [1, 2]
+    assert results == []
+    assert executor.pending_count == 0
+
+
+def test_delayed_tasks_run_after_their_delay():
+    executor = DeliveryExecutor(worker_count=1)
+    results = []
+    done = threading.Event()
+
+    executor.submit_later(0.05, lambda: (results.append(2), done.set()))
+    executor.submit(lambda: results.append(1))
+
+    assert executor.scheduled_count == 1
+    assert done.wait(2)
+    assert results == [1, 2]
+
+    executor.shutdown(1)
+
+
+def test_delayed_tasks_do_not_occupy_a_worker():
+    executor = DeliveryExecutor(worker_count=1)
+    ran = threading.Event()
+
+    executor.submit_later(10, lambda: None)
+    executor.submit(ran.set)
+
+    assert ran.wait(2)
+
+    executor.shutdown(1)
+
+
+def test_delayed_tasks_are_abandoned_on_shutdown():
+    executor = DeliveryExecutor(worker_count=1)
+    abandoned = []
+    dropped = []
+
+    executor.submit_later(10, lambda: None, None, lambda: abandoned.append(1))
+    executor.submit_later(10, lambda: None, lambda: dropped.append(1))
+    executor.shutdown(1)
+
+    assert abandoned == [1]
+    assert dropped == [1]
+    assert executor.scheduled_count == 0
+
+    executor.submit_later(0, lambda: None, None, lambda: abandoned.append(2))
+
+    assert abandoned == [1, 2]
+
+
+def test_join_waits_for_delayed_tasks():
+    executor = DeliveryExecutor(worker_count=1)
+    results = []
+
+    executor.submit_later(0.05, lambda: results.append(1))
+
+    assert not executor.join(0.01)
+    assert executor.join(2)
+    assert results == [1]
+
+    executor.shutdown(1)
+
+
+def test_delayed_tasks_are_abandoned_at_exit_without_waiting():
+    executor = DeliveryExecutor(worker_count=1)
+    abandoned = []
+
+    executor.submit_later(10, lambda: None, None, lambda: abandoned.append(1))
+    executor._drain_at_exit()
+
+    assert abandoned == [1]
+    assert executor.scheduled_count == 0
+
+    executor.submit_later(0, lambda: None, None, lambda: abandoned.append(2))
+
+    assert abandoned == [1, 2]
+
+
+def test_shutdown_unregisters_the_exit_hook():
+    executor = DeliveryExecutor(worker_count=1)
+
+    with patch.object(atexit, 'register') as register, \
+            patch.object(atexit, 'unregister') as unregister:
+        executor.submit(lambda: None)
+        executor.shutdown(1)
+
+    register.assert_called_once_with(executor._drain_at_exit)
+    unregister.assert_called_once_with(executor._drain_at_exit)
+
+
+@pytest.mark.skipif(
+    not hasattr(os, 'register_at_fork'),
+    reason='forking is not supported'
+)
+def test_queued_tasks_are_not_run_in_forked_children():
+    executor, release = blocked_executor(OVERFLOW_DROP_NEWEST)
+    executor.submit(lambda: None)
+    executor.submit_later(10, lambda: None)
+
+    # fork while another thread could be holding the condition, which would
+    # deadlock the child if it kept the parent's
+    with executor._condition:
+        pid = os.fork()
+
+        if pid == 0:
+            child_ran = threading.Event()
+            executor.submit(child_ran.set)
+
+            os._exit(0 if (
+                child_ran.wait(2) and
+                executor.pending_count == 0 and
+                executor.scheduled_count == 0 and
+                executor.join(2)
+            ) else 1)
+
+    _, status = os.waitpid(pid, 0)
+
+    assert os.WEXITSTATUS(status) == 0
+    assert executor.pending_count == 1
+    assert executor.scheduled_count == 1
+
+    release.set()
+    executor.shutdown(2)
@@ -0,0 +1,250 @@
+import logging
+import os
+import sys
+import traceback
+from types import ModuleType
+from unittest.mock import Mock
+
+import pytest
+
+from bugsnag.frames import (
+    FrameClassifier,
+    OmittedFrames,
+    collapse_repeated_frames,
+    exclude_module_paths,
+    get_frame_classifier,
+    limit_frames,
+    walk_stack,
+    walk_traceback
+)
+
+
+def make_classifier(lib_root='/usr/lib', project_root='/app',
+                    exclude_paths=('/app/vendor',)):
+    return FrameClassifier(lib_root, project_root, exclude_paths)
+
+
+def test_project_files_are_relative_to_the_project_root():
+    classifier = make_classifier()
+
+    assert classifier.classify('/app/views/home.py') == (
+        '/app/views/home.py',
+        'views/home.py',
+        True
+    )
+
+
+def test_library_files_take_precedence_over_project_files():
+    classifier = make_classifier(lib_root='/app/lib')
+
+    assert classifier.classify('/app/lib/requests/api.py') == (
+        '/app/lib/requests/api.py',
+        'requests/api.py',
+        False
+    )
+
+
+def test_other_files_keep_their_absolute_path():
+    classifier = make_classifier(lib_root=None, project_root=None)
+
+    assert classifier.classify('/srv/../opt/run.py') == (
+        '/opt/run.py',
+        '/opt/run.py',
+        False
+    )
+
+
+def test_excluded_files_are_not_classified():
+    classifier = make_classifier()
+
+    assert classifier.classify('/app/vendor/thing.py') is None
+    assert classifier.classify('/app/vendor.py') is None
+
+
+def test_relative_files_follow_the_working_directory(tmp_path, monkeypatch):
+    first = tmp_path / 'first'
+    second = tmp_path / 'second'
+    first.mkdir()
+    second.mkdir()
+
+    classifier = make_classifier(project_root=str(first))
+
+    monkeypatch.chdir(str(first))
+    assert classifier.classify('run.py') == (
+        str(first / 'run.py'),
+        'run.py',
+        True
+    )
+
+    monkeypatch.chdir(str(second))
+    assert classifier.classify('run.py') == (
+        str(second / 'run.py'),
+        str(second / 'run.py'),
+        False
+    )
+
+
+def test_classifications_are_cached():
+    classifier = make_classifier()
+
+    for _ in range(3):
+        classifier.classify('/app/views.py')
+
+    cache = classifier._cached_classify.cache_info()
+
+    assert cache.misses == 1
+    assert cache.hits == 2
+
+
+def test_classifiers_are_shared_by_settings():
+    classifier = get_frame_classifier('/usr/lib', '/app', ('/x',))
+
+    assert get_frame_classifier('/usr/lib', '/app', ('/x',)) is classifier
+    assert get_frame_classifier('/usr/lib', '/app', ('/y',)) is not classifier
+
+
+def test_excluded_module_paths():
+    module = ModuleType('excluded')
+    module.__file__ = '/app/excluded.pyc'
+    logger = Mock(logging.Logger)
+
+    paths = exclude_module_paths([module, ModuleType('builtin')], logger)
+
+    assert paths[0] == os.path.dirname(os.path.abspath(
+        os.path.join(os.path.dirname(__file__), '..', 'bugsnag', 'frames.py')
+    ))
+    assert paths[1] == os.path.dirname(logging.__file__)
+    assert paths[2:] == ('/app/excluded.py',)
+    assert logger.exception.call_count == 1
+
+
+def raise_from_nested_call():
+    def nested():
+        raise ValueError('oops')
+
+    nested()
+
+
+def test_walking_a_traceback_matches_the_traceback_module():
+    try:
+        raise_from_nested_call()
+    except ValueError:
+        tb = sys.exc_info()[2]
+
+    expected = [
+        (frame.filename, frame.lineno, frame.name)
+        for frame in traceback.extract_tb(tb)
+    ]
+
+    assert list(walk_traceback(tb)) == expected
+    assert [frame[2] for frame in expected] == [
+        'test_walking_a_traceback_matches_the_traceback_module',
+        'raise_from_nested_call',
+        'nested',
+    ]
+
+    assert list(walk_traceback(None)) == []
+
+
+def test_walking_the_stack_matches_the_traceback_module():
+    frame = sys._getframe()
+
+    expected = [
+        (summary.filename, summary.lineno, summary.name)
+        for summary in traceback.extract_stack(frame)
+    ]
+    walked = walk_stack(frame)
+
+    # the line of this frame has moved on, but its callers are suspended
+    assert walked[:-1] == expected[:-1]
+    assert walked[-1][2] == expected[-1][2] == (
+        'test_walking_the_stack_matches_the_traceback_module'
+    )
+    assert walk_stack(None) == []
+
+
+def location(name, line=1):
+    return (name + '.py', line, name)
+
+
+def test_repeated_frames_are_collapsed():
+    locations = (
+        [location('main')] +
+        [location('recurse')] * 990 +
+        [location('recurse', 2)]
+    )
+
+    assert collapse_repeated_frames(locations) == [
+        location('main'),
+        location('recurse'),
+        OmittedFrames(988, repeated=True),
+        location('recurse'),
+        location('recurse', 2),
+    ]
+
+
+def test_repeated_cycles_of_frames_are_collapsed():
+    cycle = [location('a'), location('b'), location('a', 2), location('c')]
+    locations = [location('main')] + cycle * 250 + cycle[:2]
+
+    assert collapse_repeated_frames(locations) == (
+        [location('main')] +
+        cycle +
+        [OmittedFrames(992, repeated=True)] +
+        cycle +
+        cycle[:2]
+    )
+
+
+def test_separate_runs_of_repeated_frames_are_collapsed():
+    locations = [location('a')] * 10 + [location('b')] * 10
+
+    assert collapse_repeated_frames(locations) == [
+        location('a'),
+        OmittedFrames(8, repeated=True),
+        location('a'),
+        location('b'),
+        OmittedFrames(8, repeated=True),
+        location('b'),
+    ]
+
+
+@pytest.mark.parametrize('locations', [
+    [],
+    [location('a'), location('b'), location('c')],
+    [location('a')] * 3,
+    [location('a'), location('b')] * 2,
+    [location('a'), location('b'), location('a')],
+])
+def test_frames_which_barely_repeat_are_kept(locations):
+    assert collapse_repeated_frames(locations) == locations
+
+
+def test_frames_are_limited_from_the_middle():
+    frames = list(range(10))
+
+    assert limit_frames(frames, 0) is frames
+    assert limit_frames(frames, 10) is frames
+    assert limit_frames(frames, 6) == [
+        0, 1, OmittedFrames(5), 7, 8, 9
+    ]
+    assert limit_frames(frames, 2) == [8, 9]
+
+
+def test_limited_frames_count_omitted_repeated_frames():
+    frames = [0, 1, OmittedFrames(100, repeated=True), 2, 3]
+
+    assert limit_frames(frames, 3) == [0, OmittedFrames(102), 3]
+
+
+def test_omitted_frames_become_a_frame():
+    assert OmittedFrames(1).to_dict() == {
+        'file': '[OMITTED]',
+        'lineNumber': 0,
+        'method': '1 frame',
+        'inProject': False,
+        'code': None,
+    }
+    assert OmittedFrames(5, repeated=True).to_dict()['method'] == (
+        '5 repeated frames'
+    )
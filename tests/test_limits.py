@@ -0,0 +1,171 @@
+from collections import namedtuple
+
+import pytest
+
+from bugsnag import Configuration
+from bugsnag.limits import Limiter
+from bugsnag.utils import FilterDict
+from tests.utils import make_nested
+
+
+Point = namedtuple('Point', ['x', 'y'])
+
+
+def make_limiter(**options):
+    config = Configuration()
+    config.configure(**options)
+
+    return Limiter(config)
+
+
+def test_values_within_the_limits_are_not_copied():
+    value = {'a': [1, 2, {'b': (3, 4)}], 'c': {5, 6}, 'd': 'e'}
+
+    assert make_limiter().limit(value) is value
+
+
+def test_non_containers_are_returned_unchanged():
+    limiter = make_limiter(metadata_max_nodes=1)
+    value = object()
+
+    assert limiter.limit(value) is value
+    assert limiter.limit('abc') == 'abc'
+
+
+def test_deep_values_are_replaced():
+    limiter = make_limiter(metadata_max_depth=2)
+
+    assert limiter.limit({'a': {'b': {'c': 1}, 'd': [[1, 2]]}}) == {
+        'a': {
+            'b': '[TRUNCATED: dict of 1 key]',
+            'd': '[TRUNCATED: list of 1 item]',
+        },
+    }
+
+
+def test_very_deep_values_do_not_exceed_the_recursion_limit():
+    limiter = make_limiter(metadata_max_depth=3, metadata_max_nodes=0)
+    limited = limiter.limit(make_nested(10000))
+
+    assert limited == {
+        'child': {'child': {'child': '[TRUNCATED: dict of 1 key]'}}
+    }
+
+
+def test_very_deep_values_can_be_traversed_without_a_depth_limit():
+    limiter = make_limiter(metadata_max_depth=0, metadata_max_nodes=0)
+    value = make_nested(10000)
+
+    assert limiter.limit(value) is value
+
+
+def test_dicts_with_too_many_keys_are_truncated():
+    limiter = make_limiter(metadata_max_keys=2)
+    limited = limiter.limit({'a': 1, 'b': 2, 'c': 3, 'd': 4})
+
+    assert limited == {'a': 1, 'b': 2, '...': '[TRUNCATED: 2 more keys]'}
+
+
+def test_sequences_with_too_many_items_are_truncated():
+    limiter = make_limiter(metadata_max_items=3)
+    limited = limiter.limit({
+        'list': list(range(1000000)),
+        'tuple': (1, 2, 3, 4),
+        'set': {1, 2, 3, 4, 5},
+    })
+
+    assert limited['list'] == [0, 1, 2, '[TRUNCATED: 999997 more items]']
+    assert limited['tuple'] == (1, 2, 3, '[TRUNCATED: 1 more item]')
+    assert len(limited['set']) == 4
+    assert limited['set'][-1] == '[TRUNCATED: 2 more items]'
+
+
+def test_the_node_budget_is_shared_between_values():
+    limiter = make_limiter(metadata_max_nodes=5)
+
+    assert limiter.limit({'a': [1, 2], 'b': 3}) == {'a': [1, 2], 'b': 3}
+    assert limiter.limit({'c': 4, 'd': 5, 'e': 6}) == {
+        'c': 4,
+        '...': '[TRUNCATED: 2 more keys]',
+    }
+    assert limiter.limit({'f': 7}) == {'...': '[TRUNCATED: 1 more key]'}
+
+
+def test_filter_dicts_stay_filter_dicts():
+    limiter = make_limiter(metadata_max_keys=1)
+    limited = limiter.limit(FilterDict({'a': FilterDict({'b': 1, 'c': 2})}))
+
+    assert isinstance(limited, FilterDict)
+    assert isinstance(limited['a'], FilterDict)
+    assert limited == {'a': {'b': 1, '...': '[TRUNCATED: 1 more key]'}}
+
+
+def test_recursive_values_are_replaced_when_copied():
+    value = {'a': [1, 2, 3]}
+    value['self'] = value
+
+    limited = make_limiter(metadata_max_items=1).limit(value)
+
+    assert limited == {
+        'a': [1, '[TRUNCATED: 2 more items]'],
+        'self': '[RECURSIVE]',
+    }
+
+
+def test_converted_values_are_limited():
+    dataclasses = pytest.importorskip('dataclasses')
+    Node = dataclasses.make_dataclass('Node', ['child'])
+
+    limiter = make_limiter(metadata_max_items=2, metadata_max_nodes=0)
+    limited = limiter.limit({'node': Node(list(range(300000)))})
+
+    assert limited == {
+        'node': {'child': [0, 1, '[TRUNCATED: 299998 more items]']},
+    }
+
+
+def test_deep_converted_values_are_replaced():
+    dataclasses = pytest.importorskip('dataclasses')
+    Node = dataclasses.make_dataclass('Node', ['child'])
+
+    node = None
+    for _ in range(5000):
+        node = Node(node)
+
+    limited = make_limiter(metadata_max_depth=3).limit({'node': node})
+
+    assert limited == {
+        'node': {'child': {'child': '[TRUNCATED: dict of 1 key]'}},
+    }
+
+
+def test_recursive_converted_values_are_replaced():
+    dataclasses = pytest.importorskip('dataclasses')
+    Node = dataclasses.make_dataclass('Node', ['child'])
+
+    node = Node(None)
+    node.child = [node]
+
+    assert make_limiter().limit({'node': node}) == {
+        'node': {'child': ['[RECURSIVE]']},
+    }
+
+
+def test_named_tuples_are_converted_rather_than_copied_as_lists():
+    limiter = make_limiter(metadata_max_items=1)
+    limited = limiter.limit({'point': Point(1, [2, 3])})
+
+    assert limited == {'point': {'x': 1, 'y': [2, '[TRUNCATED: 1 more item]']}}
+
+
+def test_limits_can_be_turned_off():
+    limiter = make_limiter(
+        metadata_max_depth=0,
+        metadata_max_keys=0,
+        metadata_max_items=0,
+        metadata_max_nodes=0
+    )
+
+    value = {str(i): list(range(2000)) for i in range(3)}
+
+    assert limiter.limit(value) is value
@@ -0,0 +1,118 @@
+import sys
+import time
+
+from bugsnag.rate_limiter import RateLimiter
+import bugsnag.rate_limiter as rate_limiter
+from tests.utils import make_config
+
+
+def raise_and_catch(exception_class=Exception):
+    try:
+        raise exception_class('oh no')
+    except Exception as e:
+        return e, sys.exc_info()[2]
+
+
+def test_every_error_is_allowed_when_disabled():
+    limiter = RateLimiter()
+    config = make_config()
+    exception, tb = raise_and_catch()
+
+    for _ in range(100):
+        assert limiter.acquire(config, exception, tb) == 0
+
+    assert len(limiter._buckets) == 0
+
+
+def test_errors_are_suppressed_after_the_burst():
+    limiter = RateLimiter()
+    config = make_config(rate_limit_per_key=0.001, rate_limit_burst=3)
+    exception, tb = raise_and_catch()
+
+    assert [limiter.acquire(config, exception, tb) for _ in range(5)] == [
+        0, 0, 0, None, None
+    ]
+
+
+def test_suppressed_count_is_returned_when_allowed_again():
+    limiter = RateLimiter()
+    config = make_config(rate_limit_per_key=50, rate_limit_burst=1)
+    exception, tb = raise_and_catch()
+
+    assert limiter.acquire(config, exception, tb) == 0
+    assert limiter.acquire(config, exception, tb) is None
+    assert limiter.acquire(config, exception, tb) is None
+
+    time.sleep(0.05)
+
+    assert limiter.acquire(config, exception, tb) == 2
+    assert limiter.acquire(config, exception, tb) is None
+
+
+def test_errors_are_keyed_by_class_and_location():
+    limiter = RateLimiter()
+    config = make_config(rate_limit_per_key=0.001, rate_limit_burst=1)
+
+    first, first_tb = raise_and_catch(ValueError)
+    second, second_tb = raise_and_catch(KeyError)
+
+    try:
+        raise ValueError('oh no')
+    except ValueError as e:
+        third, third_tb = e, sys.exc_info()[2]
+
+    assert limiter.acquire(config, first, first_tb) == 0
+    assert limiter.acquire(config, second, second_tb) == 0
+    assert limiter.acquire(config, third, third_tb) == 0
+
+    # the same class from the same line shares a key
+    again, again_tb = raise_and_catch(ValueError)
+    assert limiter.acquire(config, again, again_tb) is None
+
+
+def test_errors_without_a_traceback_use_the_calling_location():
+    limiter = RateLimiter()
+    config = make_config(rate_limit_per_key=0.001, rate_limit_burst=1)
+
+    def notify():
+        return limiter.acquire(config, Exception('oh no'), None)
+
+    assert notify() == 0
+    assert notify() is None
+    assert limiter.acquire(config, Exception('oh no'), None) == 0
+
+
+def test_global_limit_applies_across_errors():
+    limiter = RateLimiter()
+    config = make_config(rate_limit_global=2)
+
+    results = []
+    for exception_class in (ValueError, KeyError, TypeError, OSError):
+        exception, tb = raise_and_catch(exception_class)
+        results.append(limiter.acquire(config, exception, tb))
+
+    assert results == [0, 0, None, None]
+
+
+def test_least_recently_seen_keys_are_forgotten(monkeypatch):
+    monkeypatch.setattr(rate_limiter, 'MAX_KEYS', 2)
+
+    limiter = RateLimiter()
+    config = make_config(rate_limit_per_key=0.001, rate_limit_burst=1)
+
+    errors = [
+        raise_and_catch(exception_class)
+        for exception_class in (ValueError, KeyError, TypeError)
+    ]
+
+    for exception, tb in errors:
+        assert limiter.acquire(config, exception, tb) == 0
+
+    assert len(limiter._buckets) == 2
+
+    # the first key was evicted so gets a fresh bucket
+    exception, tb = errors[0]
+    assert limiter.acquire(config, exception, tb) == 0
+
+    exception, tb = errors[2]
+    assert limiter.acquire(config, exception, tb) is None
@@ -0,0 +1,116 @@
+import itertools
+import time
+
+from bugsnag.sampling import Sampler
+from tests.utils import make_config
+
+
+def test_events_are_reported_without_sample_rates():
+    sampler = Sampler(random_function=lambda: 0.999)
+    config = make_config()
+
+    assert sampler.sample(config, 'warning', 'handledException') == 1.0
+
+
+def test_events_are_sampled_by_severity():
+    config = make_config(sample_rates={'info': 0.25})
+
+    assert Sampler(lambda: 0.2).sample(
+        config, 'info', 'handledException'
+    ) == 0.25
+
+    assert Sampler(lambda: 0.3).sample(
+        config, 'info', 'handledException'
+    ) is None
+
+    assert Sampler(lambda: 0.3).sample(
+        config, 'error', 'handledException'
+    ) == 1.0
+
+
+def test_severity_reason_takes_precedence_over_severity():
+    config = make_config(
+        sample_rates={'warning': 0.1, 'handledException': 0.5}
+    )
+
+    sampler = Sampler(lambda: 0.4)
+
+    assert sampler.sample(config, 'warning', 'handledException') == 0.5
+    assert sampler.sample(config, 'warning', 'log') is None
+
+
+def test_a_rate_of_zero_drops_every_event():
+    sampler = Sampler(lambda: 0.0)
+    config = make_config(sample_rates={'info': 0})
+
+    assert sampler.sample(config, 'info', 'handledException') is None
+
+
+def test_adaptive_rate_is_not_applied_under_the_budget():
+    sampler = Sampler(lambda: 0.999)
+    config = make_config(sample_max_events_per_second=10)
+
+    for _ in range(10):
+        assert sampler.sample(config, 'warning', 'handledException') == 1.0
+
+
+def test_adaptive_rate_scales_down_bursts_over_the_budget():
+    sampler = Sampler(lambda: 0.0)
+    config = make_config(sample_max_events_per_second=10)
+
+    rates = [
+        sampler.sample(config, 'warning', 'handledException')
+        for _ in range(20)
+    ]
+
+    assert rates[:10] == [1.0] * 10
+    assert rates[10] == 10 / 11
+    assert rates[19] == 0.5
+
+
+def test_adaptive_rate_combines_with_the_configured_rate():
+    sampler = Sampler(lambda: 0.0)
+    config = make_config(
+        sample_rates={'warning': 0.5},
+        sample_max_events_per_second=1
+    )
+
+    sampler.sample(config, 'warning', 'handledException')
+
+    assert sampler.sample(config, 'warning', 'handledException') == 0.25
+
+
+def test_adaptive_rate_drops_events_over_the_budget():
+    random_values = itertools.cycle([0.0, 0.9])
+    sampler = Sampler(lambda: next(random_values))
+    config = make_config(sample_max_events_per_second=1)
+
+    results = [
+        sampler.sample(config, 'warning', 'handledException')
+        for _ in range(4)
+    ]
+
+    assert results == [1.0, 0.5, None, 0.25]
+
+
+def test_adaptive_rate_is_estimated_across_windows(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+
+    sampler = Sampler(lambda: 0.0)
+    config = make_config(sample_max_events_per_second=5)
+
+    for _ in range(20):
+        sampler.sample(config, 'warning', 'handledException')
+
+    now[0] += 1
+
+    # the first window saw 20 events per second
+    assert sampler.sample(config, 'warning', 'handledException') == 0.25
+    assert sampler.estimated_rate == 20
+
+    now[0] += 1
+
+    # the estimate decays when the rate drops
+    assert sampler.sample(config, 'warning', 'handledException') == 5 / 10.5
+    assert sampler.estimated_rate == 10.5
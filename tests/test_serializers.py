@@ -0,0 +1,152 @@
+import json
+from collections import OrderedDict
+from datetime import datetime
+
+import pytest
+
+from bugsnag.serializers import get_serializer, is_available
+from bugsnag.utils import (
+    FilterDict,
+    MAX_PAYLOAD_LENGTH,
+    MAX_STRING_LENGTH
+)
+from tests.large_object import large_object_file_path
+from tests.utils import make_encoder
+
+
+@pytest.fixture(params=['json', 'orjson', 'ujson'])
+def backend(request):
+    if request.param != 'json':
+        pytest.importorskip(request.param)
+
+    return request.param
+
+
+def assert_parity(backend, obj):
+    expected = make_encoder().encode(obj)
+    encoded = make_encoder(get_serializer(backend)).encode_bytes(obj)
+
+    assert isinstance(encoded, bytes)
+    assert json.loads(encoded.decode('utf-8')) == json.loads(expected)
+
+
+class Unprintable:
+    def __str__(self):
+        raise ValueError('nope')
+
+
+class Thing:
+    def __str__(self):
+        return 'a thing'
+
+
+class Text(str):
+    pass
+
+
+class Number(int):
+    def __int__(self):
+        return 0
+
+
+def make_recursive():
+    value = {'name': 'loop'}
+    value['self'] = value
+    value['list'] = [value, 1]
+
+    return value
+
+
+def make_recursive_filter_dict():
+    value = FilterDict({'password': 'hunter2'})
+    value['nested'] = {'parent': value, 'password': 'x'}
+
+    return value
+
+
+FIXTURES = {
+    'plain': {'a': 1, 'b': 'two', 'c': [1.5, True, None]},
+    'filtered': FilterDict({
+        'password': 'hunter2',
+        'user_Password': 'x',
+        'nested': {'password': 'y', 'list': [{'password': 'z'}]},
+        b'password': 'bytes key',
+    }),
+    'recursive': make_recursive(),
+    'recursive filter dict': make_recursive_filter_dict(),
+    'bad encoding': {'bad': Unprintable(), 'good': Thing()},
+    'bytes': {'valid': b'abc', 'invalid': b'\xff\xfe', b'\xff': 'key'},
+    'keys': {1: 'int', None: 'none', (1, 2): 'tuple', 1.5: 'float'},
+    'containers': {
+        'set': {1, 2},
+        'tuple': (1, [2, (3,)]),
+        'ordered': OrderedDict([('b', 1), ('a', 2)]),
+    },
+    'subclasses': {'text': Text('abc'), 'number': Number(5), 'bool': False},
+    'objects': {'date': datetime(2020, 1, 2, 3, 4, 5), 'type': int},
+    'unicode': {'snowman': '☃', 'emoji': '\U0001f600', 'slash': 'a/b'},
+    'long strings': {'a': 'x' * (MAX_STRING_LENGTH * 2)},
+    'oversized': {
+        'list': ['y' * (MAX_STRING_LENGTH * 2)] * 100,
+        'meta': FilterDict({'password': 'p' * 5000, 'v': 'v' * 5000}),
+    },
+}
+
+
+@pytest.mark.parametrize('name', sorted(FIXTURES))
+def test_backends_encode_fixtures_identically(backend, name):
+    assert_parity(backend, FIXTURES[name])
+
+
+def test_backends_encode_large_objects_identically(backend):
+    with open(large_object_file_path()) as large_object_file:
+        data = json.load(large_object_file)
+
+    assert_parity(backend, data)
+    assert_parity(backend, FilterDict({'data': data, 'password': data}))
+
+
+def test_backends_trim_oversized_payloads(backend):
+    obj = {'list': ['y' * (MAX_STRING_LENGTH * 2)] * 100}
+    encoded = make_encoder(get_serializer(backend)).encode_bytes(obj)
+
+    assert len(encoded) <= MAX_PAYLOAD_LENGTH
+    assert json.loads(encoded.decode('utf-8')) == {
+        'list': ['y' * MAX_STRING_LENGTH] * 100
+    }
+
+
+@pytest.mark.parametrize('obj', [
+    {'nan': float('nan')},
+    {'infinity': [float('inf')]},
+    {'big': 2 ** 70},
+    {'surrogate': '\ud800'},
+], ids=['nan', 'infinity', 'big int', 'surrogate'])
+def test_values_backends_cannot_write_use_the_stdlib_encoder(backend, obj):
+    expected = make_encoder().encode(obj).encode('utf-8', 'replace')
+
+    assert make_encoder(get_serializer(backend)).encode_bytes(obj) == expected
+
+
+def test_trimmed_bytes_trim_every_string(backend):
+    encoder = make_encoder(get_serializer(backend))
+    encoded = encoder._encode_trimmed_bytes({'a': 'x' * 2000})
+
+    assert json.loads(encoded.decode('utf-8')) == {'a': 'x' * 1024}
+
+
+def test_stdlib_backend_has_no_serializer():
+    assert is_available('json')
+    assert get_serializer('json') is None
+
+
+def test_auto_backend_prefers_orjson():
+    orjson = pytest.importorskip('orjson')
+
+    assert orjson is not None
+    assert get_serializer('auto').name == 'orjson'
+
+
+def test_unknown_backends_have_no_serializer():
+    assert not is_available('simplejson')
+    assert get_serializer('simplejson') is None
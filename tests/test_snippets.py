@@ -0,0 +1,208 @@
+import linecache
+import sys
+import zipfile
+
+import pytest
+
+from bugsnag import snippets
+from bugsnag.snippets import SnippetCache, read_snippet
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'source.py'
+    path.write_text(''.join('# {}\n'.format(line) for line in range(1, 21)))
+
+    return str(path)
+
+
+@pytest.fixture
+def reads(monkeypatch):
+    calls = []
+
+    def counting_read_snippet(*args):
+        calls.append(args)
+        return read_snippet(*args)
+
+    monkeypatch.setattr(snippets, 'read_snippet', counting_read_snippet)
+
+    return calls
+
+
+def test_snippets_are_centered_on_the_line(source):
+    assert read_snippet(source, 10) == {
+        7: '# 7', 8: '# 8', 9: '# 9', 10: '# 10', 11: '# 11', 12: '# 12',
+        13: '# 13',
+    }
+
+
+@pytest.mark.parametrize('line, expected', [
+    (1, range(1, 8)),
+    (2, range(1, 8)),
+    (19, range(14, 21)),
+    (50, range(14, 21)),
+])
+def test_snippets_are_moved_to_fit_the_file(source, line, expected):
+    assert list(read_snippet(source, line)) == list(expected)
+
+
+def test_snippets_of_short_files(tmp_path):
+    path = tmp_path / 'short.py'
+    path.write_text('a = 1\n\nb = 2  \n')
+
+    assert read_snippet(str(path), 2) == {1: 'a = 1', 2: '', 3: 'b = 2'}
+
+
+def test_encoding_declarations_are_respected(tmp_path):
+    path = tmp_path / 'latin.py'
+    path.write_bytes(b'# -*- coding: latin-1 -*-\nname = "caf\xe9"\n')
+
+    assert read_snippet(str(path), 2)[2] == 'name = "café"'
+
+
+def test_files_which_cannot_be_read_have_no_lines(tmp_path):
+    assert read_snippet(str(tmp_path / 'missing.py'), 1) == {}
+    assert SnippetCache().get(str(tmp_path / 'missing.py'), 1) == {}
+    assert SnippetCache().get('<stdin>', 1) == {}
+
+
+@pytest.mark.parametrize('validate', [True, False])
+def test_sources_registered_with_linecache_are_read(monkeypatch, validate):
+    lines = ['x = {}\n'.format(line) for line in range(1, 11)]
+    monkeypatch.setitem(
+        linecache.cache,
+        '<generated>',
+        (len(''.join(lines)), None, lines, '<generated>')
+    )
+
+    cache = SnippetCache(validate=validate)
+
+    assert cache.get('<generated>', 9) == {
+        4: 'x = 4', 5: 'x = 5', 6: 'x = 6', 7: 'x = 7', 8: 'x = 8',
+        9: 'x = 9', 10: 'x = 10',
+    }
+
+
+def test_modules_imported_from_zip_files_are_read(tmp_path, monkeypatch):
+    archive = tmp_path / 'modules.zip'
+
+    with zipfile.ZipFile(str(archive), 'w') as modules:
+        modules.writestr('zipped.py', 'a = 1\nb = 2\n')
+
+    monkeypatch.syspath_prepend(str(archive))
+    monkeypatch.delitem(sys.modules, 'zipped', raising=False)
+
+    import zipped
+
+    try:
+        assert SnippetCache().get(zipped.__file__, 1) == {
+            1: 'a = 1', 2: 'b = 2',
+        }
+        assert read_snippet(zipped.__file__, 2) == {1: 'a = 1', 2: 'b = 2'}
+    finally:
+        del sys.modules['zipped']
+        linecache.cache.pop(zipped.__file__, None)
+
+
+def test_snippets_are_cached(source, reads):
+    cache = SnippetCache()
+
+    assert cache.get(source, 10) == cache.get(source, 10)
+    assert cache.get(source, 11) == read_snippet(source, 11)
+    assert len(reads) == 2
+
+
+def test_cached_snippets_are_copied(source):
+    cache = SnippetCache()
+    cache.get(source, 10)[10] = 'changed'
+
+    assert cache.get(source, 10)[10] == '# 10'
+
+
+def test_changed_files_are_read_again(source, reads):
+    cache = SnippetCache()
+    cache.get(source, 1)
+
+    with open(source, 'a') as f:
+        f.write('# 21\n')
+
+    assert cache.get(source, 1)[1] == '# 1'
+    assert len(reads) == 2
+    assert len(cache._snippets) == 1
+
+
+def test_files_are_not_checked_without_validation(source, reads):
+    cache = SnippetCache(validate=False)
+    cache.get(source, 1)
+
+    with open(source, 'w') as f:
+        f.write('changed\n')
+
+    assert cache.get(source, 1)[1] == '# 1'
+    assert len(reads) == 1
+
+
+def test_the_least_recently_used_snippets_are_evicted(source):
+    cache = SnippetCache()
+    cache.get(source, 14)
+    snippet_size = cache.size
+
+    cache.resize(snippet_size * 2)
+    cache.get(source, 15)
+    cache.get(source, 14)
+    cache.get(source, 16)
+
+    assert list(cache._snippets) == [(source, 14, 7), (source, 16, 7)]
+    assert cache.size == snippet_size * 2
+
+    cache.resize(snippet_size)
+
+    assert list(cache._snippets) == [(source, 16, 7)]
+    assert cache.size == snippet_size
+
+
+def test_nothing_is_cached_without_space(source, reads):
+    cache = SnippetCache(max_bytes=0)
+
+    assert cache.get(source, 10) == cache.get(source, 10)
+    assert len(reads) == 2
+    assert cache.size == 0
+
+
+def test_only_the_window_is_read(tmp_path, monkeypatch):
+    path = tmp_path / 'large.py'
+    path.write_text('\n'.join('# line' for _ in range(100000)))
+    read_lines = []
+
+    original_open = snippets.tokenize.open
+
+    def tracking_open(file_name):
+        source = original_open(file_name)
+        original_readline = source.readline
+
+        def readline(*args):
+            line = original_readline(*args)
+            read_lines.append(line)
+            return line
+
+        return TrackingFile(source, readline)
+
+    monkeypatch.setattr(snippets.tokenize, 'open', tracking_open)
+
+    assert list(read_snippet(str(path), 10)) == list(range(7, 14))
+    assert len(read_lines) < 100
+
+
+class TrackingFile:
+    def __init__(self, source, readline):
+        self.source = source
+        self.readline = readline
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.source.close()
+
+    def __iter__(self):
+        return iter(self.readline, '')
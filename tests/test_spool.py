@@ -0,0 +1,141 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from bugsnag.spool import PayloadSpool
+
+
+class SpoolTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+
+    def test_payloads_are_read_back_with_their_metadata(self):
+        spool = PayloadSpool(self.directory)
+        path = spool.write(b'{"a":1}', {'apiKey': 'abc', 'kind': 'event'})
+
+        assert spool.paths() == [path]
+        assert spool.read(path) == (
+            b'{"a":1}',
+            {'apiKey': 'abc', 'kind': 'event'}
+        )
+
+        spool.remove(path)
+
+        assert spool.paths() == []
+        assert not spool.has_entries
+
+    def test_payloads_are_listed_oldest_first(self):
+        spool = PayloadSpool(self.directory)
+        paths = [spool.write(b'%d' % index, {}) for index in range(5)]
+
+        assert spool.paths() == paths
+
+    def test_no_temporary_files_are_left_behind(self):
+        spool = PayloadSpool(self.directory)
+        spool.write(b'{}', {})
+
+        assert [
+            name for name in os.listdir(self.directory)
+            if not name.endswith('.payload')
+        ] == []
+
+    def test_payloads_survive_reopening_the_spool(self):
+        path = PayloadSpool(self.directory).write(b'{}', {'apiKey': 'abc'})
+        spool = PayloadSpool(self.directory)
+
+        assert spool.has_entries
+        assert spool.paths() == [path]
+
+    def test_oldest_payloads_are_evicted_when_there_are_too_many_files(self):
+        spool = PayloadSpool(self.directory, max_files=2)
+        paths = [spool.write(b'%d' % index, {}) for index in range(3)]
+
+        assert spool.paths() == paths[1:]
+
+    def test_oldest_payloads_are_evicted_when_there_are_too_many_bytes(self):
+        # each payload is 3 bytes of metadata, a newline and 10 bytes of body
+        spool = PayloadSpool(self.directory, max_bytes=30)
+        paths = [spool.write(b'x' * 10, {}) for index in range(3)]
+
+        assert spool.paths() == paths[1:]
+
+    def test_payloads_larger_than_the_spool_are_not_written(self):
+        spool = PayloadSpool(self.directory, max_bytes=10)
+
+        assert spool.write(b'x' * 10, {}) is None
+        assert spool.paths() == []
+
+    def test_unreadable_payloads_are_discarded(self):
+        spool = PayloadSpool(self.directory)
+        path = spool.write(b'{}', {})
+
+        with open(path, 'wb') as spooled_file:
+            spooled_file.write(b'not json\n{}')
+
+        assert spool.read(path) is None
+        assert spool.paths() == []
+
+    def test_stale_temporary_files_are_removed(self):
+        stale = os.path.join(self.directory, 'abc.tmp')
+        recent = os.path.join(self.directory, 'xyz.tmp')
+
+        for path in (stale, recent):
+            with open(path, 'wb') as temp_file:
+                temp_file.write(b'{}')
+
+        an_hour_ago = time.time() - 3600
+        os.utime(stale, (an_hour_ago, an_hour_ago))
+
+        PayloadSpool(self.directory)
+
+        assert not os.path.exists(stale)
+        assert os.path.exists(recent)
+
+    def test_claimed_payloads_are_hidden_from_other_claimants(self):
+        spool = PayloadSpool(self.directory)
+        path = spool.write(b'{"a":1}', {'apiKey': 'abc'})
+        other_spool = PayloadSpool(self.directory)
+
+        claimed_path = spool.claim(path)
+
+        assert claimed_path is not None
+        assert other_spool.paths() == []
+        assert other_spool.claim(path) is None
+        assert spool.read(claimed_path) == (b'{"a":1}', {'apiKey': 'abc'})
+
+        spool.remove(claimed_path)
+
+        assert os.listdir(self.directory) == []
+
+    def test_released_payloads_can_be_claimed_again(self):
+        spool = PayloadSpool(self.directory)
+        path = spool.write(b'{"a":1}', {'apiKey': 'abc'})
+
+        spool.release(spool.claim(path))
+
+        assert spool.paths() == [path]
+        assert spool.claim(path) is not None
+
+    def test_stale_claims_are_released(self):
+        spool = PayloadSpool(self.directory)
+        stale = spool.claim(spool.write(b'{"a":1}', {'apiKey': 'abc'}))
+        recent = spool.claim(spool.write(b'{"a":2}', {'apiKey': 'abc'}))
+
+        an_hour_ago = time.time() - 3600
+        os.utime(stale, (an_hour_ago, an_hour_ago))
+
+        paths = PayloadSpool(self.directory).paths()
+
+        assert len(paths) == 1
+        assert spool.read(paths[0])[0] == b'{"a":1}'
+        assert os.path.exists(recent)
+
+    def test_the_directory_is_created(self):
+        directory = os.path.join(self.directory, 'a', 'b')
+        spool = PayloadSpool(directory)
+
+        assert os.path.isdir(directory)
+        assert spool.paths() == []
@@ -0,0 +1,169 @@
+import json
+
+from bugsnag.trimming import encode_within_budget
+from bugsnag.utils import FilterDict
+from tests.utils import make_encoder
+
+
+def make_frame(index, in_project=True, code=True):
+    return {
+        'file': 'file{}.py'.format(index),
+        'lineNumber': index,
+        'method': 'method{}'.format(index),
+        'inProject': in_project,
+        'code': {str(line): 'x' * 80 for line in range(7)} if code else None,
+    }
+
+
+def make_payload(metadata=None, breadcrumbs=0, frames=None):
+    return {
+        'severity': 'warning',
+        'exceptions': [{
+            'errorClass': 'Exception',
+            'message': 'oops',
+            'stacktrace': frames if frames is not None else [make_frame(0)],
+            'type': 'python',
+        }],
+        'metaData': FilterDict(metadata or {}),
+        'user': FilterDict({'id': '123'}),
+        'breadcrumbs': [
+            {'name': 'breadcrumb {}'.format(i), 'metaData': {'a': 'b' * 100}}
+            for i in range(breadcrumbs)
+        ],
+        'featureFlags': [],
+    }
+
+
+def encode(payload, budget):
+    encoded = encode_within_budget(make_encoder(), payload, budget)
+
+    assert len(encoded) <= budget
+
+    return json.loads(encoded.decode('utf-8'))
+
+
+def test_payloads_within_the_budget_are_not_trimmed():
+    payload = make_payload({'tab': {'a': 'b'}}, breadcrumbs=2)
+    expected = json.loads(make_encoder().encode(payload))
+
+    assert encode(payload, 10000) == expected
+    assert 'trimmed' not in expected['metaData']
+
+
+def test_large_metadata_values_are_trimmed_first():
+    metadata = {
+        'request': {'body': 'a' * 5000, 'headers': {'b': 'c' * 3000}},
+        'small': {'value': 'd'},
+    }
+    payload = make_payload(metadata, breadcrumbs=5)
+
+    result = encode(payload, 5000)
+
+    assert result['metaData']['request']['body'] == '[TRIMMED]'
+    assert result['metaData']['request']['headers'] == {'b': 'c' * 3000}
+    assert result['metaData']['small'] == {'value': 'd'}
+    assert len(result['breadcrumbs']) == 5
+    assert result['metaData']['trimmed'] == {'metadata': ['request.body']}
+
+    # the event's own metadata is left untouched
+    assert metadata['request']['body'] == 'a' * 5000
+
+
+def test_filtered_metadata_values_are_not_trimmed():
+    metadata = {'request': {'password': 'a' * 5000, 'body': 'b' * 5000}}
+
+    result = encode(make_payload(metadata), 3000)
+
+    assert result['metaData']['request'] == {
+        'password': '[FILTERED]',
+        'body': '[TRIMMED]',
+    }
+
+
+def test_oldest_breadcrumbs_are_trimmed_next():
+    payload = make_payload({'tab': {'a': 'b' * 2000}}, breadcrumbs=50)
+
+    result = encode(payload, 4000)
+    names = [breadcrumb['name'] for breadcrumb in result['breadcrumbs']]
+
+    assert result['metaData']['tab']['a'] == '[TRIMMED]'
+    assert 0 < len(names) < 50
+    assert names[-1] == 'breadcrumb 49'
+    assert result['metaData']['trimmed']['breadcrumbs'] == 50 - len(names)
+
+
+def test_code_of_frames_outside_the_project_is_trimmed_next():
+    frames = [make_frame(i, in_project=(i == 0)) for i in range(6)]
+    payload = make_payload(frames=frames, breadcrumbs=3)
+
+    result = encode(payload, 2500)
+    stacktrace = result['exceptions'][0]['stacktrace']
+
+    assert result['breadcrumbs'] == []
+    assert stacktrace[0]['code'] is not None
+    assert len(stacktrace) == 6
+    assert result['metaData']['trimmed']['breadcrumbs'] == 3
+    assert result['metaData']['trimmed']['codeSnippets'] >= 1
+
+    # the outermost frames lose their code first
+    assert stacktrace[-1]['code'] is None
+
+    # the event's own frames are left untouched
+    assert all(frame['code'] is not None for frame in frames)
+
+
+def test_frames_from_the_middle_of_deep_stacktraces_are_trimmed_last():
+    frames = [make_frame(i, code=False) for i in range(200)]
+    payload = make_payload(frames=frames)
+
+    result = encode(payload, 4000)
+    stacktrace = result['exceptions'][0]['stacktrace']
+    methods = [frame['method'] for frame in stacktrace]
+
+    assert methods[0] == 'method0'
+    assert methods[-1] == 'method199'
+    assert 2 <= len(methods) < 200
+    assert result['metaData']['trimmed'] == {
+        'stackFrames': 200 - len(methods)
+    }
+    assert len(frames) == 200
+
+
+def test_long_strings_are_kept_if_trimming_metadata_is_enough():
+    payload = make_payload({'request': {'body': 'a' * 200000}})
+    payload['exceptions'][0]['message'] = 'm' * 5000
+
+    result = encode(payload, 8000)
+
+    assert result['exceptions'][0]['message'] == 'm' * 5000
+    assert result['metaData']['request']['body'] == '[TRIMMED]'
+    assert result['metaData']['trimmed'] == {'metadata': ['request.body']}
+
+
+def test_long_strings_are_trimmed_after_frames():
+    frames = [make_frame(i, code=False) for i in range(3)]
+    payload = make_payload(frames=frames)
+    payload['exceptions'][0]['message'] = 'm' * 5000
+
+    result = encode(payload, 2000)
+
+    assert result['exceptions'][0]['message'] == 'm' * 1024
+    assert len(result['exceptions'][0]['stacktrace']) == 2
+    assert result['metaData']['trimmed'] == {
+        'stackFrames': 1,
+        'strings': True,
+    }
+
+
+def test_payloads_are_reduced_to_essentials_as_a_last_resort():
+    metadata = {'tab': {str(i): 'a' * 100 for i in range(500)}}
+    payload = make_payload(metadata, breadcrumbs=10)
+    payload['user'] = FilterDict({'name': 'b' * 1000})
+
+    result = encode(payload, 2000)
+
+    assert result['metaData'] == {
+        'trimmed': {'breadcrumbs': 10, 'strings': True, 'essentialsOnly': True}
+    }
+    assert result['user'] == {}
+    assert result['exceptions'][0]['errorClass'] == 'Exception'
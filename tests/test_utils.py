@@ -3,18 +3,50 @@ import json
 import timeit
 import re
 import threading
+import tracemalloc
 import uuid
 import logging
 import pytest
 from datetime import datetime, timedelta, timezone
 
+from bugsnag.serializers import get_serializer
 from bugsnag.utils import (SanitizingJSONEncoder, FilterDict,
                            is_json_content_type, parse_content_type,
-                           ThreadContextVar, to_rfc3339, remove_query_from_url)
+                           ThreadContextVar, to_rfc3339, remove_query_from_url,
+                           KeywordMatcher, _encode_deeply_nested)
+from tests.large_object import large_object_file_path
+from tests.utils import make_nested
 
 logger = logging.getLogger(__name__)
 
 
+def nested_depth(value):
+    depth = 0
+
+    while isinstance(value, dict) and 'child' in value:
+        value = value['child']
+        depth += 1
+
+    return depth
+
+
+def transient_allocations(function, *args):
+    """
+    The memory allocated while calling a function which was freed before it
+    returned
+    """
+    tracemalloc.start()
+
+    try:
+        result = function(*args)
+        current, peak = tracemalloc.get_traced_memory()
+
+        return peak - current
+    finally:
+        del result
+        tracemalloc.stop()
+
+
 class TestUtils(unittest.TestCase):
     def tearDown(self):
         super(TestUtils, self).tearDown()
@@ -275,6 +307,37 @@ with open(large_object_file_path()) as json_data:
             "Encoding required {0}s (expected {1}s)".format(time, maximum_time)
         )
 
+    def test_encoding_time_relative_to_the_standard_encoder(self):
+        """
+        Test that sanitizing a large object adds little to the time the
+        standard library takes to encode it, which doesn't depend on the
+        speed of the machine running the tests
+        """
+        setup = """\
+import json
+import logging
+from tests.large_object import large_object_file_path
+from bugsnag.utils import SanitizingJSONEncoder
+
+logger = logging.getLogger(__name__)
+encoder = SanitizingJSONEncoder(logger, keyword_filters=['password'])
+with open(large_object_file_path()) as json_data:
+    data = json.load(json_data)
+        """
+
+        def best_time(stmt):
+            return min(timeit.repeat(stmt, setup, number=100, repeat=5))
+
+        standard = best_time("json.dumps(data)")
+        sanitizing = best_time("encoder.encode(data)")
+
+        self.assertLess(
+            sanitizing,
+            standard * 4,
+            "Encoding took {0:.1f} times as long as the standard "
+            "encoder".format(sanitizing / standard)
+        )
+
     def test_filter_string_values_list_handling(self):
         """
         Test that filter_string_values can accept a list for the ignored
@@ -433,6 +496,215 @@ with open(large_object_file_path()) as json_data:
                             }
                         })
 
+    def test_deeply_nested_encode_matches_the_standard_encoder(self):
+        """
+        Test that writing a sanitized payload with an explicit stack gives
+        exactly the same output as the standard encoder
+        """
+        class Unprintable(object):
+            def __str__(self):
+                raise ValueError('no')
+
+        ancestor = {'name': 'ancestor'}
+        filtered = FilterDict({
+            'ancestor': ancestor,
+            'password': 'hunter2',
+            b'Password': 'hunter3',
+            'nested': {'token': 'abc', 'items': [ancestor, {1, 2}]},
+        })
+        ancestor['filtered'] = filtered
+        ancestor['self'] = ancestor
+
+        items = [ancestor, filtered, (1, 2.5, None), frozenset([3])]
+        items.append(items)
+
+        values = [
+            ancestor,
+            filtered,
+            items,
+            {b'key': 1, 'key': 2, 3: 'three', '3': 'another three'},
+            {'bytes': b'\xff' * 2000, 'object': Unprintable()},
+            {'nan': float('nan'), 'large': 10 ** 30, 'bool': False},
+            {'long': ['a' * 2000] * 100, 'k' * 2000: '\U0001f62c' * 2000},
+            'a' * 200 * 1024,
+        ]
+
+        with open(large_object_file_path()) as json_data:
+            values.append(json.load(json_data))
+
+        for options in [{}, {'separators': (',', ':')},
+                        {'ensure_ascii': False}]:
+            encoder = SanitizingJSONEncoder(
+                logger,
+                keyword_filters=['password', 'token'],
+                **options
+            )
+
+            for value in values:
+                sanitized = encoder._sanitize(value, False)
+
+                self.assertEqual(
+                    _encode_deeply_nested(encoder, sanitized),
+                    encoder._encode_untrimmed_bytes(value).decode('utf-8')
+                )
+
+    def test_encode_duplicate_keys_after_coercion(self):
+        encoder = SanitizingJSONEncoder(logger, keyword_filters=[])
+        payload = encoder.encode({'a': 1, 'b': 2, b'a': 3})
+
+        self.assertEqual('{"a": 3, "b": 2}', payload)
+
+    def test_encode_sets(self):
+        encoder = SanitizingJSONEncoder(logger, keyword_filters=[])
+
+        self.assertEqual('{"a": [1]}', encoder.encode({'a': {1}}))
+
+    def test_encode_trims_strings_in_filter_dicts(self):
+        data = FilterDict({
+            'password': 'a' * 200 * 1024,
+            'nested': {'value': 'b' * 200 * 1024},
+        })
+
+        encoder = SanitizingJSONEncoder(logger, keyword_filters=['password'])
+        sane_data = json.loads(encoder.encode(data))
+
+        self.assertEqual(sane_data, {
+            'password': '[FILTERED]',
+            'nested': {'value': 'b' * 1024},
+        })
+
+    def test_encode_with_indent(self):
+        data = FilterDict({'password': 'hunter2', 'list': ['a' * 2000] * 100})
+        encoder = SanitizingJSONEncoder(
+            logger,
+            keyword_filters=['password'],
+            indent=2,
+            sort_keys=True
+        )
+
+        sane_data = json.loads(encoder.encode(data))
+
+        self.assertEqual(sane_data, {
+            'list': ['a' * 1024] * 100,
+            'password': '[FILTERED]',
+        })
+
+    def test_sanitize_deeply_nested_values(self):
+        data = make_nested(10000)
+        data['child']['child']['self'] = data
+
+        encoder = SanitizingJSONEncoder(logger, keyword_filters=[])
+        sanitized = encoder._sanitize(data, False)
+
+        self.assertEqual('[RECURSIVE]', sanitized['child']['child']['self'])
+        self.assertEqual(10000, nested_depth(sanitized))
+
+    def test_filter_string_values_in_deeply_nested_values(self):
+        data = make_nested(10000)
+        data['child']['password'] = 'hunter2'
+        data['child']['child']['parent'] = data['child']
+
+        encoder = SanitizingJSONEncoder(logger, keyword_filters=['password'])
+        filtered = encoder.filter_string_values(data)
+
+        self.assertEqual('[FILTERED]', filtered['child']['password'])
+        self.assertEqual('[RECURSIVE]', filtered['child']['child']['parent'])
+
+    def test_sanitize_only_tracks_containers_on_the_current_path(self):
+        shared = [1, 2]
+        data = {'a': shared, 'b': [shared, {'c': shared}]}
+        data['b'].append(data['b'])
+
+        encoder = SanitizingJSONEncoder(logger, keyword_filters=[])
+
+        self.assertEqual(encoder._sanitize(data, False), {
+            'a': [1, 2],
+            'b': [[1, 2], {'c': [1, 2]}, '[RECURSIVE]'],
+        })
+
+    def test_sanitize_allocations_do_not_grow_with_the_size_of_values(self):
+        encoder = SanitizingJSONEncoder(logger, keyword_filters=['password'])
+
+        def make_items(count):
+            return FilterDict({
+                'items': [
+                    {'id': i, 'tags': ['a', 'b'], 'password': 'x'}
+                    for i in range(count)
+                ],
+            })
+
+        small = transient_allocations(
+            encoder._sanitize, make_items(100), False
+        )
+        large = transient_allocations(
+            encoder._sanitize, make_items(20000), False
+        )
+
+        # only the stack of containers being walked is allocated, on top of
+        # the sanitized copy
+        self.assertLess(large, small + 16 * 1024)
+
+    def test_keyword_matcher_matches_substrings_case_insensitively(self):
+        keywords = ['password', 'Secret', 'a.b', '(x)']
+        matcher = KeywordMatcher(keywords)
+
+        keys = [
+            'password', 'PASSWORD', 'user_password', 'secret', 'topSECRET',
+            'a.b', 'axb', '(x)', 'x', 'pass', 'word', '', 'other',
+            b'password', b'my_secret', b'a.b', b'axb', b'other',
+        ]
+
+        for key in keys:
+            text = key.decode('utf-8') if isinstance(key, bytes) else key
+            expected = any(keyword.lower() in text.lower()
+                           for keyword in keywords)
+
+            self.assertEqual(expected, matcher.matches(key), key)
+
+    def test_keyword_matcher_ignores_non_string_keys(self):
+        matcher = KeywordMatcher(['1'])
+
+        self.assertFalse(matcher.matches(1))
+        self.assertFalse(matcher.matches(None))
+        self.assertFalse(matcher.matches(('1',)))
+
+    def test_keyword_matcher_without_keywords(self):
+        matcher = KeywordMatcher([])
+
+        self.assertEqual([], matcher.keywords)
+        self.assertFalse(matcher.matches(''))
+        self.assertFalse(matcher.matches('password'))
+
+    def test_keyword_matcher_caches_decisions(self):
+        matcher = KeywordMatcher(['password'], cache_size=2)
+
+        for _ in range(3):
+            self.assertTrue(matcher.matches('password'))
+            self.assertFalse(matcher.matches('name'))
+
+        info = matcher._cached_match.cache_info()
+        self.assertEqual(2, info.misses)
+        self.assertEqual(4, info.hits)
+
+        matcher.matches('a')
+        matcher.matches('b')
+        self.assertEqual(2, matcher._cached_match.cache_info().currsize)
+
+    def test_encoder_uses_given_keyword_matcher(self):
+        matcher = KeywordMatcher(['token'])
+        encoder = SanitizingJSONEncoder(
+            logger,
+            keyword_filters=['ignored'],
+            keyword_matcher=matcher
+        )
+
+        data = FilterDict({'token': 'abc', 'ignored': 'def'})
+
+        self.assertEqual(
+            {'token': '[FILTERED]', 'ignored': 'def'},
+            json.loads(encoder.encode(data))
+        )
+
     def test_parse_invalid_content_type(self):
         info = parse_content_type('invalid-type')
         self.assertEqual(('invalid-type', None, None, None), info)
@@ -541,3 +813,42 @@ def test_to_rfc3339(dt: datetime, expected: str):
 ])
 def test_remove_query_from_url(url, expected):
     assert remove_query_from_url(url) == expected
+
+
+@pytest.mark.parametrize('backend', ['json', 'orjson', 'ujson'])
+def test_encode_bytes_deeply_nested_values(backend):
+    if backend != 'json':
+        pytest.importorskip(backend)
+
+    dicts = make_nested(5000)
+    dicts['child']['child']['self'] = dicts
+
+    lists = []  # type: list
+    for _ in range(5000):
+        lists = [lists]
+
+    value = {
+        'dicts': dicts,
+        'lists': lists,
+        'filtered': FilterDict({'password': 'x', 'child': make_nested(5000)}),
+    }
+
+    encoder = SanitizingJSONEncoder(
+        logger,
+        keyword_filters=['password'],
+        separators=(',', ':'),
+        serializer=get_serializer(backend)
+    )
+
+    def nested(depth):
+        return '{"child":' * depth + '{}' + '}' * depth
+
+    expected = (
+        '{"dicts":{"child":{"child":{"child":' + nested(4997) +
+        ',"self":"[RECURSIVE]"}}}' +
+        ',"lists":' + '[' * 5001 + ']' * 5001 +
+        ',"filtered":{"password":"[FILTERED]","child":' + nested(5000) + '}}'
+    )
+
+    assert encoder.encode_bytes(value) == expected.encode('utf-8')
+    assert encoder.encode(value) == expected
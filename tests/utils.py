@@ -1,5 +1,8 @@
 import sys
+import gzip
 import json
+import logging
+import os
 import time
 import unittest
 from threading import Thread
@@ -8,7 +11,8 @@ from http.server import SimpleHTTPRequestHandler, HTTPServer
 
 import bugsnag
 from bugsnag.delivery import Delivery
-from bugsnag.configuration import RequestConfiguration
+from bugsnag.configuration import Configuration, RequestConfiguration
+from bugsnag.utils import SanitizingJSONEncoder
 
 
 try:
@@ -17,6 +21,48 @@ try:
 except ImportError:
     is_exception_group_supported = sys.version_info >= (3, 11)
 
+logger = logging.getLogger(__name__)
+
+
+def make_config(**options):
+    """
+    Create a configuration with the given options, whose project root is the
+    tests directory unless another is given
+    """
+    options.setdefault('project_root', os.path.dirname(__file__))
+
+    config = Configuration()
+    config.configure(**options)
+
+    return config
+
+
+def make_encoder(serializer=None, **options):
+    """
+    Create a compact encoder which filters passwords
+    """
+    return SanitizingJSONEncoder(
+        logger,
+        keyword_filters=['password'],
+        separators=(',', ':'),
+        serializer=serializer,
+        **options
+    )
+
+
+def make_nested(depth):
+    """
+    Create a dict nested 'depth' levels deep through its 'child' key
+    """
+    root = {}
+    current = root
+
+    for _ in range(depth):
+        current['child'] = {}
+        current = current['child']
+
+    return root
+
 
 class MissingRequestError(Exception):
     pass
@@ -31,6 +77,9 @@ class IntegrationTest(unittest.TestCase):
     def setUp(self):
         self.server.events_received = []
         self.server.sessions_received = []
+        self.server.status_code = 200
+        self.server.status_codes = []
+        self.server.response_headers = {}
 
     def tearDown(self):
         RequestConfiguration.get_instance().clear()
@@ -80,6 +129,9 @@ class FakeBugsnagServer(object):
         self.events_received = []
         self.sessions_received = []
         self.paused = False
+        self.status_code = 200
+        self.status_codes = []
+        self.response_headers = {}
         self.wait_for_duplicate_requests = wait_for_duplicate_requests
 
         class Handler(SimpleHTTPRequestHandler):
@@ -93,7 +145,12 @@ class FakeBugsnagServer(object):
                     time.sleep(0.001)
 
                 length = int(handler.headers['Content-Length'])
-                raw_body = handler.rfile.read(length).decode('utf-8')
+                raw_body = handler.rfile.read(length)
+
+                if handler.headers.get('Content-Encoding') == 'gzip':
+                    raw_body = gzip.decompress(raw_body)
+
+                raw_body = raw_body.decode('utf-8')
 
                 if handler.path in ('/sessions', self.sessions_url):
                     self.sessions_received.append({
@@ -114,7 +171,14 @@ class FakeBugsnagServer(object):
                         'unknown endpoint requested: ' + handler.path
                     )
 
-                handler.send_response(200)
+                if self.status_codes:
+                    handler.send_response(self.status_codes.pop(0))
+                else:
+                    handler.send_response(self.status_code)
+
+                for name, value in self.response_headers.items():
+                    handler.send_header(name, value)
+
                 handler.end_headers()
 
                 return ()